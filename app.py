@@ -1,3 +1,4 @@
+import os
 import streamlit as st
 from dotenv import load_dotenv
 
@@ -5,7 +6,12 @@ from src.api.printful import PrintfulAPI
 from src.ui.common import set_page_config, apply_custom_css, render_header, render_sidebar, render_footer, show_api_key_input, load_background_image
 from src.ui.template import render_template_generator
 from src.ui.mockup import render_mockup_generator
-from config import BASE_URL
+from src.ui.multi_store import render_multi_store_export
+from src.ui.jobs import render_background_jobs
+from src.utils.snapshot import load_cache_snapshot
+from src.api.webhooks import start_webhook_receiver
+from src.utils.memory import start_memory_tracing
+from config import BASE_URL, CACHE_SNAPSHOT_PATH
 
 def main():
     """Main application entry point for the Printful API Fetcher for Products, Variants, Templates and Mockups
@@ -40,6 +46,12 @@ def main():
     if 'api_key' in st.session_state:
         api_key = st.session_state.api_key
     
+    # Receive Printful webhooks for cache invalidation, if configured
+    start_webhook_receiver()
+    
+    # Trace allocations for memory accounting, if configured
+    start_memory_tracing()
+    
     # Initialize API client with the API key from session state
     api = PrintfulAPI(api_key, BASE_URL)
     
@@ -56,15 +68,29 @@ def main():
         render_footer()
         return
     
+    # Start warm from the configured cache snapshot, once per session
+    if CACHE_SNAPSHOT_PATH and not st.session_state.get('cache_snapshot_loaded'):
+        st.session_state.cache_snapshot_loaded = True
+        if os.path.exists(CACHE_SNAPSHOT_PATH):
+            try:
+                load_cache_snapshot(CACHE_SNAPSHOT_PATH, api_key)
+            except ValueError as e:
+                st.warning(f"Could not load cache snapshot: {e}")
+    
     # Render sidebar and get selected page
     page = render_sidebar(api)
     
     # Render selected page
     if page == "Printing Templates":
         render_template_generator(api)
+    elif page == "Multi-Store Export":
+        render_multi_store_export()
     else:
         render_mockup_generator(api)
     
+    # Background exports of the store, on every page so they can be followed anywhere
+    render_background_jobs(api)
+    
     # Render footer
     render_footer()
 
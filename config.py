@@ -8,10 +8,80 @@ load_dotenv()
 # API Configuration
 API_KEY = os.getenv("PRINTFUL_API_KEY", "")
 BASE_URL = "https://api.printful.com"
+API_KEY_PROBE_ENDPOINT = "/oauth/scopes"  # Lightweight endpoint used to validate API keys
+API_KEY_PROBE_TIMEOUT = 10  # Timeout in seconds for the API key probe request
+API_KEY_VALIDATION_TTL = 600  # Seconds a validated API key is trusted before probing again
+
+# Request Timeout and Circuit Breaker Configuration
+REQUEST_CONNECT_TIMEOUT = float(os.getenv("PRINTFUL_CONNECT_TIMEOUT", "5"))  # Seconds to connect to the API or the image CDN
+API_READ_TIMEOUT = float(os.getenv("PRINTFUL_API_TIMEOUT", "30"))  # Seconds to wait for an API response
+IMAGE_READ_TIMEOUT = float(os.getenv("PRINTFUL_IMAGE_TIMEOUT", "60"))  # Seconds to wait for an image download
+CIRCUIT_FAILURE_THRESHOLD = 5  # Consecutive failures of a host that open its circuit
+CIRCUIT_RESET_TIMEOUT = 30  # Seconds an open circuit fails fast before a probe request is let through
+
+# Rate Limit Configuration
+RATE_LIMIT_REQUESTS = 120  # Requests allowed per API key and period
+RATE_LIMIT_PERIOD = 60  # Rate limit period in seconds
+RATE_LIMIT_BURST = 10  # Maximum number of requests sent back to back
+RATE_LIMIT_MAX_RETRIES = 3  # Retries of a request answered with 429 before giving up
+EXPORT_RATE_RESERVE = 2  # Rate limit tokens exports and stock refreshes always leave to interactive requests
+
+# Multi-Store Configuration
+MULTI_STORE_MAX_WORKERS = 8  # Maximum number of stores exported concurrently
+
+# Export Configuration
+EXPORT_COMPRESS_WORKERS = os.cpu_count() or 1  # Threads that deflate ZIP entries in parallel
+EXPORT_COMPRESSION_LEVEL = 6  # zlib level of deflated ZIP entries
+EXPORT_STORED_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp", ".gif", ".zip", ".gz", ".parquet")  # Already compressed, stored as is
+EXPORT_SHARD_MIN_RECORDS = 200  # Exports with at least this many records are hashed and built in shards
+EXPORT_SHARD_WORKERS = os.cpu_count() or 1  # Threads that build export shards; hashing and deflating release the GIL
+
+# Background Job Configuration
+JOB_MAX_WORKERS = 2  # Background exports running at the same time, later ones are queued
+JOB_HISTORY_SIZE = 20  # Finished jobs kept with their results
+JOB_REFRESH_INTERVAL = 1  # Seconds between progress updates of running jobs
+
+# Compositor Configuration
+PROCESS_POOL_MAX_WORKERS = os.cpu_count() or 1  # Worker processes for image compositing and resampling
+PROCESS_POOL_MIN_JOBS = 4  # Batches smaller than this run in the calling thread
+
+# Design Preflight Configuration
+PREFLIGHT_MIN_DPI_RATIO = 0.75  # Designs below this share of the print area DPI are rejected, below 1.0 they get a warning
+PREFLIGHT_ASPECT_TOLERANCE = 0.05  # Relative aspect ratio difference to the print area that is accepted
+PREFLIGHT_MIN_COVERAGE = 0.01  # Designs with a smaller share of visible pixels are rejected as empty
+PREFLIGHT_MAX_PARTIAL_ALPHA = 0.1  # Share of semi-transparent pixels above which a design gets a warning
+
+# Template Deduplication Configuration
+PHASH_MAX_DISTANCE = 0  # Differing perceptual hash bits up to which templates of the same pixel size count as identical; small details of templates change only a few bits
+PHASH_CACHE_ENTRIES = 50000  # Perceptual hashes of downloaded templates kept, by image URL
+
+# Webhook Configuration
+WEBHOOK_HOST = os.getenv("PRINTFUL_WEBHOOK_HOST", "127.0.0.1")  # Interface the webhook receiver listens on
+WEBHOOK_PORT = int(os.getenv("PRINTFUL_WEBHOOK_PORT", "0"))  # Port of the webhook receiver, 0 disables it
+WEBHOOK_PATH = os.getenv("PRINTFUL_WEBHOOK_PATH", "/printful/webhook")  # Request path that accepts events
+WEBHOOK_SECRET = os.getenv("PRINTFUL_WEBHOOK_SECRET", "")  # Token every request must carry as ?token= or X-Webhook-Token header; the receiver does not start without it
+WEBHOOK_LOG_SIZE = 1000  # Events kept for sessions that have not applied them yet
+
+# Memory Configuration
+MEMORY_ACCOUNTING_MODE = os.getenv("PRINTFUL_MEMORY_MODE", "deep")  # "deep" sizes the caches, "tracemalloc" also traces all allocations (slower)
+MEMORY_SESSION_MAX_BYTES = int(os.getenv("PRINTFUL_MEMORY_SESSION_MAX_MB", "256")) * 1024 * 1024  # Cache bytes per session before its oldest entries are evicted, 0 disables
+MEMORY_GLOBAL_MAX_BYTES = int(os.getenv("PRINTFUL_MEMORY_GLOBAL_MAX_MB", "2048")) * 1024 * 1024  # Cache bytes of all sessions (traced bytes in tracemalloc mode) before eviction, 0 disables
+MEMORY_EVICTION_TARGET = 0.8  # Share of a cap that eviction frees memory down to
+MEMORY_TRACEMALLOC_FRAMES = 1  # Traceback frames stored per allocation in tracemalloc mode
+MEMORY_TRACEMALLOC_INTERVAL = 30  # Seconds between snapshots of the top allocation sites
+
+# Prefetch Configuration
+PREFETCH_ENABLED = os.getenv("PRINTFUL_PREFETCH", "1") == "1"  # Warm catalog data after fetching store products
+PREFETCH_MAX_PRODUCTS = 50  # Maximum number of store products to prefetch
+PREFETCH_RATE_RESERVE = 5  # Rate limit tokens the prefetcher always leaves to interactive requests and exports
 
 # Directory Configuration
 ROOT_DIR = Path(__file__).parent.absolute()
 
+# Export Journal Configuration
+EXPORT_JOURNAL_DIR = os.getenv("PRINTFUL_EXPORT_JOURNAL_DIR", str(ROOT_DIR / ".export_journal"))  # Checkpoints of unfinished background exports
+EXPORT_JOURNAL_MAX_AGE = 7 * 24 * 3600  # Seconds after the last checkpoint before an abandoned journal is deleted
+
 # UI Configuration
 APP_TITLE = "Printful API Fetcher for Products, Variants, Templates and Mockups"
 APP_sICON = "🎨"
@@ -20,4 +90,14 @@ SECONDARY_COLOR = "#4CAF50"
 BACKGROUND_COLOR = "#F5F5F5"
 
 # Cache Configuration
-CACHE_EXPIRY = 3600  # Cache expiry in seconds (1 hour)
\ No newline at end of file
+CACHE_EXPIRY = 3600  # Cache expiry in seconds (1 hour)
+CACHE_TTL = {  # Cache lifetime in seconds per endpoint class
+    "catalog": 7 * 24 * 3600,  # Catalog templates, mockup styles and images
+    "store": 10 * 60,  # Store product listing and details
+    "stock": 15 * 60,  # Catalog variant details and availability
+}
+STOCK_REFRESH_MAX_WORKERS = 8  # Concurrent availability requests of a stock refresh
+CACHE_SNAPSHOT_PATH = os.getenv("PRINTFUL_CACHE_SNAPSHOT", "")  # Snapshot file loaded when a session starts
+
+# Download Configuration
+DOWNLOAD_REGISTRY_MAX_BYTES = 512 * 1024 * 1024  # Payload bytes kept for download buttons before the oldest are dropped
\ No newline at end of file
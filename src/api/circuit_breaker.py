@@ -0,0 +1,131 @@
+import time
+import threading
+from urllib.parse import urlparse
+from typing import Dict, List
+
+from config import CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT
+
+class CircuitOpenError(Exception):
+    """Raised for requests that fail fast because the circuit of their host is open"""
+
+# Circuit states
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+
+class CircuitBreaker:
+    """Circuit breaker of one host, shared by every session
+    
+    After CIRCUIT_FAILURE_THRESHOLD consecutive failures (timeouts, connection errors
+    or 5xx responses) the circuit opens and requests to the host fail fast without
+    waiting on a timeout. After CIRCUIT_RESET_TIMEOUT seconds a single probe request
+    is let through (half-open): its success closes the circuit, its failure opens it
+    again. A probe that ends without either, e.g. on an unexpected error or a
+    Streamlit rerun, is released so the next request probes instead.
+    """
+    
+    def __init__(self, host: str, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                 reset_timeout: float = CIRCUIT_RESET_TIMEOUT):
+        """Initialize the circuit breaker
+        
+        Args:
+            host: Host name the breaker guards
+            failure_threshold: Consecutive failures that open the circuit
+            reset_timeout: Seconds the circuit stays open before a probe request
+        """
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CIRCUIT_CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.probe_thread = None
+        self.lock = threading.Lock()
+    
+    def allow_request(self) -> bool:
+        """Check whether a request may be sent to the host
+        
+        Returns:
+            bool: True if the circuit is closed or this request is the half-open probe
+        """
+        with self.lock:
+            if self.state == CIRCUIT_CLOSED:
+                return True
+            if self.state == CIRCUIT_OPEN and time.time() - self.opened_at >= self.reset_timeout:
+                self.state = CIRCUIT_HALF_OPEN
+            if self.state == CIRCUIT_HALF_OPEN and not self.probing:
+                self.probing = True
+                self.probe_thread = threading.get_ident()
+                return True
+            return False
+    
+    def release_probe(self) -> None:
+        """Release the probe of the calling thread if it ended without an outcome
+        
+        Call in a finally block after every allowed request; it does nothing once
+        record_success() or record_failure() was called.
+        """
+        with self.lock:
+            if self.probing and self.probe_thread == threading.get_ident():
+                self.probing = False
+    
+    def record_success(self) -> None:
+        """Record a response from the host, closing the circuit"""
+        with self.lock:
+            self.state = CIRCUIT_CLOSED
+            self.failures = 0
+            self.probing = False
+    
+    def record_failure(self) -> bool:
+        """Record a failed request to the host
+        
+        Returns:
+            bool: True if this failure opened the circuit
+        """
+        with self.lock:
+            self.failures += 1
+            self.probing = False
+            if self.state == CIRCUIT_HALF_OPEN or (self.state == CIRCUIT_CLOSED
+                                                   and self.failures >= self.failure_threshold):
+                opened = self.state == CIRCUIT_CLOSED
+                self.state = CIRCUIT_OPEN
+                self.opened_at = time.time()
+                return opened
+            return False
+    
+    @property
+    def retry_in(self) -> float:
+        """Seconds until the next probe request, 0 unless the circuit is open"""
+        if self.state != CIRCUIT_OPEN:
+            return 0.0
+        return max(self.opened_at + self.reset_timeout - time.time(), 0.0)
+
+# Circuit breakers shared by all sessions, keyed by host
+_circuit_breakers: Dict[str, CircuitBreaker] = {}
+_circuit_breakers_lock = threading.Lock()
+
+def get_circuit_breaker(url: str) -> CircuitBreaker:
+    """Get the process-wide circuit breaker of the host of a URL
+    
+    Args:
+        url: Request URL or base URL
+    
+    Returns:
+        CircuitBreaker: Circuit breaker shared by every request to the host
+    """
+    host = urlparse(url).netloc or url
+    
+    with _circuit_breakers_lock:
+        if host not in _circuit_breakers:
+            _circuit_breakers[host] = CircuitBreaker(host)
+        return _circuit_breakers[host]
+
+def get_open_circuits() -> List[CircuitBreaker]:
+    """Get the circuit breakers that currently block requests
+    
+    Returns:
+        List[CircuitBreaker]: Open and half-open circuit breakers
+    """
+    with _circuit_breakers_lock:
+        return [breaker for breaker in _circuit_breakers.values() if breaker.state != CIRCUIT_CLOSED]
\ No newline at end of file
@@ -0,0 +1,297 @@
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional
+
+from src.utils.json_codec import loads as json_loads
+
+class Model(ABC):
+    """Base class of the slotted Printful response models
+    
+    Models keep only the fields the application reads. For code written against the
+    raw API dictionaries they also support item access and get() by field name.
+    """
+    
+    __slots__ = ()
+    
+    @classmethod
+    @abstractmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Model":
+        """Build the model from a decoded API object
+        
+        Args:
+            data: Decoded JSON object
+        
+        Returns:
+            Model: Model instance
+        """
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert the model to plain data, e.g. for JSON exports
+        
+        Returns:
+            Dict[str, Any]: Field name -> value, with nested models converted too
+        """
+        result = {}
+        for name in self.__slots__:
+            value = getattr(self, name)
+            if isinstance(value, Model):
+                value = value.to_dict()
+            elif isinstance(value, list):
+                value = [item.to_dict() if isinstance(item, Model) else item for item in value]
+            result[name] = value
+        return result
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        """Get a field value like dict.get()
+        
+        Args:
+            key: Field name
+            default: Value returned for unknown fields
+        
+        Returns:
+            Any: Field value, also when it is None, or default
+        """
+        return getattr(self, key) if key in self.__slots__ else default
+    
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+    
+    def __contains__(self, key: str) -> bool:
+        return key in self.__slots__
+    
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+class StoreProduct(Model):
+    """Store product from the /store/products listing"""
+    
+    __slots__ = ("id", "name")
+    
+    def __init__(self, id: int, name: str):
+        self.id = id
+        self.name = name
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "StoreProduct":
+        return cls(data["id"], data.get("name", ""))
+
+class SyncVariant(Model):
+    """Sync variant of a store product, linked to a catalog variant"""
+    
+    __slots__ = ("id", "catalog_product_id", "catalog_variant_id")
+    
+    def __init__(self, id: int, catalog_product_id: Optional[int], catalog_variant_id: Optional[int]):
+        self.id = id
+        self.catalog_product_id = catalog_product_id
+        self.catalog_variant_id = catalog_variant_id
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SyncVariant":
+        product = data.get("product") or {}
+        return cls(data["id"], product.get("product_id"), product.get("variant_id"))
+
+class SyncProduct(Model):
+    """Store product details from /store/products/{id}"""
+    
+    __slots__ = ("id", "name", "sync_variants")
+    
+    def __init__(self, id: Optional[int], name: str, sync_variants: List[SyncVariant]):
+        self.id = id
+        self.name = name
+        self.sync_variants = sync_variants
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SyncProduct":
+        sync_product = data.get("sync_product") or {}
+        return cls(
+            sync_product.get("id"),
+            sync_product.get("name", ""),
+            [SyncVariant.from_dict(variant) for variant in data.get("sync_variants") or []]
+        )
+
+class CatalogVariant(Model):
+    """Catalog variant with its product category from /products/variant/{id}"""
+    
+    __slots__ = ("id", "catalog_product_id", "size", "color_code", "in_stock", "main_category_id", "product_type")
+    
+    def __init__(self, id: Optional[int], catalog_product_id: Optional[int], size: str, color_code: str,
+                 in_stock: bool, main_category_id: Any, product_type: str):
+        self.id = id
+        self.catalog_product_id = catalog_product_id
+        self.size = size
+        self.color_code = color_code
+        self.in_stock = in_stock
+        self.main_category_id = main_category_id
+        self.product_type = product_type
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CatalogVariant":
+        variant = data.get("variant") or {}
+        product = data.get("product") or {}
+        return cls(
+            variant.get("id"),
+            variant.get("product_id", product.get("id")),
+            variant.get("size") or "",
+            variant.get("color_code") or "",
+            variant.get("in_stock", False),
+            product.get("main_category_id", ""),
+            product.get("type", "")
+        )
+
+class MockupTemplate(Model):
+    """Mockup template of a catalog product placement"""
+    
+    __slots__ = ("catalog_variant_ids", "placement", "technique", "image_url", "template_width",
+                 "template_height", "print_area_width", "print_area_height", "print_area_top", "print_area_left")
+    
+    def __init__(self, catalog_variant_ids: List[int], placement: Optional[str], technique: Optional[str],
+                 image_url: str, template_width: int, template_height: int, print_area_width: int,
+                 print_area_height: int, print_area_top: int, print_area_left: int):
+        self.catalog_variant_ids = catalog_variant_ids
+        self.placement = placement
+        self.technique = technique
+        self.image_url = image_url
+        self.template_width = template_width
+        self.template_height = template_height
+        self.print_area_width = print_area_width
+        self.print_area_height = print_area_height
+        self.print_area_top = print_area_top
+        self.print_area_left = print_area_left
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "MockupTemplate":
+        return cls(
+            data.get("catalog_variant_ids") or [],
+            data.get("placement"),
+            data.get("technique"),
+            data.get("image_url") or "",
+            data.get("template_width", 0),
+            data.get("template_height", 0),
+            data.get("print_area_width", 0),
+            data.get("print_area_height", 0),
+            data.get("print_area_top", 0),
+            data.get("print_area_left", 0)
+        )
+
+class MockupStyle(Model):
+    """Mockup style (category and view) of a placement"""
+    
+    __slots__ = ("id", "category_name", "view_name", "restricted_to_variants")
+    
+    def __init__(self, id: int, category_name: Optional[str], view_name: Optional[str],
+                 restricted_to_variants: Optional[List[int]]):
+        self.id = id
+        self.category_name = category_name
+        self.view_name = view_name
+        self.restricted_to_variants = restricted_to_variants
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "MockupStyle":
+        return cls(data.get("id"), data.get("category_name"), data.get("view_name"), data.get("restricted_to_variants"))
+
+class MockupStyleGroup(Model):
+    """Mockup styles of one placement and technique with its print area specs"""
+    
+    __slots__ = ("placement", "technique", "print_area_width", "print_area_height", "print_area_type", "dpi",
+                 "mockup_styles")
+    
+    def __init__(self, placement: Optional[str], technique: Optional[str], print_area_width: Optional[float],
+                 print_area_height: Optional[float], print_area_type: Optional[str], dpi: Optional[int],
+                 mockup_styles: List[MockupStyle]):
+        self.placement = placement
+        self.technique = technique
+        self.print_area_width = print_area_width
+        self.print_area_height = print_area_height
+        self.print_area_type = print_area_type
+        self.dpi = dpi
+        self.mockup_styles = mockup_styles
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "MockupStyleGroup":
+        return cls(
+            data.get("placement"),
+            data.get("technique"),
+            data.get("print_area_width"),
+            data.get("print_area_height"),
+            data.get("print_area_type"),
+            data.get("dpi"),
+            [MockupStyle.from_dict(style) for style in data.get("mockup_styles") or []]
+        )
+
+class MockupImage(Model):
+    """Mockup image of a placement"""
+    
+    __slots__ = ("placement", "image_url")
+    
+    def __init__(self, placement: Optional[str], image_url: Optional[str]):
+        self.placement = placement
+        self.image_url = image_url
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "MockupImage":
+        return cls(data.get("placement"), data.get("image_url"))
+
+class VariantMockupImages(Model):
+    """Mockup images of one catalog variant"""
+    
+    __slots__ = ("catalog_variant_id", "color", "images")
+    
+    def __init__(self, catalog_variant_id: Optional[int], color: Optional[str], images: List[MockupImage]):
+        self.catalog_variant_id = catalog_variant_id
+        self.color = color
+        self.images = images
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "VariantMockupImages":
+        return cls(
+            data.get("catalog_variant_id"),
+            data.get("color"),
+            [MockupImage.from_dict(image) for image in data.get("images") or []]
+        )
+
+class VariantAvailability(Model):
+    """Availability of a catalog variant from /v2/catalog-variants/{id}/availability"""
+    
+    __slots__ = ("catalog_variant_id", "in_stock")
+    
+    def __init__(self, catalog_variant_id: Optional[int], in_stock: bool):
+        self.catalog_variant_id = catalog_variant_id
+        self.in_stock = in_stock
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "VariantAvailability":
+        # In stock if any technique can be sold in any region
+        in_stock = any(
+            region.get("availability") == "in stock"
+            for technique in data.get("techniques") or []
+            for region in technique.get("selling_regions") or []
+        )
+        return cls(data.get("catalog_variant_id"), in_stock)
+
+def decode_response(content: bytes, model: type) -> Dict[str, Any]:
+    """Decode a Printful API response body into models
+    
+    Only the "result" (API v1) or "data" (API v2) member is kept, as a model or a list
+    of models; every other member of the response is dropped.
+    
+    Args:
+        content: Raw response body
+        model: Model class of the result items
+    
+    Returns:
+        Dict[str, Any]: Dictionary with the decoded "result" and/or "data" member
+    """
+    payload = json_loads(content)
+    decoded = {}
+    
+    for key in ("result", "data"):
+        if key in payload:
+            value = payload[key]
+            if isinstance(value, list):
+                decoded[key] = [model.from_dict(item) for item in value]
+            else:
+                decoded[key] = model.from_dict(value)
+    
+    return decoded
\ No newline at end of file
@@ -0,0 +1,110 @@
+import copy
+import threading
+import streamlit as st
+from typing import Dict, List
+
+from config import PREFETCH_ENABLED, PREFETCH_MAX_PRODUCTS
+from src.api.printful import PrintfulAPI
+from src.api.rate_limit import PRIORITY_PREFETCH
+
+class CatalogPrefetcher:
+    """Warm the catalog caches of store products on a background thread
+    
+    Fetches mockup styles, variants and the template index of each product through a
+    copy of the session's API client, so results land in the same session caches and
+    Step 2 of both pages renders from cache; the cache lock the copy shares with the
+    session's client keeps the two threads apart. The copy requests with the prefetch
+    priority, so prefetching only uses rate limit budget that interactive requests
+    and exports leave.
+    """
+    
+    def __init__(self, api: PrintfulAPI, products: List[Dict], max_products: int = PREFETCH_MAX_PRODUCTS):
+        """Initialize the prefetcher
+        
+        Args:
+            api: PrintfulAPI instance of the session
+            products: Store products in prefetch order
+            max_products: Maximum number of products to prefetch
+        """
+        self.api = copy.copy(api)
+        self.api.priority = PRIORITY_PREFETCH
+        self.products = [product for product in products if product.get('catalog_product_id')][:max_products]
+        self.total = len(self.products)
+        self.done = 0
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="printful-prefetch", daemon=True)
+    
+    def start(self) -> None:
+        """Start prefetching in the background"""
+        self.thread.start()
+    
+    def stop(self) -> None:
+        """Ask the prefetcher to stop after the current request"""
+        self.stop_event.set()
+    
+    def is_running(self) -> bool:
+        """Check whether the prefetcher is still working
+        
+        Returns:
+            bool: True if the background thread is alive
+        """
+        return self.thread.is_alive()
+    
+    def _run(self) -> None:
+        """Prefetch every product until done or stopped"""
+        for product in self.products:
+            if self.stop_event.is_set():
+                return
+            try:
+                self._prefetch_product(product)
+            except Exception:
+                # Prefetching is best effort, the page fetches again on demand
+                pass
+            self.done += 1
+    
+    def _prefetch_product(self, product: Dict) -> None:
+        """Warm the caches used by Step 2 for one product
+        
+        Args:
+            product: Store product with a catalog product ID
+        """
+        catalog_product_id = product['catalog_product_id']
+        
+        self.api.get_mockup_styles(catalog_product_id)
+        
+        if self.stop_event.is_set():
+            return
+        
+        variants, _, _ = self.api.get_product_variants(product['id'])
+        if variants and not self.stop_event.is_set():
+            self.api.get_template_index(catalog_product_id, variants)
+
+def start_prefetch(api: PrintfulAPI, products: List[Dict]) -> None:
+    """Start prefetching catalog data for the store products of the session
+    
+    Products already selected on either page are prefetched first. Any prefetcher
+    previously started by the session is stopped.
+    
+    Args:
+        api: PrintfulAPI instance
+        products: Store products as returned by fetch_store_products
+    """
+    stop_prefetch()
+    
+    if not PREFETCH_ENABLED or not products:
+        return
+    
+    selected_ids = [product['id'] for product in st.session_state.get('selected_products', [])]
+    selected_ids += [product['id'] for product in st.session_state.get('selected_mockup_products', [])]
+    ordered = sorted(products, key=lambda product: product['id'] not in selected_ids)
+    
+    prefetcher = CatalogPrefetcher(api, ordered)
+    prefetcher.start()
+    st.session_state.prefetcher = prefetcher
+
+def stop_prefetch() -> None:
+    """Stop the prefetcher of the session if one is running"""
+    prefetcher = st.session_state.get('prefetcher')
+    if prefetcher is not None:
+        prefetcher.stop()
+        st.session_state.prefetcher = None
\ No newline at end of file
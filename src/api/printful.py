@@ -1,19 +1,93 @@
 import requests
 import time
+import threading
+import hashlib
+import copy
 import streamlit as st
 import base64
 import io
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Dict, List, Any, Optional, Tuple, Union, Iterator
+
+from concurrent.futures import ThreadPoolExecutor
+
+from config import API_KEY_PROBE_ENDPOINT, API_KEY_PROBE_TIMEOUT, API_KEY_VALIDATION_TTL, CACHE_TTL, \
+    STOCK_REFRESH_MAX_WORKERS, REQUEST_CONNECT_TIMEOUT, API_READ_TIMEOUT, RATE_LIMIT_MAX_RETRIES
+from src.api.circuit_breaker import CircuitOpenError, CIRCUIT_CLOSED, get_circuit_breaker
+from src.api.rate_limit import get_rate_limiter, PRIORITY_INTERACTIVE, PRIORITY_EXPORT
+from src.api.webhooks import RECORDS_CACHE_NAMES, PRODUCT_CACHE_NAMES, get_invalidation_log, apply_pending_events
+from src.utils.context import notify, spinner
+from src.utils.json_codec import loads as json_loads, dumps as json_dumps
+from src.api.models import (StoreProduct, SyncProduct, CatalogVariant, MockupTemplate, MockupStyleGroup,
+                            VariantMockupImages, VariantAvailability, decode_response)
+
+# Session state caches owned by the API client
+CACHE_NAMES = [
+    "api_cache",
+    "catalog_api_cache",
+    "product_variants_cache",
+    "template_data_cache",
+    "mockup_styles_cache",
+    "mockup_images_cache",
+    "template_index_cache",
+    "generated_mockups_cache",
+    "cache_timestamps"
+]
+
+# Caches holding Printful catalog data, which is the same for every store
+CATALOG_CACHE_NAMES = [
+    "catalog_api_cache",
+    "template_data_cache",
+    "mockup_styles_cache",
+    "mockup_images_cache",
+    "template_index_cache"
+]
+
+# Endpoints whose responses are cached in catalog_api_cache
+CATALOG_ENDPOINTS = ("/v2/catalog-", "/products/")
+
+# Endpoints whose responses expire with the "stock" TTL class
+STOCK_ENDPOINTS = ("/products/variant/", "/v2/catalog-variants/")
+
+def get_ttl_class(endpoint: str) -> str:
+    """Get the TTL class of an endpoint, a key of CACHE_TTL
+    
+    Args:
+        endpoint: API endpoint
+    
+    Returns:
+        str: "stock", "catalog" or "store"
+    """
+    if endpoint.startswith(STOCK_ENDPOINTS):
+        return "stock"
+    if endpoint.startswith(CATALOG_ENDPOINTS):
+        return "catalog"
+    return "store"
+
+# API key validation results shared by all sessions, keyed by a hash of the API key
+_key_validation_cache: Dict[str, Dict[str, Any]] = {}
+_key_validation_refreshing = set()
+_key_validation_lock = threading.Lock()
 
 class PrintfulAPI:
     """Printful API client for interacting with the Printful API"""
     
-    def __init__(self, api_key: str, base_url: str):
+    # Guards the cache dictionaries against concurrent access. Shared by all clients:
+    # copies made for background threads, the clients of later reruns and multi-store
+    # clients all work on the same dictionaries.
+    cache_lock = threading.RLock()
+    
+    # Bumped whenever cached values are changed in place rather than replaced, so
+    # memory accounting measures them again
+    cache_generation = 0
+    
+    def __init__(self, api_key: str, base_url: str, caches: Optional[Dict[str, Dict]] = None):
         """Initialize the Printful API client
         
         Args:
             api_key: Printful API key
             base_url: Printful API base URL
+            caches: Cache dictionaries by name to use instead of the session caches,
+                for clients running outside a Streamlit session. Missing ones are created.
         """
         self.api_key = api_key
         self.base_url = base_url
@@ -22,84 +96,250 @@ class PrintfulAPI:
             "Content-Type": "application/json"
         } if api_key else {"Content-Type": "application/json"}
         
-        # Initialize cache if not already in session state
-        if 'api_cache' not in st.session_state:
-            st.session_state.api_cache = {}
-        if 'store_products' not in st.session_state:
-            st.session_state.store_products = []
-        if 'product_variants_cache' not in st.session_state:
-            st.session_state.product_variants_cache = {}
-        if 'template_data_cache' not in st.session_state:
-            st.session_state.template_data_cache = {}
-        if 'mockup_styles_cache' not in st.session_state:
-            st.session_state.mockup_styles_cache = {}
-        if 'mockup_images_cache' not in st.session_state:
-            st.session_state.mockup_images_cache = {}
+        self.rate_limiter = get_rate_limiter(api_key)
+        # Priority class of the requests; background clients lower it to yield to the UI
+        self.priority = PRIORITY_INTERACTIVE
+        
+        self.session_bound = caches is None
+        
+        if self.session_bound:
+            # Initialize cache if not already in session state
+            if 'store_products' not in st.session_state:
+                st.session_state.store_products = []
+            for cache_name in CACHE_NAMES:
+                if cache_name not in st.session_state:
+                    st.session_state[cache_name] = {}
+            
+            self.store_products = st.session_state.store_products
+            caches = {cache_name: st.session_state[cache_name] for cache_name in CACHE_NAMES}
+        else:
+            self.store_products = []
+            for cache_name in CACHE_NAMES:
+                caches.setdefault(cache_name, {})
+        
+        # Keep references to the caches so the client also works from background
+        # threads, which have no access to st.session_state
+        for cache_name in CACHE_NAMES:
+            setattr(self, cache_name, caches[cache_name])
+        
+        if self.session_bound:
+            # Drop the entries changed by webhook events received since the last rerun;
+            # a new session starts at the latest event since its caches are empty anyway
+            if 'cache_invalidation_seq' not in st.session_state:
+                st.session_state.cache_invalidation_seq = get_invalidation_log().sequence
+            session_caches = dict(caches)
+            for cache_name in PRODUCT_CACHE_NAMES:
+                if cache_name in st.session_state:
+                    session_caches[cache_name] = st.session_state[cache_name]
+            with self.cache_lock:
+                st.session_state.cache_invalidation_seq = apply_pending_events(
+                    session_caches, st.session_state.cache_invalidation_seq, self.store_products
+                )
     
     def validate_api_key(self) -> bool:
-        """Validate the API key by making a test request
+        """Validate the API key with a cached probe request
+        
+        Results are cached per API key for API_KEY_VALIDATION_TTL seconds. Once half
+        of that lifetime has passed the cached result is still used while a background
+        thread probes the API again, so reruns never wait on validation.
         
         Returns:
             bool: True if the API key is valid, False otherwise
         """
         if not self.api_key:
             return False
+        
+        key_hash = hashlib.sha256(self.api_key.encode()).hexdigest()
+        
+        with _key_validation_lock:
+            entry = _key_validation_cache.get(key_hash)
+        
+        age = time.time() - entry["checked_at"] if entry else None
+        
+        if entry is None or age > API_KEY_VALIDATION_TTL:
+            # While the API is unavailable the last valid result is kept, so sessions
+            # continue with cached data instead of being locked out
+            if entry is not None and entry["status"] == "valid" and get_circuit_breaker(self.base_url).state != CIRCUIT_CLOSED:
+                return True
+            entry = self._probe_api_key(key_hash)
+        elif age > API_KEY_VALIDATION_TTL / 2:
+            with _key_validation_lock:
+                start_refresh = key_hash not in _key_validation_refreshing
+                _key_validation_refreshing.add(key_hash)
+            if start_refresh:
+                threading.Thread(target=self._probe_api_key, args=(key_hash,), daemon=True).start()
+        
+        if entry["status"] == "valid":
+            return True
+        elif entry["status"] == "invalid":
+            notify("error", "Invalid API key. Please check your API key and try again.")
+        elif entry["status"] == "error":
+            notify("warning", f"API connection issue: {entry['message']}")
+        else:
+            notify("error", f"Connection error: {entry['message']}")
+        return False
+    
+    def _probe_api_key(self, key_hash: str) -> Dict[str, Any]:
+        """Probe the API key against a lightweight endpoint and cache the outcome
+        
+        Safe to run outside the Streamlit script thread: it makes no Streamlit calls.
+        
+        Args:
+            key_hash: Hash of the API key used as cache key
             
-        test_url = f"{self.base_url}/store/products"
+        Returns:
+            Dict[str, Any]: Validation entry with "status", "message" and "checked_at"
+        """
+        breaker = get_circuit_breaker(self.base_url)
+        
         try:
-            response = requests.get(test_url, headers=self.headers)
+            if not breaker.allow_request():
+                raise CircuitOpenError(f"{breaker.host} is unavailable")
+            try:
+                response = requests.get(f"{self.base_url}{API_KEY_PROBE_ENDPOINT}", headers=self.headers,
+                                        timeout=API_KEY_PROBE_TIMEOUT)
+            except requests.RequestException:
+                breaker.record_failure()
+                raise
+            if response.status_code >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            
             if response.status_code == 200:
-                return True
+                entry = {"status": "valid", "message": ""}
             elif response.status_code == 401:
-                st.error("Invalid API key. Please check your API key and try again.")
-                return False
+                entry = {"status": "invalid", "message": response.text}
             else:
-                st.warning(f"API connection issue: {response.status_code} - {response.text}")
-                return False
+                entry = {"status": "error", "message": f"{response.status_code} - {response.text}"}
         except Exception as e:
-            st.error(f"Connection error: {e}")
-            return False
+            entry = {"status": "connection_error", "message": str(e)}
+        finally:
+            breaker.release_probe()
+        
+        entry["checked_at"] = time.time()
+        
+        with _key_validation_lock:
+            # Transient failures are not cached so the next rerun probes again
+            if entry["status"] in ("valid", "invalid"):
+                _key_validation_cache[key_hash] = entry
+            _key_validation_refreshing.discard(key_hash)
+        
+        return entry
     
-    def make_request(self, endpoint: str, params: Optional[Dict] = None, force_refresh: bool = False) -> Optional[Dict]:
-        """Make a request to the Printful API with caching and rate limiting
+    def get_cached(self, cache_name: str, key: Any, ttl_class: str) -> Any:
+        """Get a cache entry that is younger than the TTL of its endpoint class
+        
+        Entries without a timestamp, e.g. from older snapshots, count as stored now.
+        
+        Args:
+            cache_name: Name of the cache, one of CACHE_NAMES
+            key: Cache key
+            ttl_class: Key of CACHE_TTL
+            
+        Returns:
+            Any: Cached value, or None if it is missing or expired
+        """
+        cache = getattr(self, cache_name)
+        with self.cache_lock:
+            if key not in cache:
+                return None
+            
+            stored_at = self.cache_timestamps.setdefault(f"{cache_name}/{key}", time.time())
+            if time.time() - stored_at >= CACHE_TTL[ttl_class]:
+                return None
+            return cache[key]
+    
+    def set_cached(self, cache_name: str, key: Any, value: Any) -> None:
+        """Store a cache entry and its timestamp
+        
+        Args:
+            cache_name: Name of the cache, one of CACHE_NAMES
+            key: Cache key
+            value: Value to cache
+        """
+        with self.cache_lock:
+            getattr(self, cache_name)[key] = value
+            self.cache_timestamps[f"{cache_name}/{key}"] = time.time()
+    
+    def make_request(self, endpoint: str, params: Optional[Dict] = None, force_refresh: bool = False,
+                     model: Optional[type] = None) -> Optional[Dict]:
+        """Make a request to the Printful API with caching, rate limiting and a circuit breaker
+        
+        Server errors and timeouts count against the circuit breaker of the API host.
+        While it is open, and when a request fails, the cached response is returned
+        even if it expired.
         
         Args:
             endpoint: API endpoint
             params: Query parameters
             force_refresh: Force refresh data from API instead of using cache
+            model: Model class from src.api.models to decode the response into. Only the
+                decoded "result"/"data" member is returned and cached.
             
         Returns:
-            Optional[Dict]: API response or None if the request failed
+            Optional[Dict]: API response, the expired cached response if the API is
+            unavailable, or None if the request failed
         """
         url = f"{self.base_url}{endpoint}"
         cache_key = f"{endpoint}_{str(params)}"
+        cache_name = "catalog_api_cache" if endpoint.startswith(CATALOG_ENDPOINTS) else "api_cache"
         
         # Return cached result if available and not forcing refresh
-        if not force_refresh and cache_key in st.session_state.api_cache:
-            return st.session_state.api_cache[cache_key]
+        if not force_refresh:
+            cached = self.get_cached(cache_name, cache_key, get_ttl_class(endpoint))
+            if cached is not None:
+                return cached
         
-        try:
-            with st.spinner(f"Making request to {endpoint}..."):
-                response = requests.get(url, headers=self.headers, params=params)
-                
-                # Add a small delay to avoid rate limiting
-                time.sleep(0.5)
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    # Cache the result
-                    st.session_state.api_cache[cache_key] = result
-                    return result
-                elif response.status_code == 429:
-                    st.warning("Rate limit exceeded. Waiting 5 seconds before retrying...")
-                    time.sleep(5)
-                    return self.make_request(endpoint, params)
-                else:
-                    st.error(f"Error: {response.status_code} - {response.text}")
-                    return None
-        except Exception as e:
-            st.error(f"Request error: {e}")
-            return None
+        # While the API is unavailable, fail fast with whatever is cached, even if expired
+        with self.cache_lock:
+            stale = None if force_refresh else getattr(self, cache_name).get(cache_key)
+        breaker = get_circuit_breaker(self.base_url)
+        
+        for attempt in range(RATE_LIMIT_MAX_RETRIES + 1):
+            if not breaker.allow_request():
+                return stale
+            
+            try:
+                with spinner(f"Making request to {endpoint}..."):
+                    self.rate_limiter.acquire(self.priority)
+                    response = requests.get(url, headers=self.headers, params=params,
+                                            timeout=(REQUEST_CONNECT_TIMEOUT, API_READ_TIMEOUT))
+                    
+                    if response.status_code >= 500:
+                        breaker.record_failure()
+                    else:
+                        breaker.record_success()
+                    
+                    if response.status_code == 200:
+                        if model is not None:
+                            result = decode_response(response.content, model)
+                        else:
+                            result = json_loads(response.content)
+                        # Cache the result
+                        self.set_cached(cache_name, cache_key, result)
+                        return result
+                    elif response.status_code == 429 and attempt < RATE_LIMIT_MAX_RETRIES:
+                        notify("warning", "Rate limit exceeded. Waiting 5 seconds before retrying...")
+                        self.rate_limiter.penalize(5)
+                        continue
+                    elif response.status_code >= 500 and stale is not None:
+                        return stale
+                    else:
+                        notify("error", f"Error: {response.status_code} - {response.text}")
+                        return None
+            except requests.RequestException as e:
+                breaker.record_failure()
+                if stale is not None:
+                    return stale
+                notify("error", f"Request error: {e}")
+                return None
+            except Exception as e:
+                notify("error", f"Request error: {e}")
+                return None
+            finally:
+                # Also on errors and Streamlit reruns, so a half-open probe never stays taken
+                breaker.release_probe()
     
     def fetch_store_products(self, force_refresh: bool = False) -> List[Dict]:
         """Fetch all products from the store and their catalog product IDs with caching
@@ -110,41 +350,41 @@ class PrintfulAPI:
         Returns:
             List[Dict]: List of products
         """
-        if not force_refresh and st.session_state.store_products:
-            return st.session_state.store_products
+        with self.cache_lock:
+            stored_at = self.cache_timestamps.setdefault("store_products", time.time())
+        if not force_refresh and self.store_products and time.time() - stored_at < CACHE_TTL["store"]:
+            return self.store_products
         
-        products_data = self.make_request("/store/products")
+        products_data = self.make_request("/store/products", model=StoreProduct)
         if not products_data or "result" not in products_data:
-            st.error("Failed to fetch products from your store")
+            notify("error", "Failed to fetch products from your store")
             return []
         
         products = []
         for product in products_data["result"]:
-            product_id = product["id"]
+            product_id = product.id
             
-            product_details = self.make_request(f"/store/products/{product_id}")
+            product_details = self.make_request(f"/store/products/{product_id}", model=SyncProduct)
             
-            if product_details and "result" in product_details and "sync_variants" in product_details["result"]:
-                if product_details["result"]["sync_variants"]:
-                    catalog_product_id = product_details["result"]["sync_variants"][0]["product"]["product_id"]
-                    
-                    products.append({
-                        "id": product_id,
-                        "name": product["name"],
-                        "catalog_product_id": catalog_product_id
-                    })
-                else:
-                    products.append({
-                        "id": product_id,
-                        "name": product["name"]
-                    })
+            if product_details and "result" in product_details and product_details["result"].sync_variants:
+                catalog_product_id = product_details["result"].sync_variants[0].catalog_product_id
+                
+                products.append({
+                    "id": product_id,
+                    "name": product.name,
+                    "catalog_product_id": catalog_product_id
+                })
             else:
                 products.append({
                     "id": product_id,
-                    "name": product["name"]
+                    "name": product.name
                 })
         
-        st.session_state.store_products = products
+        self.store_products = products
+        with self.cache_lock:
+            self.cache_timestamps["store_products"] = time.time()
+        if self.session_bound:
+            st.session_state.store_products = products
         
         return products
     
@@ -158,34 +398,36 @@ class PrintfulAPI:
         Returns:
             Tuple[List[Dict], str, str]: Tuple of (variants, main_category_id, category_title)
         """
-        if not force_refresh and product_id in st.session_state.product_variants_cache:
-            return st.session_state.product_variants_cache[product_id]
+        if not force_refresh:
+            cached = self.get_cached("product_variants_cache", product_id, "stock")
+            if cached is not None:
+                return cached
         
-        product_details = self.make_request(f"/store/products/{product_id}")
+        product_details = self.make_request(f"/store/products/{product_id}", model=SyncProduct)
         
         variants = []
         main_category_id = ""
         category_title = ""
         
-        if product_details and "result" in product_details and "sync_variants" in product_details["result"]:
-            for variant in product_details["result"]["sync_variants"]:
-                variant_id = variant["id"]
-                catalog_variant_id = variant["product"]["variant_id"]
+        if product_details and "result" in product_details:
+            for variant in product_details["result"].sync_variants:
+                catalog_variant_id = variant.catalog_variant_id
                 
-                variant_details = self.make_request(f"/products/variant/{catalog_variant_id}")
+                variant_details = self.make_request(f"/products/variant/{catalog_variant_id}", model=CatalogVariant)
                 
                 size = ""
                 color_code = ""
                 in_stock = False
                 
                 if variant_details and "result" in variant_details:
-                    size = variant_details["result"]["variant"].get("size", "")
-                    color_code = variant_details["result"]["variant"].get("color_code", "")
-                    in_stock = variant_details["result"]["variant"].get("in_stock", False)
+                    catalog_variant = variant_details["result"]
+                    size = catalog_variant.size
+                    color_code = catalog_variant.color_code
+                    in_stock = catalog_variant.in_stock
                     
                     if not main_category_id:
-                        main_category_id = variant_details["result"]["product"].get("main_category_id", "")
-                        category_title = variant_details["result"]["product"].get("type", "")
+                        main_category_id = catalog_variant.main_category_id
+                        category_title = catalog_variant.product_type
                 
                 variants.append({
                     "catalog_variant_id": catalog_variant_id,
@@ -195,31 +437,32 @@ class PrintfulAPI:
                 })
         
         result = (variants, main_category_id, category_title)
-        st.session_state.product_variants_cache[product_id] = result
+        self.set_cached("product_variants_cache", product_id, result)
         
         return result
     
-    def get_catalog_variant_templates(self, catalog_product_id: str, catalog_variant_ids: List[str]) -> Dict:
-        """Get templates for specific catalog variants with caching
+    def get_catalog_templates(self, catalog_product_id: str, force_refresh: bool = False) -> Dict:
+        """Get every mockup template of a catalog product together with a variant index
+        
+        The listing is fetched once per catalog product and indexed by catalog variant ID,
+        so that lookups for any set of variants no longer scan every template.
         
         Args:
             catalog_product_id: Catalog product ID
-            catalog_variant_ids: List of catalog variant IDs
+            force_refresh: Force refresh data from API instead of using cache
             
         Returns:
-            Dict: Template data
+            Dict: Dictionary with the raw "templates" list and "by_variant" mapping
+            each catalog variant ID to the positions of its templates in that list
         """
-        cache_key = f"{catalog_product_id}_{catalog_variant_ids}"
+        cache_key = f"catalog_templates_{catalog_product_id}"
         
-        if cache_key in st.session_state.template_data_cache:
-            return st.session_state.template_data_cache[cache_key]
+        if not force_refresh:
+            cached = self.get_cached("template_data_cache", cache_key, "catalog")
+            if cached is not None:
+                return cached
         
-        if not isinstance(catalog_variant_ids, list):
-            catalog_variant_ids = catalog_variant_ids.split(",")
-            catalog_variant_ids = [int(id.strip()) for id in catalog_variant_ids]
-        
-        result = {"data": []}
-        template_dict = {}
+        templates = []
         
         offset = 0
         limit = 100
@@ -227,30 +470,164 @@ class PrintfulAPI:
         
         while has_more:
             endpoint = f"/v2/catalog-products/{catalog_product_id}/mockup-templates?limit={limit}&offset={offset}"
-            page_result = self.make_request(endpoint)
+            page_result = self.make_request(endpoint, force_refresh=force_refresh, model=MockupTemplate)
             
             if not page_result or "data" not in page_result:
                 break
             
-            for template in page_result["data"]:
-                template_variant_ids = template.get('catalog_variant_ids', [])
-                image_url = template.get('image_url', '')
-                
-                if any(variant_id in template_variant_ids for variant_id in catalog_variant_ids):
-                    if image_url not in template_dict:
-                        template_dict[image_url] = template
-                        result["data"].append(template)
+            templates.extend(page_result["data"])
             
             if len(page_result["data"]) < limit:
                 has_more = False
             else:
                 offset += limit
         
+        by_variant = {}
+        for position, template in enumerate(templates):
+            for variant_id in template.catalog_variant_ids:
+                by_variant.setdefault(variant_id, []).append(position)
+        
+        result = {"templates": templates, "by_variant": by_variant}
+        
+        if templates:
+            self.set_cached("template_data_cache", cache_key, result)
+        
+        return result
+    
+    def get_catalog_variant_templates(self, catalog_product_id: str, catalog_variant_ids: List[str]) -> Dict:
+        """Get templates for specific catalog variants with caching
+        
+        Args:
+            catalog_product_id: Catalog product ID
+            catalog_variant_ids: List of catalog variant IDs
+            
+        Returns:
+            Dict: Template data
+        """
+        cache_key = f"{catalog_product_id}_{catalog_variant_ids}"
+        
+        cached = self.get_cached("template_data_cache", cache_key, "catalog")
+        if cached is not None:
+            return cached
+        
+        if not isinstance(catalog_variant_ids, list):
+            catalog_variant_ids = catalog_variant_ids.split(",")
+            catalog_variant_ids = [int(id.strip()) for id in catalog_variant_ids]
+        
+        catalog_templates = self.get_catalog_templates(catalog_product_id)
+        templates = catalog_templates["templates"]
+        
+        # Union of the indexed positions keeps the original listing order
+        positions = set()
+        for variant_id in catalog_variant_ids:
+            positions.update(catalog_templates["by_variant"].get(variant_id, []))
+        
+        result = {"data": []}
+        template_dict = {}
+        
+        for position in sorted(positions):
+            template = templates[position]
+            image_url = template.get('image_url', '')
+            
+            if image_url not in template_dict:
+                template_dict[image_url] = template
+                result["data"].append(template)
+        
         if result:
-            st.session_state.template_data_cache[cache_key] = result
+            self.set_cached("template_data_cache", cache_key, result)
         
         return result
     
+    @staticmethod
+    def get_template_index_key(catalog_product_id: str, variants: List[Dict]) -> str:
+        """Get the template_index_cache key of a catalog product and variant set
+        
+        Args:
+            catalog_product_id: Catalog product ID
+            variants: Variants as returned by get_product_variants
+            
+        Returns:
+            str: Cache key
+        """
+        return f"{catalog_product_id}_{[variant['catalog_variant_id'] for variant in variants]}"
+    
+    def get_template_index(self, catalog_product_id: str, variants: List[Dict]) -> Dict:
+        """Get the template lookup index for a set of store variants with caching
+        
+        Builds, once per catalog product and variant set, every mapping the template UI
+        needs: templates per placement, per variant and per supported size set, along with
+        the sizes and techniques shown in template labels.
+        
+        Args:
+            catalog_product_id: Catalog product ID
+            variants: Variants as returned by get_product_variants
+            
+        Returns:
+            Dict: Template index with the keys "templates", "placements", "by_placement",
+            "by_variant", "by_size", "sizes" and "techniques". Per-placement mappings
+            hold positions into "templates".
+        """
+        catalog_variant_ids = [variant["catalog_variant_id"] for variant in variants]
+        cache_key = self.get_template_index_key(catalog_product_id, variants)
+        
+        cached = self.get_cached("template_index_cache", cache_key, "catalog")
+        if cached is not None:
+            return cached
+        
+        templates = self.get_catalog_variant_templates(catalog_product_id, catalog_variant_ids).get("data", [])
+        
+        variant_order = {}
+        for order, variant in enumerate(variants):
+            variant_order.setdefault(variant["catalog_variant_id"], order)
+        
+        index = {
+            "templates": templates,
+            "placements": [],
+            "by_placement": {},
+            "by_variant": {},
+            "by_size": {},
+            "sizes": [],
+            "techniques": {}
+        }
+        
+        for position, template in enumerate(templates):
+            placement = template.get('placement')
+            image_url = template.get('image_url', '')
+            
+            # Variants of this template in store variant order
+            orders = sorted(variant_order[variant_id] for variant_id in set(template.get('catalog_variant_ids', []))
+                            if variant_id in variant_order)
+            
+            sizes = []
+            for order in orders:
+                size = variants[order]["size"]
+                if size not in sizes:
+                    sizes.append(size)
+            index["sizes"].append(sizes)
+            
+            index["techniques"].setdefault(image_url, [])
+            technique = template.get('technique', 'Unknown')
+            if technique not in index["techniques"][image_url]:
+                index["techniques"][image_url].append(technique)
+            
+            if not placement:
+                continue
+            
+            index["by_placement"].setdefault(placement, []).append(position)
+            
+            placement_variants = index["by_variant"].setdefault(placement, {})
+            for order in orders:
+                placement_variants.setdefault(variants[order]["catalog_variant_id"], []).append(position)
+            
+            size_key = tuple(sorted(sizes))
+            index["by_size"].setdefault(placement, {}).setdefault(size_key, []).append(position)
+        
+        index["placements"] = sorted(index["by_placement"])
+        
+        self.set_cached("template_index_cache", cache_key, index)
+        
+        return index
+    
     def get_mockup_styles(self, catalog_product_id: str, force_refresh: bool = False) -> Tuple[Dict, Optional[int], Optional[int], Optional[int], Optional[str], Optional[str]]:
         """Get mockup styles for a catalog product with caching
         
@@ -264,8 +641,10 @@ class PrintfulAPI:
         """
         cache_key = f"mockup_styles_{catalog_product_id}"
         
-        if not force_refresh and cache_key in st.session_state.mockup_styles_cache:
-            return st.session_state.mockup_styles_cache[cache_key]
+        if not force_refresh:
+            cached = self.get_cached("mockup_styles_cache", cache_key, "catalog")
+            if cached is not None:
+                return cached
         
         result = {"data": []}
         
@@ -281,7 +660,7 @@ class PrintfulAPI:
         
         while has_more:
             endpoint = f"/v2/catalog-products/{catalog_product_id}/mockup-styles?limit={limit}&offset={offset}"
-            page_result = self.make_request(endpoint)
+            page_result = self.make_request(endpoint, model=MockupStyleGroup)
             
             if not page_result or "data" not in page_result:
                 break
@@ -291,11 +670,11 @@ class PrintfulAPI:
             
             if page_result["data"] and extracted == False:
                 first_style = page_result["data"][0]
-                print_area_width = first_style.get('print_area_width')
-                print_area_height = first_style.get('print_area_height')
-                dpi = first_style.get('dpi')
-                print_area_type = first_style.get('print_area_type')
-                technique = first_style.get('technique')
+                print_area_width = first_style.print_area_width
+                print_area_height = first_style.print_area_height
+                dpi = first_style.dpi
+                print_area_type = first_style.print_area_type
+                technique = first_style.technique
                 extracted = True
             
             if len(page_result["data"]) < limit:
@@ -304,51 +683,156 @@ class PrintfulAPI:
                 offset += limit
         
         if result and result["data"]:
-            st.session_state.mockup_styles_cache[cache_key] = result, print_area_width, print_area_height, dpi, print_area_type, technique
+            self.set_cached("mockup_styles_cache", cache_key,
+                            (result, print_area_width, print_area_height, dpi, print_area_type, technique))
         
         return result, print_area_width, print_area_height, dpi, print_area_type, technique
     
-    def get_mockup_images(self, catalog_product_id: str, mockup_style_id: str, force_refresh: bool = False) -> Dict:
-        """Get mockup images for a specific mockup style with caching
+    def iter_mockup_images(self, catalog_product_id: str, mockup_style_ids: Union[str, int, List],
+                           force_refresh: bool = False) -> Iterator[VariantMockupImages]:
+        """Iterate over the mockup images of one or more mockup styles
+        
+        Pages are only requested as the iterator advances, so callers that stop early
+        skip the remaining pages. Every page is cached like any other request.
         
         Args:
             catalog_product_id: Catalog product ID
-            mockup_style_id: Mockup style ID
+            mockup_style_ids: Mockup style ID or list of IDs, requested together
             force_refresh: Force refresh data from API instead of using cache
             
-        Returns:
-            Dict: Mockup images data
+        Yields:
+            VariantMockupImages: Mockup images of one catalog variant
         """
-        cache_key = f"mockup_images_{catalog_product_id}_{mockup_style_id}"
-        
-        if not force_refresh and cache_key in st.session_state.mockup_images_cache:
-            return st.session_state.mockup_images_cache[cache_key]
-        
-        result = {"data": []}
+        if isinstance(mockup_style_ids, (list, tuple)):
+            mockup_style_ids = ",".join(str(style_id) for style_id in mockup_style_ids)
         
         offset = 0
         limit = 20
-        has_more = True
         
-        while has_more:
-            endpoint = f"/v2/catalog-products/{catalog_product_id}/images?mockup_style_ids={mockup_style_id}&limit={limit}&offset={offset}"
-            page_result = self.make_request(endpoint)
+        while True:
+            endpoint = f"/v2/catalog-products/{catalog_product_id}/images?mockup_style_ids={mockup_style_ids}&limit={limit}&offset={offset}"
+            page_result = self.make_request(endpoint, force_refresh=force_refresh, model=VariantMockupImages)
             
             if not page_result or "data" not in page_result:
-                break
+                return
             
-            result["data"].extend(page_result["data"])
+            yield from page_result["data"]
             
             if len(page_result["data"]) < limit:
-                has_more = False
-            else:
-                offset += limit
+                return
+            offset += limit
+    
+    def get_mockup_images(self, catalog_product_id: str, mockup_style_ids: Union[str, int, List],
+                          force_refresh: bool = False, max_images: Optional[int] = None) -> Dict:
+        """Get mockup images for one or more mockup styles with caching
+        
+        Args:
+            catalog_product_id: Catalog product ID
+            mockup_style_ids: Mockup style ID or list of IDs, requested together
+            force_refresh: Force refresh data from API instead of using cache
+            max_images: Stop paging once this many image URLs were found. Such partial
+                results are not stored in the mockup images cache.
+            
+        Returns:
+            Dict: Mockup images data
+        """
+        if isinstance(mockup_style_ids, (list, tuple)):
+            mockup_style_ids = ",".join(str(style_id) for style_id in mockup_style_ids)
+        
+        cache_key = f"mockup_images_{catalog_product_id}_{mockup_style_ids}"
+        
+        if not force_refresh:
+            cached = self.get_cached("mockup_images_cache", cache_key, "catalog")
+            if cached is not None:
+                return cached
+        
+        result = {"data": []}
+        image_count = 0
+        
+        for variant_images in self.iter_mockup_images(catalog_product_id, mockup_style_ids, force_refresh):
+            result["data"].append(variant_images)
+            image_count += sum(1 for image in variant_images.images if image.image_url)
+            
+            if max_images and image_count >= max_images:
+                return result
         
         if result and result["data"]:
-            st.session_state.mockup_images_cache[cache_key] = result
+            self.set_cached("mockup_images_cache", cache_key, result)
         
         return result
     
+    def refresh_stock(self, catalog_variant_ids: Optional[List[int]] = None) -> int:
+        """Re-read the availability of catalog variants and patch it into the cached data
+        
+        Only the availability endpoint is requested, concurrently for all variants, and
+        the in_stock values of the cached variant lists, variant details and rendered
+        records are updated in place under cache_lock, as background jobs and the
+        prefetcher read the same data. Nothing else is fetched again.
+        
+        Args:
+            catalog_variant_ids: Catalog variant IDs, defaults to every variant in the
+                cached variant lists
+            
+        Returns:
+            int: Number of variants whose availability was refreshed
+        """
+        if catalog_variant_ids is None:
+            with self.cache_lock:
+                catalog_variant_ids = sorted({
+                    variant["catalog_variant_id"]
+                    for variants, _, _ in self.product_variants_cache.values()
+                    for variant in variants
+                })
+        
+        # Bulk refreshes yield to the requests of the page
+        refresh_api = copy.copy(self)
+        refresh_api.priority = max(self.priority, PRIORITY_EXPORT)
+        
+        def fetch_availability(variant_id):
+            response = refresh_api.make_request(f"/v2/catalog-variants/{variant_id}/availability", force_refresh=True,
+                                         model=VariantAvailability)
+            in_stock = response["data"].in_stock if response and "data" in response else None
+            return variant_id, in_stock
+        
+        with ThreadPoolExecutor(max_workers=STOCK_REFRESH_MAX_WORKERS) as executor:
+            stock = {
+                variant_id: in_stock
+                for variant_id, in_stock in executor.map(fetch_availability, catalog_variant_ids)
+                if in_stock is not None
+            }
+        
+        now = time.time()
+        
+        with self.cache_lock:
+            for product_id, (variants, _, _) in self.product_variants_cache.items():
+                for variant in variants:
+                    if variant["catalog_variant_id"] in stock:
+                        variant["in_stock"] = stock[variant["catalog_variant_id"]]
+                if all(variant["catalog_variant_id"] in stock for variant in variants):
+                    self.cache_timestamps[f"product_variants_cache/{product_id}"] = now
+            
+            for variant_id, in_stock in stock.items():
+                cache_key = f"/products/variant/{variant_id}_None"
+                response = self.catalog_api_cache.get(cache_key)
+                if response and "result" in response:
+                    response["result"].in_stock = in_stock
+                    self.cache_timestamps[f"catalog_api_cache/{cache_key}"] = now
+            
+            # Rendered records keep their own copies of the variant data
+            if self.session_bound:
+                for cache_name in RECORDS_CACHE_NAMES:
+                    for records in st.session_state.get(cache_name, {}).values():
+                        for record in records if isinstance(records, list) else [records]:
+                            for variant in record.get("variants", []):
+                                if variant.get("catalog_variant_id") in stock:
+                                    variant["in_stock"] = stock[variant["catalog_variant_id"]]
+                            if record.get("variant_id") in stock:
+                                record["variant_in_stock"] = stock[record["variant_id"]]
+            
+            PrintfulAPI.cache_generation += 1
+        
+        return len(stock)
+    
     def make_post_request(self, endpoint: str, data: Dict) -> Optional[Dict]:
         """Make a POST request to the Printful API
         
@@ -360,29 +844,44 @@ class PrintfulAPI:
             Optional[Dict]: API response or None if the request failed
         """
         url = f"{self.base_url}{endpoint}"
+        headers = self.headers.copy()
+        headers["Content-Type"] = "application/json"
+        breaker = get_circuit_breaker(self.base_url)
         
-        try:
-            with st.spinner(f"Making POST request to {endpoint}..."):
-                headers = self.headers.copy()
-                headers["Content-Type"] = "application/json"
-                
-                response = requests.post(url, headers=headers, json=data)
-                
-                # Add a small delay to avoid rate limiting
-                time.sleep(0.5)
-                
-                if response.status_code in [200, 201]:
-                    return response.json()
-                elif response.status_code == 429:
-                    st.warning("Rate limit exceeded. Waiting 5 seconds before retrying...")
-                    time.sleep(5)
-                    return self.make_post_request(endpoint, data)
-                else:
-                    st.error(f"Error: {response.status_code} - {response.text}")
-                    return None
-        except Exception as e:
-            st.error(f"Request error: {e}")
-            return None
+        for attempt in range(RATE_LIMIT_MAX_RETRIES + 1):
+            if not breaker.allow_request():
+                st.error(f"The Printful API is unavailable, retrying in {breaker.retry_in:.0f} seconds")
+                return None
+            
+            try:
+                with st.spinner(f"Making POST request to {endpoint}..."):
+                    self.rate_limiter.acquire(self.priority)
+                    try:
+                        response = requests.post(url, headers=headers, data=json_dumps(data, compact=True),
+                                                 timeout=(REQUEST_CONNECT_TIMEOUT, API_READ_TIMEOUT))
+                    except requests.RequestException:
+                        breaker.record_failure()
+                        raise
+                    
+                    if response.status_code >= 500:
+                        breaker.record_failure()
+                    else:
+                        breaker.record_success()
+                    
+                    if response.status_code in [200, 201]:
+                        return json_loads(response.content)
+                    elif response.status_code == 429 and attempt < RATE_LIMIT_MAX_RETRIES:
+                        st.warning("Rate limit exceeded. Waiting 5 seconds before retrying...")
+                        self.rate_limiter.penalize(5)
+                        continue
+                    else:
+                        st.error(f"Error: {response.status_code} - {response.text}")
+                        return None
+            except Exception as e:
+                st.error(f"Request error: {e}")
+                return None
+            finally:
+                breaker.release_probe()
     
     def upload_file(self, file_data: bytes) -> Optional[Dict]:
         """Upload a file to the Printful API
@@ -396,34 +895,53 @@ class PrintfulAPI:
         endpoint = "/files"
         url = f"{self.base_url}{endpoint}"
         
-        try:
-            with st.spinner("Uploading file to Printful..."):
-                # Encode file data as base64
-                file_content_b64 = base64.b64encode(file_data).decode('utf-8')
-                
-                # Prepare data for file upload
-                data = {
-                    "file": file_content_b64
-                }
-                
-                headers = self.headers.copy()
-                headers["Content-Type"] = "application/json"
-                
-                response = requests.post(url, headers=headers, json=data)
-                
-                if response.status_code in [200, 201]:
-                    result = response.json()
-                    return result
-                elif response.status_code == 429:
-                    st.warning("Rate limit exceeded. Waiting 5 seconds before retrying...")
-                    time.sleep(5)
-                    return self.upload_file(file_data)
-                else:
-                    st.error(f"Error uploading file: {response.status_code} - {response.text}")
-                    return None
-        except Exception as e:
-            st.error(f"File upload error: {e}")
-            return None
+        # Encode file data as base64
+        file_content_b64 = base64.b64encode(file_data).decode('utf-8')
+        
+        # Prepare data for file upload
+        data = {
+            "file": file_content_b64
+        }
+        
+        headers = self.headers.copy()
+        headers["Content-Type"] = "application/json"
+        breaker = get_circuit_breaker(self.base_url)
+        
+        for attempt in range(RATE_LIMIT_MAX_RETRIES + 1):
+            if not breaker.allow_request():
+                st.error(f"The Printful API is unavailable, retrying in {breaker.retry_in:.0f} seconds")
+                return None
+            
+            try:
+                with st.spinner("Uploading file to Printful..."):
+                    self.rate_limiter.acquire(self.priority)
+                    try:
+                        response = requests.post(url, headers=headers, data=json_dumps(data, compact=True),
+                                                 timeout=(REQUEST_CONNECT_TIMEOUT, API_READ_TIMEOUT))
+                    except requests.RequestException:
+                        breaker.record_failure()
+                        raise
+                    
+                    if response.status_code >= 500:
+                        breaker.record_failure()
+                    else:
+                        breaker.record_success()
+                    
+                    if response.status_code in [200, 201]:
+                        result = json_loads(response.content)
+                        return result
+                    elif response.status_code == 429 and attempt < RATE_LIMIT_MAX_RETRIES:
+                        st.warning("Rate limit exceeded. Waiting 5 seconds before retrying...")
+                        self.rate_limiter.penalize(5)
+                        continue
+                    else:
+                        st.error(f"Error uploading file: {response.status_code} - {response.text}")
+                        return None
+            except Exception as e:
+                st.error(f"File upload error: {e}")
+                return None
+            finally:
+                breaker.release_probe()
     
     def generate_mockup(self, product_id: str, variant_id: str, placement: str, uploaded_file_id: str) -> Optional[Dict]:
         """Generate a mockup using an uploaded file
@@ -437,15 +955,12 @@ class PrintfulAPI:
         Returns:
             Optional[Dict]: Mockup generation result or None if generation failed
         """
-        # Initialize generated_mockups_cache if not already in session state
-        if 'generated_mockups_cache' not in st.session_state:
-            st.session_state.generated_mockups_cache = {}
-            
         cache_key = f"mockup_{product_id}_{variant_id}_{placement}_{uploaded_file_id}"
         
         # Check if mockup is already in cache
-        if cache_key in st.session_state.generated_mockups_cache:
-            return st.session_state.generated_mockups_cache[cache_key]
+        cached = self.generated_mockups_cache.get(cache_key)
+        if cached is not None:
+            return cached
         
         endpoint = "/mockup-generator/create-task"
         
@@ -487,7 +1002,8 @@ class PrintfulAPI:
                 
                 if status == "completed":
                     # Cache the result
-                    st.session_state.generated_mockups_cache[cache_key] = status_result
+                    with self.cache_lock:
+                        self.generated_mockups_cache[cache_key] = status_result
                     return status_result
                 elif status == "failed":
                     st.error("Mockup generation failed")
@@ -501,11 +1017,8 @@ class PrintfulAPI:
     
     def clear_cache(self) -> None:
         """Clear all cached data"""
-        st.session_state.api_cache = {}
-        st.session_state.product_variants_cache = {}
-        st.session_state.template_data_cache = {}
-        st.session_state.mockup_styles_cache = {}
-        st.session_state.mockup_images_cache = {}
-        if 'generated_mockups_cache' in st.session_state:
-            st.session_state.generated_mockups_cache = {}
+        # Clear in place so background clients holding the same caches see it too
+        with self.cache_lock:
+            for cache_name in CACHE_NAMES:
+                getattr(self, cache_name).clear()
         st.success("Cache cleared successfully!")
\ No newline at end of file
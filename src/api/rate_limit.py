@@ -0,0 +1,143 @@
+import time
+import hashlib
+import threading
+from typing import Dict
+
+from config import RATE_LIMIT_REQUESTS, RATE_LIMIT_PERIOD, RATE_LIMIT_BURST, EXPORT_RATE_RESERVE, PREFETCH_RATE_RESERVE
+
+# Request priority classes, highest first
+PRIORITY_INTERACTIVE = 0  # Requests the user is waiting for on the page
+PRIORITY_EXPORT = 1  # Bulk exports and stock refreshes
+PRIORITY_PREFETCH = 2  # Speculative cache warming
+
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_EXPORT: "export", PRIORITY_PREFETCH: "prefetch"}
+
+# Tokens each priority class leaves untouched for the classes above it
+PRIORITY_RESERVES = {PRIORITY_INTERACTIVE: 0, PRIORITY_EXPORT: EXPORT_RATE_RESERVE, PRIORITY_PREFETCH: PREFETCH_RATE_RESERVE}
+
+class RateLimiter:
+    """Token bucket shared by every request made with one API key
+    
+    Tokens refill continuously at RATE_LIMIT_REQUESTS per RATE_LIMIT_PERIOD seconds,
+    up to RATE_LIMIT_BURST tokens. Callers acquire tokens with a priority class:
+    
+    - A class only takes a token while more than its reserve (PRIORITY_RESERVES) is
+      left, so idle headroom stays available to the classes above it.
+    - While a caller of a higher class waits for a token, lower classes do not get
+      one, so the next token always goes to the most important waiting request.
+    """
+    
+    def __init__(self, requests_per_period: int = RATE_LIMIT_REQUESTS, period: float = RATE_LIMIT_PERIOD,
+                 burst: int = RATE_LIMIT_BURST):
+        """Initialize the rate limiter
+        
+        Args:
+            requests_per_period: Number of requests allowed per period
+            period: Period length in seconds
+            burst: Maximum number of tokens that can accumulate
+        """
+        self.rate = requests_per_period / period
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+        self.condition = threading.Condition(self.lock)
+        self.waiting = {priority: 0 for priority in PRIORITY_RESERVES}
+        # Granted tokens and total seconds waited per priority class
+        self.granted = {priority: 0 for priority in PRIORITY_RESERVES}
+        self.waited = {priority: 0.0 for priority in PRIORITY_RESERVES}
+    
+    def _refill(self) -> None:
+        """Add the tokens accumulated since the last update (lock must be held)"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+    
+    def _can_take(self, priority: int) -> bool:
+        """Check whether a caller of a priority class may take a token (lock must be held)"""
+        if any(self.waiting[higher] for higher in self.waiting if higher < priority):
+            return False
+        return self.tokens >= PRIORITY_RESERVES[priority] + 1
+    
+    def try_acquire(self, priority: int = PRIORITY_INTERACTIVE) -> bool:
+        """Take a token if the priority class may have one right now
+        
+        Args:
+            priority: Priority class of the request
+        
+        Returns:
+            bool: True if a token was taken, False otherwise
+        """
+        with self.lock:
+            self._refill()
+            if self._can_take(priority):
+                self.tokens -= 1
+                self.granted[priority] += 1
+                return True
+            return False
+    
+    def acquire(self, priority: int = PRIORITY_INTERACTIVE) -> None:
+        """Block until a token can be taken
+        
+        Args:
+            priority: Priority class of the request
+        """
+        started_at = time.monotonic()
+        
+        with self.condition:
+            self.waiting[priority] += 1
+            try:
+                while True:
+                    self._refill()
+                    if self._can_take(priority):
+                        self.tokens -= 1
+                        break
+                    wait = (PRIORITY_RESERVES[priority] + 1 - self.tokens) / self.rate
+                    self.condition.wait(max(wait, 0.01))
+            finally:
+                self.waiting[priority] -= 1
+                # Lower classes may have been held back by this caller
+                self.condition.notify_all()
+            
+            self.granted[priority] += 1
+            self.waited[priority] += time.monotonic() - started_at
+    
+    def get_average_waits(self) -> Dict[str, float]:
+        """Get the average time requests waited for a token, per priority class
+        
+        Returns:
+            Dict[str, float]: Seconds by priority class name, for classes with requests
+        """
+        with self.lock:
+            return {PRIORITY_NAMES[priority]: self.waited[priority] / self.granted[priority]
+                    for priority in self.granted if self.granted[priority]}
+    
+    def penalize(self, seconds: float) -> None:
+        """Drain the bucket after the API reported a rate limit violation
+        
+        Args:
+            seconds: Time in seconds until requests may resume
+        """
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+# Rate limiters shared by all sessions, keyed by a hash of the API key
+_rate_limiters: Dict[str, RateLimiter] = {}
+_rate_limiters_lock = threading.Lock()
+
+def get_rate_limiter(api_key: str) -> RateLimiter:
+    """Get the process-wide rate limiter of an API key
+    
+    Args:
+        api_key: Printful API key
+    
+    Returns:
+        RateLimiter: Rate limiter shared by every client using this key
+    """
+    key_hash = hashlib.sha256(api_key.encode()).hexdigest()
+    
+    with _rate_limiters_lock:
+        if key_hash not in _rate_limiters:
+            _rate_limiters[key_hash] = RateLimiter()
+        return _rate_limiters[key_hash]
\ No newline at end of file
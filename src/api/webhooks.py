@@ -0,0 +1,377 @@
+import sys
+import hmac
+import json
+import threading
+import urllib.request
+from urllib.parse import urlsplit, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_LOG_SIZE
+
+# Printful events that change store products
+STORE_PRODUCT_EVENTS = ("product_synced", "product_updated", "product_deleted")
+
+# Printful events that only change the stock of catalog variants
+STOCK_EVENTS = ("stock_updated", "catalog_stock_updated")
+
+# Caches of rendered records, keyed by "<store product ID>_..."
+RECORDS_CACHE_NAMES = ["template_records_cache", "mockup_records_cache"]
+
+# Caches of data derived per store product, keyed the same way: the records caches and
+# the grouped templates of each placement
+PRODUCT_CACHE_NAMES = RECORDS_CACHE_NAMES + ["template_selection_cache"]
+
+def _ids(values: Any) -> List[int]:
+    """Get the valid IDs of a list from a webhook payload, skipping anything else"""
+    ids = []
+    for value in values if isinstance(values, (list, dict)) else [values]:
+        try:
+            ids.append(int(value))
+        except (TypeError, ValueError):
+            continue
+    return ids
+
+def parse_event(payload: Any) -> Optional[Dict[str, Any]]:
+    """Extract what a Printful webhook event changed
+    
+    Args:
+        payload: Decoded webhook request body
+    
+    Returns:
+        Optional[Dict[str, Any]]: Event with "type", "store_product_ids", "catalog_product_ids",
+        "catalog_variant_ids" and "catalog_changed", or None for events that do not affect
+        any cached data
+    
+    Raises:
+        ValueError: If the payload is not a webhook event object
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("Webhook payload is not an object")
+    
+    event_type = payload.get("type", "")
+    data = payload.get("data") or {}
+    if not isinstance(event_type, str) or not isinstance(data, dict):
+        raise ValueError("Webhook payload has no valid type or data")
+    
+    event = {
+        "type": event_type,
+        "store_product_ids": [],
+        "catalog_product_ids": [],
+        "catalog_variant_ids": [],
+        "catalog_changed": False,
+    }
+    
+    if event_type in STORE_PRODUCT_EVENTS:
+        sync_product = data.get("sync_product")
+        if isinstance(sync_product, dict):
+            event["store_product_ids"].extend(_ids(sync_product.get("id")))
+    elif event_type in STOCK_EVENTS or event_type.startswith("catalog_"):
+        event["catalog_product_ids"].extend(_ids(data.get("product_ids")))
+        event["catalog_product_ids"].extend(_ids(data.get("catalog_product_id")))
+        event["catalog_variant_ids"].extend(_ids(data.get("used_variants")))
+        event["catalog_variant_ids"].extend(_ids(data.get("catalog_variant_ids")))
+        event["catalog_variant_ids"].extend(_ids(data.get("variant_stock")))
+        event["catalog_changed"] = event_type not in STOCK_EVENTS
+    else:
+        return None
+    
+    return event
+
+def _drop(cache: Dict, predicate) -> int:
+    """Remove the entries whose key matches a predicate, returning how many were removed"""
+    keys = [key for key in cache if predicate(str(key))]
+    for key in keys:
+        cache.pop(key, None)
+    return len(keys)
+
+def invalidate_caches(caches: Dict[str, Any], event: Dict[str, Any], store_products: Optional[List[Dict]] = None) -> int:
+    """Remove the cache entries affected by a webhook event
+    
+    Args:
+        caches: Cache dictionaries by name, see CACHE_NAMES and PRODUCT_CACHE_NAMES.
+            Missing caches are skipped.
+        event: Event returned by parse_event()
+        store_products: Store product list of the session. Changed products are removed
+            from it in place and the list is marked as expired, so it is fetched again
+            with the unchanged product details coming from the cache
+    
+    Returns:
+        int: Number of removed cache entries
+    """
+    empty = {}
+    api_cache = caches.get("api_cache", empty)
+    catalog_api_cache = caches.get("catalog_api_cache", empty)
+    product_variants_cache = caches.get("product_variants_cache", empty)
+    
+    store_product_ids = {str(product_id) for product_id in event["store_product_ids"]}
+    catalog_product_ids = {str(product_id) for product_id in event["catalog_product_ids"]}
+    variant_ids = {str(variant_id) for variant_id in event["catalog_variant_ids"]}
+    
+    # Catalog variants cached for the affected catalog products
+    for key, response in catalog_api_cache.items():
+        if key.startswith("/products/variant/") and "result" in response:
+            if str(response["result"].get("catalog_product_id")) in catalog_product_ids:
+                variant_ids.add(str(response["result"].get("id")))
+    
+    # Store products built from the affected catalog products or variants
+    for product in store_products or []:
+        if str(product.get("catalog_product_id")) in catalog_product_ids:
+            store_product_ids.add(str(product["id"]))
+    for product_id, (variants, _, _) in product_variants_cache.items():
+        if any(str(variant["catalog_variant_id"]) in variant_ids for variant in variants):
+            store_product_ids.add(str(product_id))
+    
+    removed = 0
+    
+    removed += _drop(catalog_api_cache, lambda key: key.startswith("/products/variant/")
+                     and key[len("/products/variant/"):].split("_", 1)[0] in variant_ids)
+    removed += _drop(product_variants_cache, lambda key: key in store_product_ids)
+    for cache_name in PRODUCT_CACHE_NAMES:
+        removed += _drop(caches.get(cache_name, empty), lambda key: key.split("_", 1)[0] in store_product_ids)
+    
+    if event["type"] in STORE_PRODUCT_EVENTS:
+        removed += _drop(api_cache, lambda key: key.startswith("/store/products_") or (
+            key.startswith("/store/products/") and key[len("/store/products/"):].split("_", 1)[0] in store_product_ids
+        ))
+        if store_products:
+            changed = [product for product in store_products if str(product.get("id")) in store_product_ids]
+            for product in changed:
+                store_products.remove(product)
+            removed += len(changed)
+        if "cache_timestamps" in caches:
+            caches["cache_timestamps"]["store_products"] = 0
+    
+    if event["catalog_changed"]:
+        for catalog_product_id in catalog_product_ids:
+            removed += _drop(catalog_api_cache, lambda key: f"/catalog-products/{catalog_product_id}/" in key)
+            removed += _drop(caches.get("template_data_cache", empty),
+                             lambda key: key == f"catalog_templates_{catalog_product_id}"
+                             or key.startswith(f"{catalog_product_id}_"))
+            removed += _drop(caches.get("mockup_styles_cache", empty),
+                             lambda key: key == f"mockup_styles_{catalog_product_id}")
+            removed += _drop(caches.get("mockup_images_cache", empty),
+                             lambda key: key.startswith(f"mockup_images_{catalog_product_id}_"))
+            removed += _drop(caches.get("template_index_cache", empty),
+                             lambda key: key.startswith(f"{catalog_product_id}_"))
+    
+    return removed
+
+class InvalidationLog:
+    """Process-wide log of received webhook events
+    
+    Sessions keep their own caches, which the receiver thread cannot reach. Events are
+    therefore numbered and kept here, and each session applies the events it has not
+    seen yet on its next rerun.
+    """
+    
+    def __init__(self, max_events: int = WEBHOOK_LOG_SIZE):
+        """Initialize the log
+        
+        Args:
+            max_events: Number of events kept; sessions further behind clear their caches
+        """
+        self.max_events = max_events
+        self.events: List[Tuple[int, Dict[str, Any]]] = []
+        self.sequence = 0
+        self.lock = threading.Lock()
+    
+    def append(self, event: Dict[str, Any]) -> int:
+        """Add an event
+        
+        Args:
+            event: Event returned by parse_event()
+        
+        Returns:
+            int: Sequence number of the event
+        """
+        with self.lock:
+            self.sequence += 1
+            self.events.append((self.sequence, event))
+            del self.events[:-self.max_events]
+            return self.sequence
+    
+    def since(self, sequence: int) -> Tuple[Optional[List[Dict[str, Any]]], int]:
+        """Get the events after a sequence number
+        
+        Args:
+            sequence: Sequence number of the last applied event
+        
+        Returns:
+            Tuple[Optional[List[Dict[str, Any]]], int]: Tuple of (events, latest_sequence).
+            Events is None if some of them were already dropped from the log.
+        """
+        with self.lock:
+            if self.events and sequence < self.events[0][0] - 1:
+                return None, self.sequence
+            return [event for event_sequence, event in self.events if event_sequence > sequence], self.sequence
+
+# Log shared by all sessions
+_invalidation_log = InvalidationLog()
+
+def get_invalidation_log() -> InvalidationLog:
+    """Get the process-wide invalidation log
+    
+    Returns:
+        InvalidationLog: Shared log
+    """
+    return _invalidation_log
+
+def apply_pending_events(caches: Dict[str, Any], sequence: int, store_products: Optional[List[Dict]] = None) -> int:
+    """Apply the logged events after a sequence number to a set of caches
+    
+    Caches that fell so far behind that events were already dropped from the log are
+    cleared completely, and the store product list is marked as expired.
+    
+    Args:
+        caches: Cache dictionaries by name, see invalidate_caches()
+        sequence: Sequence number of the last event applied to these caches
+        store_products: Store product list belonging to the caches
+    
+    Returns:
+        int: Sequence number of the last applied event, to pass on the next call
+    """
+    events, latest = get_invalidation_log().since(sequence)
+    
+    if events is None:
+        for cache in caches.values():
+            cache.clear()
+        if "cache_timestamps" in caches:
+            caches["cache_timestamps"]["store_products"] = 0
+    else:
+        for event in events:
+            invalidate_caches(caches, event, store_products)
+    
+    return latest
+
+def record_event(payload: Any) -> Optional[int]:
+    """Parse a webhook payload and add it to the invalidation log
+    
+    Args:
+        payload: Decoded webhook request body
+    
+    Returns:
+        Optional[int]: Sequence number, or None if the event does not affect cached data
+    
+    Raises:
+        ValueError: If the payload is not a webhook event object
+    """
+    event = parse_event(payload)
+    if event is None:
+        return None
+    return get_invalidation_log().append(event)
+
+def is_authorized(path: str, headers: Any, secret: str = WEBHOOK_SECRET) -> bool:
+    """Check that a webhook request carries the shared secret
+    
+    Args:
+        path: Request path with the query string
+        headers: Request headers
+        secret: Shared secret; requests are never authorized without one
+    
+    Returns:
+        bool: True if the "token" query parameter or the X-Webhook-Token header matches
+    """
+    if not secret:
+        return False
+    tokens = parse_qs(urlsplit(path).query).get("token", []) + [headers.get("X-Webhook-Token") or ""]
+    return any(hmac.compare_digest(token.encode(), secret.encode()) for token in tokens)
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    """Accepts Printful webhook POST requests on WEBHOOK_PATH that carry WEBHOOK_SECRET"""
+    
+    def do_POST(self):
+        if urlsplit(self.path).path != WEBHOOK_PATH:
+            self.send_error(404)
+            return
+        
+        if not is_authorized(self.path, self.headers):
+            self.send_error(403)
+            return
+        
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            record_event(json.loads(self.rfile.read(length)))
+        except (ValueError, TypeError) as e:
+            self.send_error(400, f"Invalid webhook event: {e}")
+            return
+        
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+    
+    def log_message(self, format, *args):
+        pass
+
+# Webhook server of this process, started on first use
+_webhook_server: Optional[ThreadingHTTPServer] = None
+_webhook_server_lock = threading.Lock()
+
+def start_webhook_receiver(host: str = WEBHOOK_HOST, port: int = WEBHOOK_PORT) -> Optional[ThreadingHTTPServer]:
+    """Start the webhook receiver once per process
+    
+    Args:
+        host: Interface to listen on
+        port: Port to listen on; 0 disables the receiver
+    
+    Returns:
+        Optional[ThreadingHTTPServer]: Running server, or None if disabled, WEBHOOK_SECRET
+        is not set or the port is in use
+    """
+    global _webhook_server
+    
+    if not port or not WEBHOOK_SECRET:
+        return None
+    
+    with _webhook_server_lock:
+        if _webhook_server is None:
+            try:
+                _webhook_server = ThreadingHTTPServer((host, port), WebhookHandler)
+            except OSError:
+                return None
+            threading.Thread(target=_webhook_server.serve_forever, name="printful-webhooks", daemon=True).start()
+        return _webhook_server
+
+def replay_events(events: List[Dict[str, Any]], url: Optional[str] = None) -> int:
+    """Replay recorded webhook events, for testing without Printful
+    
+    Args:
+        events: Webhook payloads
+        url: Receiver URL to POST them to, including the ?token= secret; they are added
+            to this process's log when None
+    
+    Returns:
+        int: Number of replayed events
+    """
+    for payload in events:
+        if url:
+            request = urllib.request.Request(url, data=json.dumps(payload).encode(),
+                                             headers={"Content-Type": "application/json"})
+            urllib.request.urlopen(request).close()
+        else:
+            record_event(payload)
+    return len(events)
+
+def load_events(path: str) -> List[Dict[str, Any]]:
+    """Load webhook payloads from a JSON array or NDJSON file
+    
+    Args:
+        path: Path of the file
+    
+    Returns:
+        List[Dict[str, Any]]: Webhook payloads
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        content = file.read().strip()
+    if content.startswith("["):
+        return json.loads(content)
+    return [json.loads(line) for line in content.splitlines() if line.strip()]
+
+if __name__ == "__main__":
+    # Usage: python -m src.api.webhooks <events.json|events.ndjson> <receiver URL>
+    if len(sys.argv) < 3:
+        print("Usage: python -m src.api.webhooks <events file> <receiver URL, e.g. "
+              f"http://{WEBHOOK_HOST}:<port>{WEBHOOK_PATH}?token=<secret>>")
+        sys.exit(1)
+    receiver_url = sys.argv[2]
+    print(f"Replayed {replay_events(load_events(sys.argv[1]), receiver_url)} events to {receiver_url}")
\ No newline at end of file
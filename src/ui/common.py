@@ -1,7 +1,17 @@
 import streamlit as st
-from typing import Dict, List, Any
-import base64
+from typing import Dict, List, Any, Optional, Tuple
+import time
+import hashlib
 from src.api.printful import PrintfulAPI
+from src.api.prefetch import start_prefetch, stop_prefetch
+from src.utils.snapshot import build_cache_snapshot, restore_cache_snapshot, save_cache_snapshot
+from src.utils.file import get_export_formats
+from src.utils.manifest import load_manifest
+from src.utils.downloads import download_button
+from src.api.webhooks import get_invalidation_log
+from src.api.circuit_breaker import get_open_circuits
+from src.utils.memory import account_session_memory, get_memory_ledger, format_bytes
+from config import CACHE_SNAPSHOT_PATH, WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET
 
 def set_page_config():
     """Set the page configuration for the Streamlit app"""
@@ -170,7 +180,7 @@ def render_sidebar(api: PrintfulAPI):
         st.subheader("Navigation")
         page = st.radio(
             "Select Data Type",
-            ["Printing Templates", "Mockups"],
+            ["Printing Templates", "Mockups", "Multi-Store Export"],
             key="navigation"
         )
         
@@ -198,12 +208,53 @@ def render_sidebar(api: PrintfulAPI):
         if st.button("Clear API Cache"):
             api.clear_cache()
             st.session_state.downloaded_images = {}
+            st.session_state.template_records_cache = {}
+            st.session_state.mockup_records_cache = {}
+            st.session_state.template_selection_cache = {}
+            st.session_state.cache_snapshot = None
             st.success("Cache cleared successfully!")
         
+        if st.button("Refresh Stock", help="Re-read only the availability of the cached variants"):
+            with st.spinner("Refreshing stock..."):
+                refreshed = api.refresh_stock()
+            st.success(f"Refreshed stock of {refreshed} variants")
+        
+        # Cache Snapshots
+        if st.button("Export Cache Snapshot"):
+            st.session_state.cache_snapshot = build_cache_snapshot(api.api_key)
+        if st.session_state.get('cache_snapshot'):
+            st.download_button(
+                "Download Cache Snapshot",
+                data=st.session_state.cache_snapshot,
+                file_name=f"printful_cache_{time.strftime('%Y%m%d_%H%M%S')}.json.gz",
+                mime="application/gzip"
+            )
+        if CACHE_SNAPSHOT_PATH and st.button("Save Startup Snapshot", help=f"Write the caches to {CACHE_SNAPSHOT_PATH}"):
+            save_cache_snapshot(CACHE_SNAPSHOT_PATH, api.api_key)
+            st.success("Cache snapshot saved")
+        
+        snapshot_file = st.file_uploader("Import Cache Snapshot", type=["gz"], key="cache_snapshot_upload",
+                                         help="Cache snapshot (.json.gz) exported by this application")
+        if snapshot_file is not None and st.button("Load Cache Snapshot"):
+            try:
+                summary = restore_cache_snapshot(snapshot_file.getvalue(), api.api_key)
+                st.success(f"Loaded {summary['entries']} cache entries from snapshot of {summary['created_at']}")
+                if summary['skipped_layers']:
+                    st.info(f"Skipped store data from a different API key: {', '.join(summary['skipped_layers'])}")
+            except ValueError as e:
+                st.error(f"Could not load cache snapshot: {e}")
+        
         # Cache Info
-        st.info(f"API Cache: {len(st.session_state.api_cache)} items")
+        st.info(f"API Cache: {len(st.session_state.api_cache) + len(st.session_state.catalog_api_cache)} items")
         if 'downloaded_images' in st.session_state:
             st.info(f"Downloaded Images: {len(st.session_state.downloaded_images)} items")
+        prefetcher = st.session_state.get('prefetcher')
+        if prefetcher is not None:
+            status = "running" if prefetcher.is_running() else "done"
+            st.info(f"Prefetched: {prefetcher.done}/{prefetcher.total} products ({status})")
+        
+        # Memory usage, measured after the cache controls above so cleared caches count
+        render_memory_usage()
         
         # API Status
         st.divider()
@@ -214,6 +265,18 @@ def render_sidebar(api: PrintfulAPI):
         else:
             st.error("❌ API connection failed")
         
+        for breaker in get_open_circuits():
+            st.warning(f"{breaker.host} is unavailable, serving cached data "
+                       f"(next retry in {breaker.retry_in:.0f}s)")
+        
+        waits = api.rate_limiter.get_average_waits()
+        if waits:
+            st.caption("Rate limit wait: " + ", ".join(f"{name} {wait * 1000:.0f} ms" for name, wait in waits.items()))
+        
+        if WEBHOOK_PORT and WEBHOOK_SECRET:
+            st.caption(f"Webhooks: {WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH}, "
+                       f"{get_invalidation_log().sequence} events received")
+        
         # About
         st.divider()
         st.subheader("About")
@@ -229,6 +292,27 @@ def render_sidebar(api: PrintfulAPI):
     
     return page
 
+def render_memory_usage():
+    """Account the memory of the session caches, enforce the caps and show the usage"""
+    session = account_session_memory()
+    if session is None:
+        return
+    
+    ledger = get_memory_ledger()
+    session_cap = f" of {format_bytes(ledger.session_max_bytes)}" if ledger.session_max_bytes else ""
+    global_cap = f" of {format_bytes(ledger.global_max_bytes)}" if ledger.global_max_bytes else ""
+    
+    st.info(f"Session Memory: {format_bytes(session.total)}{session_cap}")
+    with st.expander("Memory Usage"):
+        for cache_name, size in sorted(session.sizes.items(), key=lambda item: item[1], reverse=True):
+            st.caption(f"{cache_name}: {format_bytes(size)}")
+        if session.evicted:
+            st.caption(f"Evicted entries: {session.evicted}")
+        st.caption(f"All {len(ledger.sessions)} sessions: {format_bytes(ledger.get_total())}{global_cap} "
+                   f"({ledger.mode} mode)")
+        for filename, size in ledger.top_allocations:
+            st.caption(f"{filename}: {format_bytes(size)}")
+
 def render_footer():
     """Render the app footer"""
     st.markdown("""
@@ -263,6 +347,7 @@ def render_product_selection(api: PrintfulAPI) -> List[Dict[str, Any]]:
         
         if store_products:
             st.success(f"Found {len(store_products)} products in your store")
+            start_prefetch(api, store_products)
         else:
             st.error("No products found in your store")
     
@@ -317,24 +402,20 @@ def load_background_image():
     """
     st.markdown(background_image, unsafe_allow_html=True)
 
-def display_progress_bar(progress_text: str, total_items: int, current_item: int):
-    """Display a progress bar
+def display_progress_bar(progress_text: str, total_items: int, current_item: int, details: str = ""):
+    """Display a progress bar with its status text as a single element
     
     Args:
         progress_text: Text to display above the progress bar
         total_items: Total number of items
         current_item: Current item number
+        details: Extra status, e.g. throughput and ETA, appended to the text
     """
-    progress = st.progress(0)
-    status_text = st.empty()
-    
-    if total_items > 0:
-        percent_complete = current_item / total_items
-        progress.progress(percent_complete)
-        status_text.text(f"{progress_text} ({current_item}/{total_items})")
-    else:
-        progress.progress(0)
-        status_text.text(f"{progress_text} (0/0)")
+    percent_complete = current_item / total_items if total_items > 0 else 0
+    text = f"{progress_text} ({current_item}/{total_items})"
+    if details:
+        text = f"{text} - {details}"
+    st.progress(percent_complete, text=text)
 
 def show_api_key_input():
     """Show API key input field and save to session state"""
@@ -353,6 +434,9 @@ def show_api_key_input():
     
     if st.button("Save API Key"):
         if api_key:
+            # Stop warming caches for the previous API key
+            stop_prefetch()
+            
             # Clear any existing cache when changing API key
             if 'api_cache' in st.session_state:
                 st.session_state.api_cache = {}
@@ -402,30 +486,87 @@ def display_image_gallery(images: List[Dict[str, str]], columns: int = 3):
         with cols[col_idx]:
             st.image(image_data['path'], caption=image_data.get('caption', ''))
             if 'download_name' in image_data:
-                st.markdown(
-                    get_download_link(
-                        image_data['path'], 
-                        image_data['download_name']
-                    ), 
-                    unsafe_allow_html=True
-                )
+                download_button(image_data['path'], image_data['download_name'], key=f"gallery_download_{i}")
 
-def get_download_link(file_path: str, filename: str, file_type: str = "file/png") -> str:
-    """Generate a download link for a file
+def render_export_options(key_prefix: str) -> Tuple[str, bool]:
+    """Show the export format selector and the compact JSON option
     
     Args:
-        file_path: Path to the file
-        filename: Filename to use for download
-        file_type: MIME type of the file
+        key_prefix: Prefix of the widget keys
         
     Returns:
-        str: HTML download link
+        Tuple[str, bool]: Tuple of (export_format, compact_json)
+    """
+    export_formats = get_export_formats()
+    export_format = st.selectbox(
+        "Export Format",
+        options=list(export_formats.keys()),
+        format_func=lambda export_format: export_formats[export_format],
+        key=f"{key_prefix}_export_format",
+        help="NDJSON and the Parquet variant table can be read incrementally by import jobs"
+    )
+    
+    compact_json = st.checkbox("Compact JSON", key=f"{key_prefix}_compact_json",
+                               disabled=export_format != "json",
+                               help="Write the JSON file without indentation, for machine consumers")
+    
+    return export_format, compact_json
+
+def render_previous_manifest(key_prefix: str) -> Optional[Dict[str, Any]]:
+    """Show the upload of a previous export manifest, for a differential export
+    
+    Args:
+        key_prefix: Prefix of the widget keys
+        
+    Returns:
+        Optional[Dict[str, Any]]: Uploaded manifest, or None for a full export
+    """
+    manifest_file = st.file_uploader("Previous Manifest (differential export)", type=["json"],
+                                     key=f"{key_prefix}_previous_manifest",
+                                     help="Upload the *_manifest.json of an earlier export to export only new or "
+                                          "changed records and images, plus a list of deleted ones")
+    if manifest_file is None:
+        return None
+    
+    try:
+        manifest = load_manifest(manifest_file.getvalue())
+    except ValueError as e:
+        st.error(f"Could not read the manifest: {e}")
+        return None
+    
+    st.caption(f"Differential export against the export of {manifest.get('created_at', 'unknown date')} "
+               f"({len(manifest['records'])} records, {len(manifest['images'])} images)")
+    return manifest
+
+def get_variant_state_digest(variants: List[Dict[str, Any]], *stored_at: Optional[float]) -> str:
+    """Get a digest of the variant set of a product and of the cached data records are built from
+    
+    Memoized records keep copies of the variant data, so their cache keys include this
+    digest: it changes with the variant set, including sizes, colors and stock, and
+    with the times the other cached inputs were stored.
+    
+    Args:
+        variants: Product variants
+        stored_at: Times the other cached inputs were stored, None if not cached
+        
+    Returns:
+        str: 16 hex digits
+    """
+    variant_state = sorted(
+        (str(variant["catalog_variant_id"]), str(variant["size"]), str(variant["color_code"]), bool(variant["in_stock"]))
+        for variant in variants
+    )
+    return hashlib.blake2b(repr((variant_state, stored_at)).encode(), digest_size=8).hexdigest()
+
+def show_export_timings(timings: Dict[str, float]):
+    """Show the time spent per stage of an export
+    
+    Args:
+        timings: Seconds per stage, as filled in by create_zip_file
     """
-    with open(file_path, "rb") as file:
-        file_bytes = file.read()
-    b64 = base64.b64encode(file_bytes).decode()
-    href = f'<a href="data:{file_type};base64,{b64}" download="{filename}" class="download-button">Download {filename}</a>'
-    return href
+    if timings:
+        stages = ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in timings.items())
+        st.caption(f"Export time: {stages} (total {sum(timings.values()):.2f}s)")
 
 def show_json_preview(data: Dict[str, Any], max_height: str = "300px"):
     """Show a preview of JSON data with a max height
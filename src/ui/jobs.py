@@ -0,0 +1,186 @@
+import copy
+import hashlib
+import time
+import streamlit as st
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.api.printful import PrintfulAPI
+from src.api.rate_limit import PRIORITY_EXPORT
+from src.ui.common import render_export_options, render_previous_manifest, display_progress_bar
+from src.utils.file import create_zip_file
+from src.utils.downloads import download_button
+from src.utils.jobs import Job, get_job_runner, format_duration, JOB_RUNNING, JOB_QUEUED, JOB_CANCELLED
+from src.utils.journal import ExportJournal, get_journal_id, remove_expired_journals
+from config import JOB_REFRESH_INTERVAL
+
+def get_job_owner(api: PrintfulAPI) -> str:
+    """Get the owner key of the jobs started with an API key
+    
+    Jobs belong to the store rather than to the session, so a session that reconnects
+    with the same API key finds them again.
+    
+    Args:
+        api: PrintfulAPI instance
+    
+    Returns:
+        str: SHA-256 hash of the API key
+    """
+    return hashlib.sha256(api.api_key.encode()).hexdigest()
+
+def get_export_journal(api: PrintfulAPI, export_type: str, products: List[Dict], selections: Dict) -> ExportJournal:
+    """Get the checkpoint journal of an export
+    
+    Args:
+        api: PrintfulAPI instance
+        export_type: "Printing Templates" or "Mockups"
+        products: Store products to export
+        selections: Per-product choices passed to the collect function, by product ID
+    
+    Returns:
+        ExportJournal: Journal shared by every run of the same export
+    """
+    return ExportJournal(get_journal_id(
+        get_job_owner(api), export_type, [[product['id'], selections.get(product['id'])] for product in products]
+    ))
+
+def submit_export_job(api: PrintfulAPI, export_type: str, products: List[Dict], selections: Dict,
+                      collect: Callable[[PrintfulAPI, Dict], Tuple[List[Dict], str]],
+                      export_format: str, compact_json: bool,
+                      previous_manifest: Optional[Dict[str, Any]] = None) -> Job:
+    """Submit the template or mockup export of products as a background job
+    
+    Every product with records is checkpointed to the export journal. Products
+    already in the journal from an earlier run of the same export are not fetched
+    again, and the journal is deleted once the ZIP is built.
+    
+    Args:
+        api: PrintfulAPI instance of the session
+        export_type: "Printing Templates" or "Mockups"
+        products: Store products to export
+        selections: Per-product choices passed to the collect function, by product ID
+        collect: Builds the records of one product, returns (records, message); must
+            not render any UI
+        export_format: Key of EXPORT_FORMATS
+        compact_json: Write the JSON file without indentation
+        previous_manifest: Manifest of an earlier export, for a differential export
+    
+    Returns:
+        Job: Submitted job
+    """
+    # The job gets its own client like the prefetcher, with the export priority; it
+    # shares the session caches, which stay valid after the session ends
+    job_api = copy.copy(api)
+    job_api.priority = PRIORITY_EXPORT
+    file_prefix = "mockups" if export_type == "Mockups" else "templates"
+    
+    remove_expired_journals()
+    journal = get_export_journal(api, export_type, products, selections)
+    resumed = []
+    
+    def work(product):
+        checkpoint = journal.get(product['id'])
+        if checkpoint is not None:
+            resumed.append(product['id'])
+            return checkpoint
+        
+        records, message = collect(job_api, product)
+        # Products without records are retried by the next run
+        if records:
+            journal.put(product['id'], records, message)
+        return records, message
+    
+    def finish(job):
+        zip_data, zip_filename = create_zip_file(job.records, file_prefix=file_prefix, compact=compact_json,
+                                                 export_format=export_format, previous_manifest=previous_manifest)
+        journal.remove()
+        # The ZIP holds everything the records did, including the images
+        record_count = len(job.records)
+        job.records = []
+        return {"zip_data": zip_data, "zip_filename": zip_filename, "record_count": record_count,
+                "resumed_count": len(resumed)}
+    
+    label = f"{export_type}: {len(products)} products ({time.strftime('%H:%M:%S')})"
+    return get_job_runner().submit(label, get_job_owner(api), list(products), work, finish)
+
+def render_background_export(api: PrintfulAPI, export_type: str, products: List[Dict], selections: Dict,
+                             collect: Callable[[PrintfulAPI, Dict], Tuple[List[Dict], str]], key_prefix: str):
+    """Render the options and the start button of a background export
+    
+    Args:
+        api: PrintfulAPI instance
+        export_type: "Printing Templates" or "Mockups"
+        products: Selected store products
+        selections: Per-product choices passed to the collect function, by product ID
+        collect: Builds the records of one product, see submit_export_job()
+        key_prefix: Prefix of the widget keys
+    """
+    st.info("The export runs as a background job. It keeps running while you use the app, "
+            "and its progress is shown under Background Jobs.")
+    
+    completed = len(get_export_journal(api, export_type, products, selections).completed())
+    if completed:
+        st.info(f"{completed} of {len(products)} products were completed by an earlier run of this export "
+                "and are resumed from its checkpoints.")
+    
+    export_format, compact_json = render_export_options(f"{key_prefix}_job")
+    previous_manifest = render_previous_manifest(f"{key_prefix}_job")
+    
+    if st.button(f"Start Background Export of {len(products)} Products", key=f"{key_prefix}_start_job"):
+        submit_export_job(api, export_type, products, selections, collect, export_format, compact_json,
+                          previous_manifest)
+        st.rerun()
+
+def render_job(job: Job):
+    """Render the progress, cancel button and result of a job
+    
+    Args:
+        job: Background job
+    """
+    st.markdown(f"**{job.label}**: {job.status}")
+    
+    if not job.is_finished():
+        display_progress_bar("Exporting products", job.total, job.done,
+                             f"{job.throughput * 60:.1f} products/min, ETA {format_duration(job.eta)}")
+        if st.button("Cancel", key=f"cancel_job_{job.id}"):
+            job.cancel()
+        return
+    
+    if job.error:
+        st.error(f"Export failed after {job.done}/{job.total} products: {job.error}")
+    if job.error or job.status == JOB_CANCELLED:
+        st.info("Completed products are checkpointed. Start the same export again to resume it.")
+    for message in job.messages:
+        st.warning(message)
+    
+    if job.result:
+        resumed = f", {job.result['resumed_count']} resumed from checkpoints" if job.result['resumed_count'] else ""
+        st.caption(f"{job.result['record_count']} records from {job.done} products in "
+                   f"{format_duration(job.elapsed)}{resumed}")
+        download_button(job.result["zip_data"], job.result["zip_filename"], "application/zip",
+                        label=f"Download {job.result['zip_filename']}", key=f"download_job_{job.id}")
+
+def render_background_jobs(api: PrintfulAPI):
+    """Render the background jobs of the store, refreshing while any of them runs
+    
+    Args:
+        api: PrintfulAPI instance
+    """
+    jobs = get_job_runner().list_jobs(get_job_owner(api))
+    if not jobs:
+        return
+    
+    running = any(job.status in (JOB_QUEUED, JOB_RUNNING) for job in jobs)
+    
+    def render_jobs():
+        jobs = get_job_runner().list_jobs(get_job_owner(api))
+        if running and not any(job.status in (JOB_QUEUED, JOB_RUNNING) for job in jobs):
+            st.rerun()
+        
+        st.header("Background Jobs", divider="rainbow")
+        for job in jobs:
+            with st.container(border=True):
+                render_job(job)
+    
+    # Only poll for progress while a job runs; once the last one finishes a full
+    # rerun stops the polling
+    st.fragment(render_jobs, run_every=JOB_REFRESH_INTERVAL if running else None)()
\ No newline at end of file
@@ -2,8 +2,15 @@ import streamlit as st
 import os
 
 from src.api.printful import PrintfulAPI
+from src.api.prefetch import start_prefetch
 from src.utils.image import download_image
-from src.utils.file import get_download_link, create_zip_file
+from src.utils.file import create_zip_file
+from src.utils.downloads import download_button
+from src.utils.compositor import FIT_MODES
+from src.utils.preflight import analyze_design, preflight_design, get_print_area_pixels, auto_fit_batch
+from src.ui.common import render_export_options, render_previous_manifest, show_export_timings, \
+    get_variant_state_digest
+from src.ui.jobs import render_background_export
 
 def render_mockup_generator(api: PrintfulAPI):
     """Render the Mockups fetcher UI
@@ -39,6 +46,7 @@ def render_mockup_generator(api: PrintfulAPI):
         
         if store_products:
             st.success(f"Found {len(store_products)} products in your store")
+            start_prefetch(api, store_products)
         else:
             st.error("No products found in your store")
     
@@ -64,179 +72,62 @@ def render_mockup_generator(api: PrintfulAPI):
             st.session_state.mockup_current_step = 2
             st.rerun()
         
-        if st.session_state.mockup_current_step == 2 and st.session_state.selected_mockup_products:
+        if 'mockup_selections' not in st.session_state:
+            st.session_state.mockup_selections = {}
+        
+        background = st.session_state.mockup_current_step == 2 and bool(st.session_state.selected_mockup_products) \
+            and st.toggle("Export in Background", key="mockup_background_export",
+                          help="Run the export as a background job that survives navigation and widget changes")
+        
+        if background:
+            st.header("Step 2: Export Mockups in the Background")
+            
+            # Styles chosen earlier on this page are kept, the others use the first style
+            selections = {product['id']: st.session_state.mockup_selections.get(product['id'])
+                          for product in st.session_state.selected_mockup_products}
+            
+            def collect(job_api, product):
+                record, message = collect_product_mockup(job_api, product, selections.get(product['id']))
+                return [record] if record else [], message
+            
+            render_background_export(api, "Mockups", st.session_state.selected_mockup_products, selections, collect,
+                                     "mockup")
+        
+        if st.session_state.mockup_current_step == 2 and st.session_state.selected_mockup_products and not background:
             st.header("Step 2: Generate Mockups")
             
-            all_mockup_data = []
+            if 'mockup_product_results' not in st.session_state:
+                st.session_state.mockup_product_results = {}
+            if 'mockup_records_cache' not in st.session_state:
+                st.session_state.mockup_records_cache = {}
             
+            # Each product is an independent fragment, so changing one product's style
+            # only reruns that product instead of the whole page
             for product_index, product in enumerate(st.session_state.selected_mockup_products):
-                st.subheader(f"Processing Product {product_index+1}/{len(st.session_state.selected_mockup_products)}: {product['name']}")
-                
-                product_id = product['id']
-                catalog_product_id = product.get('catalog_product_id')
-                
-                if not catalog_product_id:
-                    st.warning(f"No catalog product ID available for {product['name']}. Skipping.")
-                    continue
-                
-                with st.spinner(f"Fetching mockup styles for {product['name']}..."):
-                    mockup_styles_result = api.get_mockup_styles(catalog_product_id, force_refresh)
-                    mockup_styles_data = mockup_styles_result[0]
-                    print_area_width = mockup_styles_result[1]
-                    print_area_height = mockup_styles_result[2]
-                    dpi = mockup_styles_result[3]
-                    print_area_type = mockup_styles_result[4]
-                    technique = mockup_styles_result[5]
-                
-                if not mockup_styles_data or "data" not in mockup_styles_data or not mockup_styles_data["data"]:
-                    st.warning(f"No mockup styles available for {product['name']}. Skipping.")
-                    continue
-                
-                mockup_style_options = {}
-                
-                for style in mockup_styles_data["data"]:
-                    mockup_styles = style.get('mockup_styles', [])
-                    
-                    for mockup_style in mockup_styles:
-                        style_id = mockup_style.get('id')
-                        category_name = mockup_style.get('category_name', 'Unknown')
-                        view_name = mockup_style.get('view_name', 'Unknown')
-                        restricted_variants = mockup_style.get('restricted_to_variants')
-                        
-                        restriction_info = " (Restricted)" if restricted_variants else ""
-                        mockup_style_options[f"{category_name} - {view_name} (ID: {style_id}){restriction_info}"] = {
-                            "style_id": style_id,
-                            "category_name": category_name,
-                            "view_name": view_name,
-                            "restricted_to_variants": restricted_variants
-                        }
-                
-                selected_style_key = st.selectbox(
-                    f"Select Mockup Style for {product['name']}",
-                    options=list(mockup_style_options.keys()),
-                    key=f"style_{product_id}"
-                )
-                
-                if selected_style_key:
-                    selected_style = mockup_style_options[selected_style_key]
-                    mockup_style_id = selected_style["style_id"]
-                    
-                    with st.spinner(f"Fetching mockup images for style {mockup_style_id}..."):
-                        mockup_images_data = api.get_mockup_images(catalog_product_id, mockup_style_id, force_refresh)
-                    
-                    if not mockup_images_data or "data" not in mockup_images_data or not mockup_images_data["data"]:
-                        st.warning(f"No mockup images available for style {mockup_style_id}. Skipping.")
-                        continue
-                    
-                    main_category_id = ""
-                    category_title = ""
-                    variants_data = []
-                    product_details = api.make_request(f"/store/products/{product_id}")
-
-                    if product_details and "result" in product_details and "sync_variants" in product_details["result"]:
-                        for variant in product_details["result"]["sync_variants"]:
-                            variant_id = variant["product"]["variant_id"]
-                            
-                            variant_details = api.make_request(f"/products/variant/{variant_id}")
-
-                            size = ""
-                            color_code = ""
-                            in_stock = False
-                            
-                            if variant_details and "result" in variant_details:
-                                variant_result = variant_details["result"]["variant"]
-                                size = variant_result.get("size").replace('\u2033', 'in').replace('\u00d7', 'x')
-                                color_code = variant_result.get("color_code")
-                                in_stock = variant_result.get("in_stock")
-                                if not main_category_id:
-                                    main_category_id = variant_details["result"]["product"].get("main_category_id", "")
-                                    category_title = variant_details["result"]["product"].get("type", "")
-                            
-                            variants_data.append({
-                                "catalog_variant_id": variant_id,
-                                "size": size,
-                                "color_code": color_code,
-                                "in_stock": in_stock
-                            })
-                    
-                    mockup_image = None
-                    mockup_url = None
-                    selected_placement = None
-                    
-                    for variant_data in mockup_images_data["data"]:
-                        for image_data in variant_data.get('images', []):
-                            image_placement = image_data.get('placement')
-                            mockup_url = image_data.get('image_url')
-                            
-                            if mockup_url:
-                                mockup_image = {
-                                    "variant_id": variant_data.get('catalog_variant_id'),
-                                    "color": variant_data.get('color', 'Unknown'),
-                                    "image_url": mockup_url
-                                }
-                                selected_placement = image_placement
-                                break
-                        if mockup_image:
-                            break
-                            
-                    if not selected_placement:
-                        selected_placement = 'front'
-                    
-                    if mockup_image and mockup_url:
-                        st.subheader(f"Mockup Image for {product['name']}")
-                        
-                        mockup_image, image_url = download_image(
-                            mockup_url,
-                            catalog_product_id,
-                            selected_placement,
-                            mockup_style_id
-                        )
-                        
-                        if mockup_image:
-                            st.image(mockup_image, caption=f"{product['name']} - {selected_placement}")
-                            
-                            filename = f"mockup_{catalog_product_id}_{selected_placement}_{mockup_style_id}.png"
-                            st.markdown(get_download_link(mockup_image, filename), unsafe_allow_html=True)
-                            
-                            mockup_data = {
-                                "product_id": product_id,
-                                "catalog_product_id": catalog_product_id,
-                                "name": product['name'],
-                                "placement": selected_placement,
-                                "main_category_id": main_category_id,
-                                "category_title": category_title,
-                                "technique": technique,
-                                "dpi": dpi,
-                                "print_area_width": print_area_width,
-                                "print_area_height": print_area_height,
-                                "print_area_type": print_area_type,
-                                "mockup_name": f"{selected_style['category_name']} - {selected_style['view_name']} (ID: {mockup_style_id}){' (Restricted)' if selected_style['restricted_to_variants'] else ''}",
-                                "mockup_url": image_url,
-                                "mockup_image": mockup_image,
-                                "variants": variants_data,
-                                "variant_ids_restricted": selected_style['restricted_to_variants'] or [],
-                            }
-                            
-                            all_mockup_data.append(mockup_data)
-                            
-                            with st.expander(f"Mockup Information for {product['name']}"):
-                                # Create a copy without the binary image data for display
-                                display_data = mockup_data.copy()
-                                if "mockup_image" in display_data:
-                                    del display_data["mockup_image"]
-                                st.json(display_data)
-                        else:
-                            st.warning(f"Failed to download mockup image for {product['name']}")
-                    else:
-                        st.warning(f"No mockup images found for the selected placement and style for {product['name']}")
+                render_product_mockup(api, product, product_index, len(st.session_state.selected_mockup_products), force_refresh)
+            
+            all_mockup_data = []
+            for product in st.session_state.selected_mockup_products:
+                mockup_data = st.session_state.mockup_product_results.get(product['id'])
+                if mockup_data:
+                    all_mockup_data.append(mockup_data)
             
             if all_mockup_data:
+                export_format, compact_json = render_export_options("mockup")
+                previous_manifest = render_previous_manifest("mockup")
+                
                 if st.button("Export All Mockup Data", key="save_mockup_data"):
                     # Create a ZIP file with all mockup data and images
-                    zip_href = create_zip_file(all_mockup_data, file_prefix="mockups")
+                    export_timings = {}
+                    zip_data, zip_filename = create_zip_file(all_mockup_data, file_prefix="mockups",
+                                                             compact=compact_json, export_format=export_format,
+                                                             timings=export_timings,
+                                                             previous_manifest=previous_manifest)
                     
                     st.success(f"All mockups data and images prepared for download")
-                    st.markdown(zip_href, unsafe_allow_html=True)
+                    download_button(zip_data, zip_filename, "application/zip",
+                                    label="Download The Json File and Mockups as ZIP")
+                    show_export_timings(export_timings)
                     
                     # Display mockup usage instructions
                     with st.expander("How to use these mockups"):
@@ -254,4 +145,346 @@ def render_mockup_generator(api: PrintfulAPI):
                         
                         #### JSON Data
                         The JSON file contains all the mockup information, which can be useful for automated workflows.
-                        """)
\ No newline at end of file
+                        Each mockup references its image in the `images` folder by the `mockup_image_hash` field.
+                        """)
+                
+                render_design_preflight(all_mockup_data)
+
+def render_design_preflight(mockup_records: list):
+    """Render the preflight of a design against the print area of every mockup product
+    
+    Artwork is checked locally before spending an upload and a mockup generation task,
+    and can be resampled to the exact pixel size of each print area.
+    
+    Args:
+        mockup_records: Mockup records with print area dimensions and DPI
+    """
+    st.header("Step 3: Check a Design")
+    
+    design_file = st.file_uploader("Upload a design", type=["png", "jpg", "jpeg", "webp"],
+                                   key="mockup_design_upload")
+    
+    if not design_file:
+        return
+    
+    design_image = design_file.getvalue()
+    try:
+        analysis = analyze_design(design_image)
+    except (OSError, ValueError) as e:
+        st.error(f"Could not read the design: {e}")
+        return
+    
+    st.write(f"**Design:** {analysis['width']}x{analysis['height']} px, "
+             f"{analysis['coverage']:.0%} visible pixels")
+    
+    for record in mockup_records:
+        result = preflight_design(analysis, record)
+        print_area_pixels = get_print_area_pixels(record)
+        summary = f"{record['name']} - {record.get('placement', '')}"
+        if print_area_pixels:
+            summary += f" ({print_area_pixels[0]}x{print_area_pixels[1]} px at {record['dpi']} DPI)"
+        
+        if result["passed"] and not result["issues"]:
+            st.success(f"{summary}: ready to print")
+        for level, message in result["issues"]:
+            if level == "error":
+                st.error(f"{summary}: {message}")
+            else:
+                st.warning(f"{summary}: {message}")
+    
+    fit_label = st.selectbox("Design Fit", options=list(FIT_MODES.keys()), key="mockup_design_fit")
+    
+    if st.button("Auto-fit Design to Print Areas", key="mockup_auto_fit"):
+        with st.spinner(f"Resampling the design for {len(mockup_records)} print areas..."):
+            fitted_designs = auto_fit_batch(design_image, mockup_records, FIT_MODES[fit_label])
+        
+        for i, (record, fitted_design) in enumerate(zip(mockup_records, fitted_designs)):
+            if fitted_design is None:
+                st.warning(f"No print area size available for {record['name']}")
+                continue
+            download_button(fitted_design, f"design_{record['catalog_product_id']}_{record.get('placement', '')}.png",
+                            label=f"Download fitted design for {record['name']}", key=f"download_fitted_design_{i}")
+
+def get_mockup_style_options(mockup_styles_data: dict) -> dict:
+    """Get the selectable mockup styles of a catalog product
+    
+    Args:
+        mockup_styles_data: Mockup styles data as returned by get_mockup_styles
+        
+    Returns:
+        dict: Style label -> style option with "style_id", "category_name", "view_name"
+        and "restricted_to_variants"
+    """
+    mockup_style_options = {}
+    
+    for style in mockup_styles_data["data"]:
+        mockup_styles = style.get('mockup_styles', [])
+        
+        for mockup_style in mockup_styles:
+            style_id = mockup_style.get('id')
+            category_name = mockup_style.get('category_name', 'Unknown')
+            view_name = mockup_style.get('view_name', 'Unknown')
+            restricted_variants = mockup_style.get('restricted_to_variants')
+            
+            restriction_info = " (Restricted)" if restricted_variants else ""
+            mockup_style_options[f"{category_name} - {view_name} (ID: {style_id}){restriction_info}"] = {
+                "style_id": style_id,
+                "category_name": category_name,
+                "view_name": view_name,
+                "restricted_to_variants": restricted_variants
+            }
+    
+    return mockup_style_options
+
+def collect_product_mockup(api: PrintfulAPI, product: dict, style_key: str = None) -> tuple:
+    """Build the mockup record of a product without rendering any UI
+    
+    Uses the first mockup style unless a style label is given. Safe to call from
+    background threads.
+    
+    Args:
+        api: PrintfulAPI instance
+        product: Store product
+        style_key: Mockup style label to export, defaults to the first style
+        
+    Returns:
+        tuple: (record, message) where record is None and message explains why when
+        no mockup image could be fetched
+    """
+    catalog_product_id = product.get('catalog_product_id')
+    
+    if not catalog_product_id:
+        return None, f"No catalog product ID available for {product['name']}. Skipping."
+    
+    mockup_styles_result = api.get_mockup_styles(catalog_product_id)
+    mockup_styles_data = mockup_styles_result[0]
+    
+    if not mockup_styles_data or "data" not in mockup_styles_data or not mockup_styles_data["data"]:
+        return None, f"No mockup styles available for {product['name']}. Skipping."
+    
+    mockup_style_options = get_mockup_style_options(mockup_styles_data)
+    if style_key not in mockup_style_options:
+        style_key = next(iter(mockup_style_options), None)
+    
+    if not style_key:
+        return None, f"No mockup styles available for {product['name']}. Skipping."
+    
+    selected_style = mockup_style_options[style_key]
+    mockup_images_data = api.get_mockup_images(catalog_product_id, selected_style["style_id"], max_images=1)
+    
+    if not mockup_images_data or "data" not in mockup_images_data or not mockup_images_data["data"]:
+        return None, f"No mockup images available for style {selected_style['style_id']}. Skipping."
+    
+    mockup_data = build_product_mockup_record(api, product, selected_style, mockup_images_data, mockup_styles_result)
+    
+    if "mockup_image" not in mockup_data:
+        return None, f"Failed to download mockup image for {product['name']}"
+    
+    return mockup_data, ""
+
+def build_product_mockup_record(api: PrintfulAPI, product: dict, selected_style: dict, mockup_images_data: dict,
+                                mockup_styles_result: tuple) -> dict:
+    """Fetch variant details and the first mockup image of a style and build the export record
+    
+    Args:
+        api: PrintfulAPI instance
+        product: Store product
+        selected_style: Selected mockup style option
+        mockup_images_data: Mockup images of the selected style
+        mockup_styles_result: Result of get_mockup_styles for the catalog product
+        
+    Returns:
+        dict: Mockup record, or a dict without "mockup_image" when no image could be downloaded
+    """
+    product_id = product['id']
+    catalog_product_id = product['catalog_product_id']
+    mockup_style_id = selected_style["style_id"]
+    _, print_area_width, print_area_height, dpi, print_area_type, technique = mockup_styles_result
+    
+    variants, main_category_id, category_title = api.get_product_variants(product_id)
+    variants_data = [
+        {
+            "catalog_variant_id": variant["catalog_variant_id"],
+            "size": variant["size"].replace('\u2033', 'in').replace('\u00d7', 'x'),
+            "color_code": variant["color_code"],
+            "in_stock": variant["in_stock"]
+        }
+        for variant in variants
+    ]
+    
+    mockup_image = None
+    mockup_url = None
+    selected_placement = None
+    
+    for variant_data in mockup_images_data["data"]:
+        for image_data in variant_data.get('images', []):
+            image_placement = image_data.get('placement')
+            mockup_url = image_data.get('image_url')
+            
+            if mockup_url:
+                mockup_image = {
+                    "variant_id": variant_data.get('catalog_variant_id'),
+                    "color": variant_data.get('color', 'Unknown'),
+                    "image_url": mockup_url
+                }
+                selected_placement = image_placement
+                break
+        if mockup_image:
+            break
+            
+    if not selected_placement:
+        selected_placement = 'front'
+    
+    mockup_data = {
+        "product_id": product_id,
+        "catalog_product_id": catalog_product_id,
+        "name": product['name'],
+        "placement": selected_placement,
+        "main_category_id": main_category_id,
+        "category_title": category_title,
+        "technique": technique,
+        "dpi": dpi,
+        "print_area_width": print_area_width,
+        "print_area_height": print_area_height,
+        "print_area_type": print_area_type,
+        "mockup_name": f"{selected_style['category_name']} - {selected_style['view_name']} (ID: {mockup_style_id}){' (Restricted)' if selected_style['restricted_to_variants'] else ''}",
+        "mockup_url": mockup_url,
+        "variants": variants_data,
+        "variant_ids_restricted": selected_style['restricted_to_variants'] or [],
+    }
+    
+    if mockup_image and mockup_url:
+        image_bytes, image_url = download_image(
+            mockup_url,
+            catalog_product_id,
+            selected_placement,
+            mockup_style_id
+        )
+        
+        if image_bytes:
+            mockup_data["mockup_url"] = image_url
+            mockup_data["mockup_image"] = image_bytes
+    
+    return mockup_data
+
+def get_mockup_records_key(api: PrintfulAPI, product_id, catalog_product_id, mockup_style_id, variants: list) -> str:
+    """Get the mockup_records_cache key of a mockup style selection
+    
+    The key starts with the store product ID, which webhook invalidation relies on, and
+    identifies the exact variant set, including sizes, colors and stock, and the cached
+    mockup styles and images the record is built from, so the record is rebuilt once
+    any of them changes.
+    
+    Args:
+        api: PrintfulAPI instance
+        product_id: Store product ID
+        catalog_product_id: Catalog product ID
+        mockup_style_id: Selected mockup style ID
+        variants: Product variants
+        
+    Returns:
+        str: Cache key
+    """
+    digest = get_variant_state_digest(
+        variants,
+        api.cache_timestamps.get(f"mockup_styles_cache/mockup_styles_{catalog_product_id}"),
+        api.cache_timestamps.get(f"mockup_images_cache/mockup_images_{catalog_product_id}_{mockup_style_id}")
+    )
+    return f"{product_id}_{catalog_product_id}_{mockup_style_id}_{digest}"
+
+@st.fragment
+def render_product_mockup(api: PrintfulAPI, product: dict, product_index: int, product_count: int, force_refresh: bool = False):
+    """Render the mockup style selection and mockup image of a single product
+    
+    Runs as a Streamlit fragment: changing this product's mockup style only reruns this
+    function. The resulting record is stored in st.session_state.mockup_product_results
+    and memoized per style in st.session_state.mockup_records_cache.
+    
+    Args:
+        api: PrintfulAPI instance
+        product: Store product
+        product_index: Position of the product in the selection
+        product_count: Number of selected products
+        force_refresh: Force refresh data from API instead of using cache
+    """
+    product_id = product['id']
+    catalog_product_id = product.get('catalog_product_id')
+    
+    st.session_state.mockup_product_results[product_id] = None
+    
+    st.subheader(f"Processing Product {product_index+1}/{product_count}: {product['name']}")
+    
+    if not catalog_product_id:
+        st.warning(f"No catalog product ID available for {product['name']}. Skipping.")
+        return
+    
+    with st.spinner(f"Fetching mockup styles for {product['name']}..."):
+        mockup_styles_result = api.get_mockup_styles(catalog_product_id, force_refresh)
+        mockup_styles_data = mockup_styles_result[0]
+    
+    if not mockup_styles_data or "data" not in mockup_styles_data or not mockup_styles_data["data"]:
+        st.warning(f"No mockup styles available for {product['name']}. Skipping.")
+        return
+    
+    mockup_style_options = get_mockup_style_options(mockup_styles_data)
+    
+    selected_style_key = st.selectbox(
+        f"Select Mockup Style for {product['name']}",
+        options=list(mockup_style_options.keys()),
+        key=f"style_{product_id}"
+    )
+    
+    if not selected_style_key:
+        return
+    
+    # Remembered for background exports, which do not render the selectors
+    st.session_state.mockup_selections[product_id] = selected_style_key
+    
+    selected_style = mockup_style_options[selected_style_key]
+    mockup_style_id = selected_style["style_id"]
+    
+    with st.spinner(f"Fetching mockup images for style {mockup_style_id}..."):
+        mockup_images_data = api.get_mockup_images(catalog_product_id, mockup_style_id, force_refresh, max_images=1)
+    
+    if not mockup_images_data or "data" not in mockup_images_data or not mockup_images_data["data"]:
+        st.warning(f"No mockup images available for style {mockup_style_id}. Skipping.")
+        return
+    
+    with st.spinner(f"Fetching variants for {product['name']}..."):
+        variants, _, _ = api.get_product_variants(product_id, force_refresh)
+    
+    # Memoize the downloaded record on everything that determines it
+    record_key = get_mockup_records_key(api, product_id, catalog_product_id, mockup_style_id, variants)
+    records_cache = st.session_state.mockup_records_cache
+    
+    if force_refresh or record_key not in records_cache:
+        records_cache[record_key] = build_product_mockup_record(
+            api, product, selected_style, mockup_images_data, mockup_styles_result
+        )
+    
+    mockup_data = records_cache[record_key]
+    
+    if not mockup_data.get("mockup_url"):
+        st.warning(f"No mockup images found for the selected placement and style for {product['name']}")
+        return
+    
+    st.subheader(f"Mockup Image for {product['name']}")
+    
+    if "mockup_image" not in mockup_data:
+        st.warning(f"Failed to download mockup image for {product['name']}")
+        return
+    
+    selected_placement = mockup_data["placement"]
+    st.image(mockup_data["mockup_image"], caption=f"{product['name']} - {selected_placement}")
+    
+    filename = f"mockup_{catalog_product_id}_{selected_placement}_{mockup_style_id}.png"
+    download_button(mockup_data["mockup_image"], filename, key=f"download_mockup_{product_id}")
+    
+    st.session_state.mockup_product_results[product_id] = mockup_data
+    
+    with st.expander(f"Mockup Information for {product['name']}"):
+        # Create a copy without the binary image data for display
+        display_data = mockup_data.copy()
+        if "mockup_image" in display_data:
+            del display_data["mockup_image"]
+        st.json(display_data)
@@ -0,0 +1,212 @@
+import hashlib
+import time
+import streamlit as st
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Any, Tuple
+
+from src.api.printful import PrintfulAPI, CACHE_NAMES, CATALOG_CACHE_NAMES
+from src.api.rate_limit import PRIORITY_EXPORT
+from src.api.webhooks import get_invalidation_log, apply_pending_events
+from src.ui.template import collect_product_templates
+from src.ui.mockup import collect_product_mockup
+from src.utils.file import create_zip_file
+from src.utils.downloads import download_button
+from src.ui.common import render_export_options, render_previous_manifest, show_export_timings
+from config import BASE_URL, MULTI_STORE_MAX_WORKERS
+
+def parse_store_keys(text: str) -> List[Tuple[str, str]]:
+    """Parse one store per line, either as 'label: api_key' or as a bare API key
+    
+    Args:
+        text: Multi-line text with one store per line
+    
+    Returns:
+        List[Tuple[str, str]]: List of (label, api_key) tuples without duplicate keys.
+        Repeated labels get a " (2)", " (3)", ... suffix, since exported records and
+        manifest entries are told apart by their store label.
+    """
+    stores = []
+    seen_keys = set()
+    seen_labels = set()
+    
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        
+        label, _, api_key = line.rpartition(":")
+        label = label.strip() or f"Store {len(stores) + 1}"
+        api_key = api_key.strip()
+        
+        if api_key and api_key not in seen_keys:
+            unique_label = label
+            suffix = 2
+            while unique_label in seen_labels:
+                unique_label = f"{label} ({suffix})"
+                suffix += 1
+            
+            seen_keys.add(api_key)
+            seen_labels.add(unique_label)
+            stores.append((unique_label, api_key))
+    
+    return stores
+
+def get_store_caches(api_key: str) -> Dict[str, Dict]:
+    """Get the cache namespace of a store for multi-store exports
+    
+    Store caches are kept per API key in the session, while the catalog caches are the
+    session's own, so catalog data fetched for one store is reused by every other store
+    and by the single-store pages.
+    
+    Args:
+        api_key: Printful API key of the store
+    
+    Returns:
+        Dict[str, Dict]: Cache dictionaries by name, to pass to PrintfulAPI
+    """
+    if 'multi_store_caches' not in st.session_state:
+        st.session_state.multi_store_caches = {}
+    
+    key_hash = hashlib.sha256(api_key.encode()).hexdigest()
+    store_caches = st.session_state.multi_store_caches.setdefault(key_hash, {})
+    
+    caches = {}
+    for cache_name in CACHE_NAMES:
+        if cache_name in CATALOG_CACHE_NAMES:
+            if cache_name not in st.session_state:
+                st.session_state[cache_name] = {}
+            caches[cache_name] = st.session_state[cache_name]
+        else:
+            caches[cache_name] = store_caches.setdefault(cache_name, {})
+    
+    # Apply webhook events to the store caches; the catalog caches are the session's
+    # and already up to date
+    if 'multi_store_invalidation_seq' not in st.session_state:
+        st.session_state.multi_store_invalidation_seq = {}
+    sequences = st.session_state.multi_store_invalidation_seq
+    with PrintfulAPI.cache_lock:
+        sequences[key_hash] = apply_pending_events(
+            {cache_name: store_caches[cache_name] for cache_name in store_caches},
+            sequences.get(key_hash, get_invalidation_log().sequence)
+        )
+    
+    return caches
+
+def export_store(label: str, api_key: str, caches: Dict[str, Dict], export_type: str) -> Dict[str, Any]:
+    """Run the template or mockup export of one store
+    
+    Runs on a worker thread: it only uses the given caches and makes no Streamlit calls.
+    Requests are paced by the rate limiter of the store's API key with the export
+    priority, so pages used with the same key stay responsive.
+    
+    Args:
+        label: Store label
+        api_key: Printful API key of the store
+        caches: Cache namespace as returned by get_store_caches
+        export_type: "Printing Templates" or "Mockups"
+    
+    Returns:
+        Dict[str, Any]: Result with "label", "records", "messages", "error" and "duration"
+    """
+    started_at = time.time()
+    result = {"label": label, "records": [], "messages": [], "error": "", "duration": 0}
+    
+    api = PrintfulAPI(api_key, BASE_URL, caches=caches)
+    api.priority = PRIORITY_EXPORT
+    
+    if not api.validate_api_key():
+        result["error"] = "Invalid API key or connection error"
+        return result
+    
+    products = api.fetch_store_products()
+    if not products:
+        result["error"] = "No products found in the store"
+    
+    for product in products:
+        if export_type == "Mockups":
+            record, message = collect_product_mockup(api, product)
+            records = [record] if record else []
+        else:
+            records, message = collect_product_templates(api, product)
+        
+        if message:
+            result["messages"].append(message)
+        
+        for record in records:
+            record["store"] = label
+            result["records"].append(record)
+    
+    result["duration"] = time.time() - started_at
+    return result
+
+def render_multi_store_export():
+    """Render the Multi-Store Export UI
+    
+    Runs the same template or mockup export against several stores concurrently. Every
+    API key has its own rate limit budget and store cache namespace, while catalog data
+    is shared, so the combined export takes about as long as the slowest store.
+    """
+    st.header("Multi-Store Export", divider="rainbow")
+    
+    stores_text = st.text_area(
+        "Store API Keys",
+        help="One store per line, either as 'label: api_key' or just the API key",
+        key="multi_store_keys",
+        placeholder="Main store: your-api-key\nSecond store: another-api-key"
+    )
+    stores = parse_store_keys(stores_text)
+    
+    export_type = st.radio("Data Type", ["Printing Templates", "Mockups"], key="multi_store_export_type", horizontal=True)
+    
+    if stores and st.button(f"Export {len(stores)} Stores", key="multi_store_run"):
+        store_caches = {api_key: get_store_caches(api_key) for _, api_key in stores}
+        progress = st.progress(0)
+        status_text = st.empty()
+        results = []
+        started_at = time.time()
+        
+        with ThreadPoolExecutor(max_workers=min(len(stores), MULTI_STORE_MAX_WORKERS)) as executor:
+            futures = [
+                executor.submit(export_store, label, api_key, store_caches[api_key], export_type)
+                for label, api_key in stores
+            ]
+            for future in as_completed(futures):
+                results.append(future.result())
+                progress.progress(len(results) / len(stores))
+                status_text.text(f"Exported {len(results)}/{len(stores)} stores")
+        
+        status_text.text(f"Exported {len(stores)} stores in {time.time() - started_at:.1f}s")
+        
+        # Keep the input order of the stores
+        order = [label for label, _ in stores]
+        st.session_state.multi_store_results = sorted(results, key=lambda result: order.index(result["label"]))
+        st.session_state.multi_store_results_type = export_type
+    
+    results = st.session_state.get('multi_store_results')
+    if not results:
+        return
+    
+    for result in results:
+        with st.expander(f"{result['label']}: {len(result['records'])} records ({result['duration']:.1f}s)"):
+            if result["error"]:
+                st.error(result["error"])
+            for message in result["messages"]:
+                st.warning(message)
+    
+    all_records = [record for result in results for record in result["records"]]
+    
+    export_format, compact_json = render_export_options("multi_store")
+    previous_manifest = render_previous_manifest("multi_store")
+    
+    if all_records and st.button("Export All Stores", key="multi_store_save"):
+        file_prefix = "mockups" if st.session_state.multi_store_results_type == "Mockups" else "templates"
+        export_timings = {}
+        zip_data, zip_filename = create_zip_file(all_records, file_prefix=f"multi_store_{file_prefix}",
+                                                 compact=compact_json, export_format=export_format,
+                                                 timings=export_timings,
+                                                 previous_manifest=previous_manifest)
+        
+        st.success(f"Data and images of {len(results)} stores prepared for download")
+        download_button(zip_data, zip_filename, "application/zip",
+                        label=f"Download The Json File and {file_prefix.capitalize()} of All Stores as ZIP")
+        show_export_timings(export_timings)
\ No newline at end of file
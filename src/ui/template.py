@@ -4,11 +4,22 @@ import time
 import json
 import zipfile
 import io
-import base64
 
 from src.api.printful import PrintfulAPI
+from src.api.prefetch import start_prefetch
 from src.utils.image import download_image
-from src.utils.file import get_download_link, create_zip_file
+from src.utils.perceptual import get_perceptual_hashes, group_identical, confirm_identical, get_known_identical, \
+    remember_identical
+from src.utils.file import create_zip_file
+from src.utils.downloads import download_button
+from src.utils.compositor import FIT_MODES, composite_batch
+from src.ui.common import render_export_options, render_previous_manifest, show_export_timings, \
+    get_variant_state_digest
+from src.ui.jobs import render_background_export
+
+# Template fields that must match for templates to be merged into one
+TEMPLATE_GEOMETRY_FIELDS = ["template_width", "template_height", "print_area_width", "print_area_height",
+                            "print_area_top", "print_area_left"]
 
 def render_template_generator(api: PrintfulAPI):
     """Render the Printing Templates UI
@@ -37,6 +48,7 @@ def render_template_generator(api: PrintfulAPI):
         
         if store_products:
             st.success(f"Found {len(store_products)} products in your store")
+            start_prefetch(api, store_products)
         else:
             st.error("No products found in your store")
     
@@ -57,294 +69,44 @@ def render_template_generator(api: PrintfulAPI):
             st.session_state.selected_products = selected_products
             st.success(f"Selected {len(selected_products)} products")
     
-    if selected_products:
+    background = bool(selected_products) and st.toggle(
+        "Export in Background", key="template_background_export",
+        help="Run the export as a background job that survives navigation and widget changes"
+    )
+    
+    if 'template_selections' not in st.session_state:
+        st.session_state.template_selections = {}
+    
+    if background:
+        st.header("Step 2: Export Templates in the Background")
+        
+        # Placements and templates chosen earlier on this page are kept, the others use the defaults
+        selections = {product['id']: st.session_state.template_selections.get(product['id'], (None, None))
+                      for product in selected_products}
+        render_background_export(
+            api, "Printing Templates", selected_products, selections,
+            lambda job_api, product: collect_product_templates(job_api, product, *selections[product['id']]),
+            "template"
+        )
+    
+    if selected_products and not background:
         st.header("Step 2: Generate templates for Selected Products")
         
-        all_products_templates = []
+        if 'template_product_results' not in st.session_state:
+            st.session_state.template_product_results = {}
+        if 'template_records_cache' not in st.session_state:
+            st.session_state.template_records_cache = {}
+        if 'template_selection_cache' not in st.session_state:
+            st.session_state.template_selection_cache = {}
         
+        # Each product is an independent fragment, so a widget change in one product
+        # only reruns that product instead of the whole page
         for product in selected_products:
-            st.subheader(f"Product: {product['name']}")
-            
-            product_id = product['id']
-            catalog_product_id = product.get('catalog_product_id')
-            
-            if not catalog_product_id:
-                st.warning(f"No catalog product ID available for {product['name']}")
-                continue
-            
-            with st.spinner(f"Fetching variants for {product['name']}..."):
-                variants, main_category_id, category_title = api.get_product_variants(product_id, force_refresh)
-            
-            if not variants:
-                st.warning(f"No variants found for {product['name']}")
-                continue
-            
-            catalog_variant_ids = [variant["catalog_variant_id"] for variant in variants]
-            
-            with st.spinner(f"Fetching templates for {product['name']}..."):
-                template_data = api.get_catalog_variant_templates(catalog_product_id, catalog_variant_ids)
-            
-            if not template_data or "data" not in template_data or not template_data["data"]:
-                st.warning(f"No templates available for {product['name']}")
-                continue
-            
-            available_placements = set()
-            for template in template_data["data"]:
-                placement = template.get('placement')
-                if placement:
-                    available_placements.add(placement)
-            
-            default_placement = 'front' if 'front' in available_placements else next(iter(available_placements), None)
-            
-            selected_placement = st.selectbox(
-                "Select Placement",
-                options=sorted(available_placements),
-                index=sorted(available_placements).index(default_placement) if default_placement else 0,
-                key=f"placement_{product_id}"
-            )
-            
-            filtered_templates = [t for t in template_data["data"] if t.get('placement') == selected_placement]
-            
-            if not filtered_templates:
-                st.warning(f"No templates available for placement: {selected_placement}")
-                continue
-            
-            templates = filtered_templates
-            templates_by_size = {}
-            techniques_by_template = {}
-            templates_by_variant = {}
-            
-            for template in templates:
-                template_variant_ids = template.get('catalog_variant_ids', [])
-                technique = template.get('technique', 'Unknown')
-                image_url = template.get('image_url', '')
-                
-                supported_sizes = set()
-                for variant in variants:
-                    if variant["catalog_variant_id"] in template_variant_ids:
-                        supported_sizes.add(variant["size"])
-                        
-                        variant_key = variant["catalog_variant_id"]
-                        if variant_key not in templates_by_variant:
-                            templates_by_variant[variant_key] = []
-                        templates_by_variant[variant_key].append(template)
-                
-                size_key = tuple(sorted(supported_sizes))
-                if size_key not in templates_by_size:
-                    templates_by_size[size_key] = []
-                templates_by_size[size_key].append(template)
-                
-                if image_url not in techniques_by_template:
-                    techniques_by_template[image_url] = set()
-                techniques_by_template[image_url].add(technique)
-            
-            templates_vary_by_size = len(templates_by_size) > 1
-            
-            unique_image_urls = set(template.get('image_url', '') for template in templates)
-            templates_have_different_urls = len(unique_image_urls) > 1
-            
-            if not templates_vary_by_size and len(templates) > 1 and not templates_have_different_urls:
-                unique_templates = {}
-                for template in templates:
-                    image_url = template.get('image_url', '')
-                    if image_url not in unique_templates:
-                        unique_templates[image_url] = template
-                templates = list(unique_templates.values())
-            
-            template_options = {}
-            for i, template in enumerate(templates, 1):
-                template_variant_ids = template.get('catalog_variant_ids', [])
-                supported_sizes = []
-                for variant in variants:
-                    if variant["catalog_variant_id"] in template_variant_ids:
-                        if variant["size"] not in supported_sizes:
-                            supported_sizes.append(variant["size"])
-                
-                image_url = template.get('image_url', '')
-                techniques = list(techniques_by_template.get(image_url, ['Unknown']))
-                
-                size_info = f" (Sizes: {', '.join(supported_sizes)})" if supported_sizes else ""
-                technique_info = f" [Techniques: {', '.join(techniques)}]" if techniques else ""
-                template_options[f"Template {i}{size_info}{technique_info}"] = template
-            
-            if len(template_options) == 1:
-                selected_template_key = list(template_options.keys())[0]
-                selected_template = template_options[selected_template_key]
-                
-                template_url = selected_template.get("image_url")
-                placement = selected_template.get("placement", "front")
-                
-                template_info = {
-                    "technique": selected_template.get("technique", ""),
-                    "template_width": selected_template.get("template_width", 0),
-                    "template_height": selected_template.get("template_height", 0),
-                    "print_area_width": selected_template.get("print_area_width", 0),
-                    "print_area_height": selected_template.get("print_area_height", 0),
-                    "print_area_top": selected_template.get("print_area_top", 0),
-                    "print_area_left": selected_template.get("print_area_left", 0)
-                }
-                
-                if template_url:
-                    template_id = f"template_{templates.index(selected_template) + 1}"
-                    template_image, image_url = download_image(
-                        template_url,
-                        catalog_product_id,
-                        placement,
-                        template_id
-                    )
-                    
-                    if template_image:
-                        st.image(template_image, caption=f"{product['name']} - {selected_template_key}")
-                        
-                        with st.expander("Template Information"):
-                            st.json(template_info)
-                        
-                        if templates_vary_by_size:
-                            st.info("⚠️ This product has different templates for different sizes.")
-                        
-                        product_template = {
-                            "product_id": product_id,
-                            "catalog_product_id": catalog_product_id,
-                            "name": product['name'],
-                            "placement": placement,
-                            "template": selected_template_key,
-                            "template_url": image_url,
-                            "template_image": template_image,
-                            "main_category_id": main_category_id,
-                            "category_title": category_title,
-                            "variants": variants,
-                            "templates_vary_by_size": templates_vary_by_size
-                        }
-                        
-                        product_template.update(template_info)
-                        
-                        all_products_templates.append(product_template)
-                    else:
-                        st.warning(f"No template URL found for {product['name']} with template {selected_template_key}")
-            else:
-                if templates_have_different_urls:
-                    st.info("⚠️ This product has different templates for different variants. Processing all templates...")
-                    
-                    for variant in variants:
-                        variant_id = variant["catalog_variant_id"]
-                        variant_templates = templates_by_variant.get(variant_id, [])
-                        
-                        if not variant_templates:
-                            continue
-                        
-                        variant_template = variant_templates[0]
-                        template_url = variant_template.get("image_url")
-                        placement = variant_template.get("placement", "front")
-                        
-                        template_info = {
-                            "technique": variant_template.get("technique", ""),
-                            "template_width": variant_template.get("template_width", 0),
-                            "template_height": variant_template.get("template_height", 0),
-                            "print_area_width": variant_template.get("print_area_width", 0),
-                            "print_area_height": variant_template.get("print_area_height", 0),
-                            "print_area_top": variant_template.get("print_area_top", 0),
-                            "print_area_left": variant_template.get("print_area_left", 0)
-                        }
-                        
-                        if template_url:
-                            template_id = f"variant_{variant_id}"
-                            template_image, image_url = download_image(
-                                template_url,
-                                catalog_product_id,
-                                placement,
-                                template_id
-                            )
-                            
-                            if template_image:
-                                if variants.index(variant) < 3:
-                                    st.image(template_image, caption=f"{product['name']} - Size: {variant['size']} - Color: {variant['color_code']}")
-                                elif variants.index(variant) == 3:
-                                    st.info(f"... and {len(variants) - 3} more variants (not displayed)")
-                                
-                                # Format the size value to replace Unicode characters with standard ASCII
-                                size_value = variant["size"]
-                                # Replace inch symbol (″) with "in" and multiplication symbol (×) with "x"
-                                size_value = size_value.replace('\u2033', 'in').replace('\u00d7', 'x')
-                                
-                                variant_template_data = {
-                                    "product_id": product_id,
-                                    "catalog_product_id": catalog_product_id,
-                                    "name": product['name'],
-                                    "placement": placement,
-                                    "variant_id": variant_id,
-                                    "variant_size": size_value,
-                                    "variant_color": variant["color_code"],
-                                    "template_url": image_url,
-                                    "template_image": template_image,
-                                    "main_category_id": main_category_id,
-                                    "category_title": category_title,
-                                    "templates_vary_by_size": templates_vary_by_size
-                                }
-                                
-                                variant_template_data.update(template_info)
-                                
-                                all_products_templates.append(variant_template_data)
-                else:
-                    selected_template_key = st.selectbox(
-                        "Select Template",
-                        options=list(template_options.keys()),
-                        index=0 if template_options else None,
-                        key=f"template_{product_id}"
-                    )
-                    selected_template = template_options[selected_template_key]
-                    
-                    template_url = selected_template.get("image_url")
-                    placement = selected_template.get("placement", "front")
-                    
-                    template_info = {
-                        "technique": selected_template.get("technique", ""),
-                        "template_width": selected_template.get("template_width", 0),
-                        "template_height": selected_template.get("template_height", 0),
-                        "print_area_width": selected_template.get("print_area_width", 0),
-                        "print_area_height": selected_template.get("print_area_height", 0),
-                        "print_area_top": selected_template.get("print_area_top", 0),
-                        "print_area_left": selected_template.get("print_area_left", 0)
-                    }
-                    
-                    if template_url:
-                        template_id = f"template_{templates.index(selected_template) + 1}"
-                        template_image, image_url = download_image(
-                            template_url,
-                            catalog_product_id,
-                            placement,
-                            template_id
-                        )
-                        
-                        if template_image:
-                            st.image(template_image, caption=f"{product['name']} - {selected_template_key}")
-                            
-                            with st.expander("Template Information"):
-                                # Display template info without binary image data
-                                display_info = template_info.copy()
-                                st.json(display_info)
-                            
-                            if templates_vary_by_size:
-                                st.info("⚠️ This product has different templates for different sizes.")
-                            
-                            product_template = {
-                                "product_id": product_id,
-                                "catalog_product_id": catalog_product_id,
-                                "name": product['name'],
-                                "placement": placement,
-                                "template": selected_template_key,
-                                "template_url": image_url,
-                                "template_image": template_image,
-                                "main_category_id": main_category_id,
-                                "category_title": category_title,
-                                "variants": variants,
-                                "templates_vary_by_size": templates_vary_by_size
-                            }
-                            
-                            product_template.update(template_info)
-                            
-                            all_products_templates.append(product_template)
-                        else:
-                            st.warning(f"No template URL found for {product['name']} with template {selected_template_key}")
+            render_product_templates(api, product, force_refresh)
+        
+        all_products_templates = []
+        for product in selected_products:
+            all_products_templates.extend(st.session_state.template_product_results.get(product['id'], []))
         
         if all_products_templates:
             st.header("Step 3: Save Template Data")
@@ -352,16 +114,25 @@ def render_template_generator(api: PrintfulAPI):
             timestamp = time.strftime("%Y%m%d_%H%M%S")
             json_filename = f"templates_{timestamp}.json"
 
+            export_format, compact_json = render_export_options("template")
+            previous_manifest = render_previous_manifest("template")
+            
             if st.button("Save All Template Data", key="save_template_data"):
                 # Generate timestamp for filenames
                 timestamp = time.strftime("%Y%m%d_%H%M%S")
                 json_filename = f"templates_{timestamp}.json"
                 
                 # Create a ZIP file with all template data and images
-                zip_href = create_zip_file(all_products_templates, file_prefix="templates")
+                export_timings = {}
+                zip_data, zip_filename = create_zip_file(all_products_templates, file_prefix="templates",
+                                                         compact=compact_json, export_format=export_format,
+                                                         timings=export_timings,
+                                                         previous_manifest=previous_manifest)
 
                 st.success(f"All templates data and images prepared for download")
-                st.markdown(zip_href, unsafe_allow_html=True)
+                download_button(zip_data, zip_filename, "application/zip",
+                                label="Download The Json File and Templates as ZIP")
+                show_export_timings(export_timings)
                 
                 # Display templates gallery
                 st.subheader("Generated Templates Gallery")
@@ -394,10 +165,8 @@ def render_template_generator(api: PrintfulAPI):
                                 # Individual template download
                                 template_filename = f"template_{template['catalog_product_id']}_{template['placement']}.png"
                                 if "template_image" in template:
-                                    st.markdown(
-                                        get_download_link(template["template_image"], template_filename),
-                                        unsafe_allow_html=True
-                                    )
+                                    download_button(template["template_image"], template_filename,
+                                                    key=f"download_template_{product_name}_{i}")
                             
                             if i < len(templates) - 1:
                                 st.divider()
@@ -421,4 +190,576 @@ def render_template_generator(api: PrintfulAPI):
                     
                     #### JSON Data
                     The JSON file contains all the template information, including print area dimensions and positions, which can be useful for automated design workflows.
-                    """)
\ No newline at end of file
+                    """)
+            
+            render_design_preview(all_products_templates)
+
+def render_design_preview(templates: list):
+    """Render local previews of a design placed in the print area of every template
+    
+    Previews are composited locally from the downloaded templates, so they need no
+    upload or mockup generation task.
+    
+    Args:
+        templates: Template records with downloaded template images
+    """
+    st.header("Step 4: Preview a Design")
+    
+    design_file = st.file_uploader("Upload a design", type=["png", "jpg", "jpeg", "webp"],
+                                   key="template_design_upload")
+    fit_label = st.selectbox("Design Fit", options=list(FIT_MODES.keys()), key="template_design_fit")
+    
+    if not design_file:
+        return
+    
+    templates = [template for template in templates if template.get("template_image")]
+    
+    if st.button("Render Previews", key="template_render_previews"):
+        with st.spinner(f"Compositing {len(templates)} previews..."):
+            st.session_state.template_design_previews = composite_batch(
+                templates, design_file.getvalue(), FIT_MODES[fit_label]
+            )
+    
+    previews = st.session_state.get("template_design_previews")
+    if not previews or len(previews) != len(templates):
+        return
+    
+    columns = st.columns(3)
+    for i, (template, preview) in enumerate(zip(templates, previews)):
+        with columns[i % 3]:
+            caption = f"{template['name']} - {template.get('placement', '')}"
+            if "variant_size" in template:
+                caption += f" ({template['variant_size']}, {template.get('variant_color', '')})"
+            
+            if preview is None:
+                st.warning(f"Could not composite the design onto {caption}")
+                continue
+            
+            st.image(preview, caption=caption)
+            download_button(preview, f"preview_{template['catalog_product_id']}_{template.get('placement', '')}_{i}.png",
+                            key=f"download_preview_{i}")
+
+def get_template_info(template: dict) -> dict:
+    """Extract the print area information of a template
+    
+    Args:
+        template: Template data from the Printful API
+        
+    Returns:
+        dict: Technique, template dimensions and print area position
+    """
+    return {
+        "technique": template.get("technique", ""),
+        "template_width": template.get("template_width", 0),
+        "template_height": template.get("template_height", 0),
+        "print_area_width": template.get("print_area_width", 0),
+        "print_area_height": template.get("print_area_height", 0),
+        "print_area_top": template.get("print_area_top", 0),
+        "print_area_left": template.get("print_area_left", 0)
+    }
+
+def build_selected_template_records(product: dict, variants: list, main_category_id: str, category_title: str,
+                                    selected_template: dict, selected_template_key: str, template_number: int,
+                                    templates_vary_by_size: bool, images: dict = None) -> list:
+    """Download the selected template of a product and build its export record
+    
+    Args:
+        product: Store product
+        variants: Product variants
+        main_category_id: Main category ID of the catalog product
+        category_title: Category title of the catalog product
+        selected_template: Selected template data
+        selected_template_key: Label of the selected template
+        template_number: 1-based position of the template in the placement
+        templates_vary_by_size: Whether the product has different templates per size
+        images: Template images already downloaded, by URL
+        
+    Returns:
+        list: A single product template record, or an empty list if the image is unavailable
+    """
+    template_url = selected_template.get("image_url")
+    placement = selected_template.get("placement", "front")
+    
+    if not template_url:
+        return []
+    
+    if images and template_url in images:
+        template_image, image_url = images[template_url], template_url
+    else:
+        template_image, image_url = download_image(
+            template_url,
+            product['catalog_product_id'],
+            placement,
+            f"template_{template_number}"
+        )
+    
+    if not template_image:
+        return []
+    
+    product_template = {
+        "product_id": product['id'],
+        "catalog_product_id": product['catalog_product_id'],
+        "name": product['name'],
+        "placement": placement,
+        "template": selected_template_key,
+        "template_url": image_url,
+        "template_image": template_image,
+        "main_category_id": main_category_id,
+        "category_title": category_title,
+        "variants": variants,
+        "templates_vary_by_size": templates_vary_by_size
+    }
+    
+    product_template.update(get_template_info(selected_template))
+    
+    return [product_template]
+
+def build_variant_template_records(product: dict, variants: list, main_category_id: str, category_title: str,
+                                   templates_by_variant: dict, templates_vary_by_size: bool, images: dict = None) -> list:
+    """Download the template of every variant and build one export record per variant
+    
+    Args:
+        product: Store product
+        variants: Product variants
+        main_category_id: Main category ID of the catalog product
+        category_title: Category title of the catalog product
+        templates_by_variant: Templates of the selected placement per catalog variant ID
+        templates_vary_by_size: Whether the product has different templates per size
+        images: Template images already downloaded, by URL
+        
+    Returns:
+        list: Variant template records
+    """
+    records = []
+    
+    for variant in variants:
+        variant_id = variant["catalog_variant_id"]
+        variant_templates = templates_by_variant.get(variant_id, [])
+        
+        if not variant_templates:
+            continue
+        
+        variant_template = variant_templates[0]
+        template_url = variant_template.get("image_url")
+        placement = variant_template.get("placement", "front")
+        
+        if not template_url:
+            continue
+        
+        if images and template_url in images:
+            template_image, image_url = images[template_url], template_url
+        else:
+            template_image, image_url = download_image(
+                template_url,
+                product['catalog_product_id'],
+                placement,
+                f"variant_{variant_id}"
+            )
+        
+        if not template_image:
+            continue
+        
+        # Format the size value to replace Unicode characters with standard ASCII
+        size_value = variant["size"]
+        # Replace inch symbol (″) with "in" and multiplication symbol (×) with "x"
+        size_value = size_value.replace('\u2033', 'in').replace('\u00d7', 'x')
+        
+        variant_template_data = {
+            "product_id": product['id'],
+            "catalog_product_id": product['catalog_product_id'],
+            "name": product['name'],
+            "placement": placement,
+            "variant_id": variant_id,
+            "variant_size": size_value,
+            "variant_color": variant["color_code"],
+            "variant_in_stock": variant["in_stock"],
+            "template_url": image_url,
+            "template_image": template_image,
+            "main_category_id": main_category_id,
+            "category_title": category_title,
+            "templates_vary_by_size": templates_vary_by_size
+        }
+        
+        variant_template_data.update(get_template_info(variant_template))
+        
+        records.append(variant_template_data)
+    
+    return records
+
+def select_placement_templates(template_index: dict, placement: str, image_groups: dict = None) -> dict:
+    """Group the templates of one placement the way the template page presents them
+    
+    Templates are told apart by their image URL, or by their image when
+    `image_groups` tells which URLs serve identical templates, and by their
+    geometry: only templates with the same template size and print area are merged.
+    
+    Args:
+        template_index: Template index as returned by PrintfulAPI.get_template_index
+        placement: Selected placement
+        image_groups: URL of the first identical template by image URL, see
+            group_template_images()
+        
+    Returns:
+        dict: Selection with "templates", "template_options" (label -> template),
+        "templates_by_variant", "templates_vary_by_size" and "per_variant", which is
+        True when every variant gets its own template
+    """
+    placement_positions = template_index["by_placement"].get(placement, [])
+    
+    templates = [template_index["templates"][position] for position in placement_positions]
+    templates_by_size = template_index["by_size"].get(placement, {})
+    templates_by_variant = {
+        variant_id: [template_index["templates"][position] for position in positions]
+        for variant_id, positions in template_index["by_variant"].get(placement, {}).items()
+    }
+    
+    templates_vary_by_size = len(templates_by_size) > 1
+    
+    def get_image_key(template):
+        image_url = template.get('image_url', '')
+        image_key = image_groups.get(image_url, image_url) if image_groups else image_url
+        return (image_key,) + tuple(get_template_info(template)[field] for field in TEMPLATE_GEOMETRY_FIELDS)
+    
+    unique_image_urls = set(get_image_key(template) for template in templates)
+    templates_have_different_urls = len(unique_image_urls) > 1
+    
+    # Templates of all sizes collapse too once their images are known to be identical,
+    # listing the sizes of all of them
+    supported_sizes_by_position = {}
+    if (not templates_vary_by_size or image_groups) and len(templates) > 1 and not templates_have_different_urls:
+        unique_positions = {}
+        for position in placement_positions:
+            image_key = get_image_key(template_index["templates"][position])
+            if image_key not in unique_positions:
+                unique_positions[image_key] = position
+            supported_sizes_by_position.setdefault(unique_positions[image_key], {}).update(
+                dict.fromkeys(template_index["sizes"][position])
+            )
+        placement_positions = list(unique_positions.values())
+        templates = [template_index["templates"][position] for position in placement_positions]
+        templates_vary_by_size = False
+    
+    template_options = {}
+    for i, position in enumerate(placement_positions, 1):
+        template = template_index["templates"][position]
+        supported_sizes = list(supported_sizes_by_position.get(position, template_index["sizes"][position]))
+        
+        image_url = template.get('image_url', '')
+        techniques = template_index["techniques"].get(image_url, ['Unknown'])
+        
+        size_info = f" (Sizes: {', '.join(supported_sizes)})" if supported_sizes else ""
+        technique_info = f" [Techniques: {', '.join(techniques)}]" if techniques else ""
+        template_options[f"Template {i}{size_info}{technique_info}"] = template
+    
+    return {
+        "templates": templates,
+        "template_options": template_options,
+        "templates_by_variant": templates_by_variant,
+        "templates_vary_by_size": templates_vary_by_size,
+        "per_variant": len(template_options) > 1 and templates_have_different_urls
+    }
+
+def download_template_images(image_urls: list, catalog_product_id, placement: str) -> dict:
+    """Download template images, each distinct URL once
+    
+    Args:
+        image_urls: Template image URLs
+        catalog_product_id: Catalog product ID
+        placement: Placement of the templates
+        
+    Returns:
+        dict: Image data by URL, without images that could not be downloaded
+    """
+    images = {}
+    
+    for image_url in dict.fromkeys(image_urls):
+        image, _ = download_image(image_url, catalog_product_id, placement, "template")
+        if image:
+            images[image_url] = image
+    
+    return images
+
+def group_template_images(images: dict) -> tuple:
+    """Group template images that are identical although their URLs differ
+    
+    Images are grouped by their perceptual hashes first, then every match is confirmed
+    byte for byte or pixel for pixel before one image stands in for another, see
+    confirm_identical(). Confirmed groups are remembered for all sessions, see
+    remember_identical().
+    
+    Args:
+        images: Image data by URL
+        
+    Returns:
+        tuple: (image_groups, images) where image_groups maps every URL to the URL of the
+        first identical image, and images maps every URL to the data of that image, so
+        identical templates are exported as the same file
+    """
+    image_groups = confirm_identical(group_identical(get_perceptual_hashes(images)), images)
+    remember_identical(image_groups)
+    return image_groups, {image_url: images[first_url] for image_url, first_url in image_groups.items()}
+
+def group_placement_templates(template_index: dict, placement: str, catalog_product_id) -> tuple:
+    """Select the templates of a placement, collapsing per-variant templates that look identical
+    
+    Printful often serves pixel-identical templates for several sizes under different
+    URLs. Per-variant templates are all downloaded for the export anyway, so their
+    images are downloaded once per URL up front, hashed, and grouped; if all of them
+    are the same and share one print area, the product gets a single template instead.
+    URLs already confirmed identical to another image, in any session, are not
+    downloaded: the image they are identical to is downloaded in their place.
+    
+    Args:
+        template_index: Template index as returned by PrintfulAPI.get_template_index
+        placement: Selected placement
+        catalog_product_id: Catalog product ID
+        
+    Returns:
+        tuple: (selection, images) with the selection as returned by
+        select_placement_templates() and the downloaded images by URL
+    """
+    selection = select_placement_templates(template_index, placement)
+    
+    if not selection["per_variant"]:
+        return selection, {}
+    
+    image_urls = list(dict.fromkeys(variant_templates[0].get("image_url")
+                                    for variant_templates in selection["templates_by_variant"].values()
+                                    if variant_templates and variant_templates[0].get("image_url")))
+    known = get_known_identical(image_urls)
+    image_groups, images = group_template_images(
+        download_template_images([known.get(url, url) for url in image_urls], catalog_product_id, placement)
+    )
+    
+    # Map every URL to the group and the image data of the image downloaded in its place
+    image_groups = {url: image_groups[known.get(url, url)] for url in image_urls if known.get(url, url) in image_groups}
+    images = {url: images[known.get(url, url)] for url in image_groups}
+    return select_placement_templates(template_index, placement, image_groups), images
+
+def get_default_placement(placements: list):
+    """Get the placement preselected for a product
+    
+    Args:
+        placements: Available placements
+        
+    Returns:
+        The 'front' placement if available, otherwise the first one or None
+    """
+    return 'front' if 'front' in placements else next(iter(placements), None)
+
+def get_records_key(product_id, catalog_product_id, placement: str, template_key: str, variants: list,
+                    index_stored_at: float = None) -> str:
+    """Get the template_records_cache key of a template selection
+    
+    The key starts with the store product ID, which webhook invalidation relies on, and
+    identifies the exact variant set, including sizes, colors and stock, and the template
+    index the selection was made from, so records are rebuilt once any of them changes.
+    
+    Args:
+        product_id: Store product ID
+        catalog_product_id: Catalog product ID
+        placement: Selected placement
+        template_key: Label of the selected template, None for all templates of the placement
+        variants: Product variants
+        index_stored_at: Time the template index was cached
+        
+    Returns:
+        str: Cache key
+    """
+    digest = get_variant_state_digest(variants, index_stored_at)
+    return f"{product_id}_{catalog_product_id}_{placement}_{template_key}_{digest}"
+
+def build_product_template_records(product: dict, variants: list, main_category_id: str, category_title: str,
+                                   selection: dict, selected_template_key: str = None, images: dict = None) -> list:
+    """Download the templates of a placement selection and build the export records
+    
+    Args:
+        product: Store product
+        variants: Product variants
+        main_category_id: Main category ID of the catalog product
+        category_title: Category title of the catalog product
+        selection: Placement selection as returned by select_placement_templates
+        selected_template_key: Label of the selected template, ignored for per-variant selections
+        images: Template images already downloaded, by URL, see group_placement_templates()
+        
+    Returns:
+        list: Product template records
+    """
+    if selection["per_variant"]:
+        return build_variant_template_records(
+            product, variants, main_category_id, category_title,
+            selection["templates_by_variant"], selection["templates_vary_by_size"], images
+        )
+    
+    selected_template = selection["template_options"][selected_template_key]
+    return build_selected_template_records(
+        product, variants, main_category_id, category_title,
+        selected_template, selected_template_key,
+        selection["templates"].index(selected_template) + 1, selection["templates_vary_by_size"], images
+    )
+
+def collect_product_templates(api: PrintfulAPI, product: dict, placement: str = None, template_key: str = None) -> tuple:
+    """Build the template records of a product without rendering any UI
+    
+    Uses the same selection rules as the template page, with its defaults for anything
+    not given: the 'front' placement and the first template. Safe to call from
+    background threads.
+    
+    Args:
+        api: PrintfulAPI instance
+        product: Store product
+        placement: Placement to export, defaults to the page default
+        template_key: Template label to export, defaults to the first template
+        
+    Returns:
+        tuple: (records, message) where message explains why no records were built
+    """
+    catalog_product_id = product.get('catalog_product_id')
+    
+    if not catalog_product_id:
+        return [], f"No catalog product ID available for {product['name']}"
+    
+    variants, main_category_id, category_title = api.get_product_variants(product['id'])
+    
+    if not variants:
+        return [], f"No variants found for {product['name']}"
+    
+    template_index = api.get_template_index(catalog_product_id, variants)
+    
+    if not template_index["templates"]:
+        return [], f"No templates available for {product['name']}"
+    
+    placement = placement or get_default_placement(template_index["placements"])
+    
+    if placement not in template_index["by_placement"]:
+        return [], f"No templates available for placement: {placement}"
+    
+    selection, images = group_placement_templates(template_index, placement, catalog_product_id)
+    
+    if not selection["per_variant"] and template_key not in selection["template_options"]:
+        template_key = next(iter(selection["template_options"]))
+    
+    records = build_product_template_records(product, variants, main_category_id, category_title, selection,
+                                             template_key, images)
+    
+    if not records:
+        return [], f"No template images could be downloaded for {product['name']}"
+    
+    return records, ""
+
+@st.fragment
+def render_product_templates(api: PrintfulAPI, product: dict, force_refresh: bool = False):
+    """Render the template selection of a single product
+    
+    Runs as a Streamlit fragment: changing this product's placement or template only
+    reruns this function. The resulting records are stored in
+    st.session_state.template_product_results and memoized per selection in
+    st.session_state.template_records_cache; the grouped templates of each placement
+    are memoized in st.session_state.template_selection_cache.
+    
+    Args:
+        api: PrintfulAPI instance
+        product: Store product
+        force_refresh: Force refresh data from API instead of using cache
+    """
+    product_id = product['id']
+    catalog_product_id = product.get('catalog_product_id')
+    
+    st.session_state.template_product_results[product_id] = []
+    
+    st.subheader(f"Product: {product['name']}")
+    
+    if not catalog_product_id:
+        st.warning(f"No catalog product ID available for {product['name']}")
+        return
+    
+    with st.spinner(f"Fetching variants for {product['name']}..."):
+        variants, main_category_id, category_title = api.get_product_variants(product_id, force_refresh)
+    
+    if not variants:
+        st.warning(f"No variants found for {product['name']}")
+        return
+    
+    with st.spinner(f"Fetching templates for {product['name']}..."):
+        template_index = api.get_template_index(catalog_product_id, variants)
+    
+    if not template_index["templates"]:
+        st.warning(f"No templates available for {product['name']}")
+        return
+    
+    available_placements = template_index["placements"]
+    
+    default_placement = get_default_placement(available_placements)
+    
+    selected_placement = st.selectbox(
+        "Select Placement",
+        options=available_placements,
+        index=available_placements.index(default_placement) if default_placement else 0,
+        key=f"placement_{product_id}"
+    )
+    
+    if selected_placement not in template_index["by_placement"]:
+        st.warning(f"No templates available for placement: {selected_placement}")
+        return
+    
+    # Memoize the grouped templates, grouping downloads and hashes the per-variant templates
+    index_key = api.get_template_index_key(catalog_product_id, variants)
+    index_stored_at = api.cache_timestamps.get(f"template_index_cache/{index_key}")
+    selection_cache = st.session_state.template_selection_cache
+    selection_key = get_records_key(product_id, catalog_product_id, selected_placement, None, variants, index_stored_at)
+    
+    if force_refresh or selection_key not in selection_cache:
+        selection_cache[selection_key] = group_placement_templates(template_index, selected_placement,
+                                                                   catalog_product_id)
+    
+    selection, images = selection_cache[selection_key]
+    template_options = selection["template_options"]
+    per_variant = selection["per_variant"]
+    
+    if per_variant:
+        st.info("⚠️ This product has different templates for different variants. Processing all templates...")
+        selected_template_key = None
+    elif len(template_options) == 1:
+        selected_template_key = list(template_options.keys())[0]
+    else:
+        selected_template_key = st.selectbox(
+            "Select Template",
+            options=list(template_options.keys()),
+            index=0 if template_options else None,
+            key=f"template_{product_id}"
+        )
+    
+    # Remembered for background exports, which do not render the selectors
+    st.session_state.template_selections[product_id] = (selected_placement, selected_template_key)
+    
+    # Memoize the downloaded records on everything that determines them
+    records_key = get_records_key(product_id, catalog_product_id, selected_placement, selected_template_key, variants,
+                                  index_stored_at)
+    records_cache = st.session_state.template_records_cache
+    
+    if force_refresh or records_key not in records_cache:
+        records_cache[records_key] = build_product_template_records(
+            product, variants, main_category_id, category_title, selection, selected_template_key, images
+        )
+    
+    records = records_cache[records_key]
+    st.session_state.template_product_results[product_id] = records
+    
+    if per_variant:
+        for i, record in enumerate(records):
+            if i < 3:
+                st.image(record["template_image"], caption=f"{product['name']} - Size: {record['variant_size']} - Color: {record['variant_color']}")
+            elif i == 3:
+                st.info(f"... and {len(records) - 3} more variants (not displayed)")
+                break
+    elif records:
+        product_template = records[0]
+        st.image(product_template["template_image"], caption=f"{product['name']} - {selected_template_key}")
+        
+        with st.expander("Template Information"):
+            st.json(get_template_info(product_template))
+        
+        if selection["templates_vary_by_size"]:
+            st.info("⚠️ This product has different templates for different sizes.")
+    else:
+        st.warning(f"No template URL found for {product['name']} with template {selected_template_key}")
\ No newline at end of file
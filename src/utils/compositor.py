@@ -0,0 +1,159 @@
+import io
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from src.utils.workers import map_in_processes
+
+# How a design is scaled into the print area: label -> fit mode
+FIT_MODES = {
+    "Fit inside print area": "contain",
+    "Fill print area (crop)": "cover",
+    "Stretch to print area": "stretch",
+}
+
+def get_print_area_box(image_size: Tuple[int, int], template_info: Dict) -> Tuple[int, int, int, int]:
+    """Get the print area of a template in pixels of its downloaded image
+    
+    The print area is given in template coordinates (template_width x template_height),
+    which may differ from the size of the downloaded image.
+    
+    Args:
+        image_size: Width and height of the template image
+        template_info: Template record with template and print area dimensions
+    
+    Returns:
+        Tuple[int, int, int, int]: Tuple of (left, top, width, height)
+    """
+    image_width, image_height = image_size
+    template_width = template_info.get("template_width") or image_width
+    template_height = template_info.get("template_height") or image_height
+    scale_x = image_width / template_width
+    scale_y = image_height / template_height
+    
+    left = min(max(round((template_info.get("print_area_left") or 0) * scale_x), 0), image_width - 1)
+    top = min(max(round((template_info.get("print_area_top") or 0) * scale_y), 0), image_height - 1)
+    width = round((template_info.get("print_area_width") or template_width) * scale_x)
+    height = round((template_info.get("print_area_height") or template_height) * scale_y)
+    
+    return left, top, max(1, min(width, image_width - left)), max(1, min(height, image_height - top))
+
+def fit_design(design: Image.Image, width: int, height: int, fit: str = "contain") -> Tuple[Image.Image, int, int]:
+    """Resample a design to a print area
+    
+    Args:
+        design: Design image in RGBA mode
+        width: Print area width in pixels
+        height: Print area height in pixels
+        fit: "contain" keeps the whole design, "cover" fills the area and crops the
+            overflow, "stretch" ignores the aspect ratio
+    
+    Returns:
+        Tuple[Image.Image, int, int]: Tuple of (fitted_design, offset_x, offset_y) with
+        the offset of the design inside the print area
+    """
+    if fit == "stretch":
+        return design.resize((width, height), Image.LANCZOS), 0, 0
+    
+    scale_x = width / design.width
+    scale_y = height / design.height
+    scale = max(scale_x, scale_y) if fit == "cover" else min(scale_x, scale_y)
+    
+    fitted = design.resize((max(1, round(design.width * scale)), max(1, round(design.height * scale))), Image.LANCZOS)
+    
+    if fit == "cover":
+        crop_left = (fitted.width - width) // 2
+        crop_top = (fitted.height - height) // 2
+        return fitted.crop((crop_left, crop_top, crop_left + width, crop_top + height)), 0, 0
+    
+    return fitted, (width - fitted.width) // 2, (height - fitted.height) // 2
+
+def alpha_over(base: np.ndarray, overlay: np.ndarray) -> np.ndarray:
+    """Composite an RGBA overlay over an RGBA base of the same shape
+    
+    Args:
+        base: Base pixels as uint8 array of shape (height, width, 4)
+        overlay: Overlay pixels as uint8 array of shape (height, width, 4)
+    
+    Returns:
+        np.ndarray: Composited pixels as uint8 array
+    """
+    base = base.astype(np.float32) / 255
+    overlay = overlay.astype(np.float32) / 255
+    
+    overlay_alpha = overlay[..., 3:4]
+    base_alpha = base[..., 3:4] * (1 - overlay_alpha)
+    alpha = overlay_alpha + base_alpha
+    
+    color = overlay[..., :3] * overlay_alpha + base[..., :3] * base_alpha
+    color = np.divide(color, alpha, out=np.zeros_like(color), where=alpha > 0)
+    
+    return np.rint(np.concatenate((color, alpha), axis=-1) * 255).astype(np.uint8)
+
+def composite_design(template_image: bytes, design_image: bytes, template_info: Dict,
+                     fit: str = "contain") -> bytes:
+    """Place a design onto a template image inside its print area
+    
+    Args:
+        template_image: Template image as bytes
+        design_image: Design image as bytes
+        template_info: Template record with template and print area dimensions
+        fit: Fit mode, see fit_design()
+    
+    Returns:
+        bytes: Composited image as PNG
+    """
+    template = Image.open(io.BytesIO(template_image)).convert("RGBA")
+    design = Image.open(io.BytesIO(design_image)).convert("RGBA")
+    
+    left, top, width, height = get_print_area_box(template.size, template_info)
+    fitted, offset_x, offset_y = fit_design(design, width, height, fit)
+    
+    # Only the pixels covered by the design are blended
+    pixels = np.array(template)
+    x0 = left + offset_x
+    y0 = top + offset_y
+    region = pixels[y0:y0 + fitted.height, x0:x0 + fitted.width]
+    overlay = np.asarray(fitted)[:region.shape[0], :region.shape[1]]
+    pixels[y0:y0 + region.shape[0], x0:x0 + region.shape[1]] = alpha_over(region, overlay)
+    
+    buffer = io.BytesIO()
+    Image.fromarray(pixels, "RGBA").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def _composite_job(job: Tuple[bytes, bytes, Dict, str]) -> Optional[bytes]:
+    """Run one compositing job, returning None for unreadable images"""
+    try:
+        return composite_design(*job)
+    except (OSError, ValueError):
+        return None
+
+def composite_batch(templates: List[Dict], design_image: bytes, fit: str = "contain") -> List[Optional[bytes]]:
+    """Place a design onto many templates, in the shared process pool for large batches
+    
+    Templates that share an image and print area (e.g. variants of one size) are
+    composited once.
+    
+    Args:
+        templates: Template records with "template_image" and print area dimensions
+        design_image: Design image as bytes
+        fit: Fit mode, see fit_design()
+    
+    Returns:
+        List[Optional[bytes]]: Composited PNG per template, None where compositing failed
+    """
+    job_keys = []
+    jobs = {}
+    
+    for template in templates:
+        template_info = {key: template.get(key) for key in ("template_width", "template_height", "print_area_left",
+                                                             "print_area_top", "print_area_width", "print_area_height")}
+        job_key = (template.get("template_url"), len(template["template_image"]), tuple(template_info.values()))
+        job_keys.append(job_key)
+        
+        if job_key not in jobs:
+            jobs[job_key] = (template["template_image"], design_image, template_info, fit)
+    
+    results = dict(zip(jobs.keys(), map_in_processes(_composite_job, jobs.values())))
+    return [results[job_key] for job_key in job_keys]
\ No newline at end of file
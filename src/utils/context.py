@@ -0,0 +1,31 @@
+import contextlib
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+def in_script_thread() -> bool:
+    """Check whether the caller runs in a Streamlit script thread
+    
+    Returns:
+        bool: True if Streamlit commands can be rendered from the current thread
+    """
+    return get_script_run_ctx() is not None
+
+def notify(level: str, message: str) -> None:
+    """Show a Streamlit message from the script thread, ignore it elsewhere
+    
+    Args:
+        level: Streamlit message function name (e.g. 'error', 'warning')
+        message: Message to display
+    """
+    if in_script_thread():
+        getattr(st, level)(message)
+
+def spinner(text: str):
+    """Show a Streamlit spinner from the script thread, do nothing elsewhere
+    
+    Args:
+        text: Spinner text
+    """
+    if in_script_thread():
+        return st.spinner(text)
+    return contextlib.nullcontext()
\ No newline at end of file
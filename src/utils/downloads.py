@@ -0,0 +1,169 @@
+import os
+import hashlib
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple, Union
+
+import streamlit as st
+
+from config import DOWNLOAD_REGISTRY_MAX_BYTES
+
+class DownloadHandle:
+    """Reference to a registered payload that keeps it from being dropped while alive"""
+    
+    def __init__(self, registry: "DownloadRegistry", token: str):
+        self.registry = registry
+        self.token = token
+    
+    def read(self) -> bytes:
+        """Read the payload
+        
+        Returns:
+            bytes: Payload
+        """
+        return self.registry.read(self.token)
+
+class DownloadRegistry:
+    """Process-wide store of downloadable payloads
+    
+    Payloads are registered once under a token derived from their content (or from
+    the path, size and modification time of a file) and only read when a download is
+    requested. Registering the same payload again reuses the stored one. The least
+    recently used payloads are dropped once more than `max_bytes` are held, except
+    those with a live DownloadHandle, i.e. those behind a download button that is still
+    shown; file payloads are not counted since they are read from disk on demand.
+    """
+    
+    def __init__(self, max_bytes: int = DOWNLOAD_REGISTRY_MAX_BYTES):
+        """Initialize the registry
+        
+        Args:
+            max_bytes: Maximum number of payload bytes kept in memory
+        """
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.payloads: "OrderedDict[str, Tuple[Union[bytes, str], int]]" = OrderedDict()
+        # Number of live handles by token
+        self.pins: Dict[str, int] = {}
+        # Reentrant since handles may be collected, and released, while it is held
+        self.lock = threading.RLock()
+    
+    def register(self, data: Union[bytes, str]) -> DownloadHandle:
+        """Register a payload
+        
+        Args:
+            data: Payload bytes or path of a file
+        
+        Returns:
+            DownloadHandle: Handle of the payload, which stays readable as long as
+            the handle is referenced
+        """
+        if isinstance(data, str):
+            stat = os.stat(data)
+            token = hashlib.blake2b(f"{data}:{stat.st_size}:{stat.st_mtime_ns}".encode(), digest_size=16).hexdigest()
+            size = 0
+        else:
+            token = hashlib.blake2b(data, digest_size=16).hexdigest()
+            size = len(data)
+        
+        handle = DownloadHandle(self, token)
+        
+        with self.lock:
+            self.pins[token] = self.pins.get(token, 0) + 1
+            weakref.finalize(handle, self._release, token)
+            
+            if token in self.payloads:
+                self.payloads.move_to_end(token)
+                return handle
+            
+            self.payloads[token] = (data, size)
+            self.size += size
+            self._evict()
+        
+        return handle
+    
+    def _release(self, token: str) -> None:
+        """Drop the pin of a handle that was garbage collected"""
+        with self.lock:
+            self.pins[token] -= 1
+            if not self.pins[token]:
+                del self.pins[token]
+                self._evict()
+    
+    def _evict(self) -> None:
+        """Drop the least recently used unpinned payloads beyond the size cap; the lock must be held"""
+        if self.size <= self.max_bytes:
+            return
+        for token in [token for token in self.payloads if token not in self.pins]:
+            _, evicted_size = self.payloads.pop(token, (None, 0))
+            self.size -= evicted_size
+            if self.size <= self.max_bytes:
+                break
+    
+    def read(self, token: str) -> bytes:
+        """Read a registered payload
+        
+        Args:
+            token: Token of a DownloadHandle
+        
+        Returns:
+            bytes: Payload
+        
+        Raises:
+            KeyError: If the payload is unknown or was dropped
+        """
+        with self.lock:
+            data, _ = self.payloads[token]
+            self.payloads.move_to_end(token)
+        
+        if isinstance(data, str):
+            with open(data, "rb") as file:
+                return file.read()
+        return data
+
+# Registry shared by all sessions
+_registry = DownloadRegistry()
+
+def get_download_registry() -> DownloadRegistry:
+    """Get the process-wide download registry
+    
+    Returns:
+        DownloadRegistry: Shared registry
+    """
+    return _registry
+
+def download_button(data: Optional[Union[bytes, str]], filename: str, mime: str = "image/png",
+                    label: Optional[str] = None, key: Optional[str] = None) -> None:
+    """Show a button that downloads a payload on demand
+    
+    The payload is registered in the download registry and only sent to the browser
+    when the button is clicked, instead of being inlined into the page. Streamlit
+    keeps the button's callback, and with it the payload's handle, only while the
+    button is shown, so a shown button always finds its payload.
+    
+    Args:
+        data: Payload bytes or path of a file; nothing is shown when None
+        filename: Filename to use for download
+        mime: MIME type of the file
+        label: Button label, "Download <filename>" by default
+        key: Widget key, derived from the payload and filename by default
+    """
+    if data is None:
+        return
+    
+    registry = get_download_registry()
+    try:
+        handle = registry.register(data)
+    except OSError as e:
+        st.error(f"Error reading file: {e}")
+        return
+    
+    st.download_button(
+        label or f"Download {filename}",
+        data=handle.read,
+        file_name=filename,
+        mime=mime,
+        key=key or f"download_{handle.token}_{filename}",
+        on_click="ignore"
+    )
\ No newline at end of file
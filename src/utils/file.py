@@ -1,122 +1,508 @@
 import os
-import json
-import base64
-from typing import Dict, List, Any
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Any, Optional, Set, Tuple
 from datetime import datetime
-import zipfile
 import io
 import streamlit as st
 
-def get_download_link(image_data, filename: str, file_type: str = "image/png") -> str:
-    """Generate a download link for image data
+from src.utils.json_codec import dumps as json_dumps
+from src.utils.zip_writer import ParallelZipWriter
+from src.utils.manifest import hash_content, get_record_key, build_manifest, diff_manifest
+from config import EXPORT_SHARD_MIN_RECORDS, EXPORT_SHARD_WORKERS
+
+# Optional columnar export support
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Binary image fields that are written as files instead of JSON
+BINARY_KEYS = ("template_image", "mockup_image")
+
+# Folder of the images inside the ZIP; each distinct image is stored once as
+# {IMAGES_FOLDER}/{content hash}.png and records reference it by the hash
+IMAGES_FOLDER = "images"
+
+# Export formats of the data file inside the ZIP: format -> (label, file extension)
+EXPORT_FORMATS = {
+    "json": ("JSON", "json"),
+    "ndjson": ("NDJSON (one record per line)", "ndjson"),
+    "parquet": ("Parquet variant table", "parquet"),
+}
+
+# Columns of the variant table: column -> Arrow type name
+VARIANT_TABLE_COLUMNS = {
+    "store": "string",
+    "product_id": "int64",
+    "catalog_product_id": "int64",
+    "name": "string",
+    "category_title": "string",
+    "placement": "string",
+    "variant_id": "int64",
+    "size": "string",
+    "color_code": "string",
+    "in_stock": "bool",
+    "template": "string",
+    "template_url": "string",
+    "image_hash": "string",
+    "technique": "string",
+    "template_width": "float64",
+    "template_height": "float64",
+    "print_area_width": "float64",
+    "print_area_height": "float64",
+    "print_area_top": "float64",
+    "print_area_left": "float64",
+    "print_area_type": "string",
+    "dpi": "int64",
+}
+
+def add_image_hashes(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Get a record with the content hash of each of its images next to the image
+    
+    The hash of `template_image` is added as `template_image_hash`, and so on. Like
+    strip_binary_data(), this builds new dictionaries and leaves the record untouched.
     
     Args:
-        image_data: Image data as bytes
-        filename: Filename to use for download
-        file_type: MIME type of the file
+        item: Template or mockup record
         
     Returns:
-        str: HTML download link
+        Dict[str, Any]: Record with image hash fields
     """
-    if isinstance(image_data, str):
-        # For backward compatibility with file paths
-        try:
-            with open(image_data, "rb") as file:
-                image_data = file.read()
-        except Exception as e:
-            st.error(f"Error reading file: {e}")
-            return ""
-    
-    if image_data is None:
-        return ""
-        
-    b64 = base64.b64encode(image_data).decode()
-    href = f'<a href="data:{file_type};base64,{b64}" download="{filename}" class="download-button">Download {filename}</a>'
-    return href
-
-def save_json_data(data: List[Dict[str, Any]], filename: str) -> str:
+    hashed = dict(item)
+    
+    for key in BINARY_KEYS:
+        if item.get(key):
+            hashed[f"{key}_hash"] = hash_content(item[key])
+    
+    if "templates" in item:
+        hashed["templates"] = [
+            dict(template, template_image_hash=hash_content(template["template_image"]))
+            if template.get("template_image") else template
+            for template in item["templates"]
+        ]
+    
+    return hashed
+
+def strip_binary_data(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Get a record without binary image data, keeping image URLs and image hashes
+    
+    Builds new dictionaries instead of copying and deleting, so the original record
+    and its nested templates are left untouched.
+    
+    Args:
+        item: Template or mockup record
+        
+    Returns:
+        Dict[str, Any]: Record without binary image fields
+    """
+    stripped = {key: value for key, value in item.items() if key not in BINARY_KEYS}
+    
+    if "templates" in stripped:
+        stripped["templates"] = [
+            {key: value for key, value in template.items() if key != "template_image"}
+            for template in stripped["templates"]
+        ]
+    
+    return stripped
+
+def save_json_data(data: List[Dict[str, Any]], filename: str, compact: bool = False) -> str:
     """Save data to a JSON file
     
     Args:
         data: Data to save
         filename: Filename to save to
+        compact: Write without indentation, for machine consumers
         
     Returns:
         str: Path to the saved file
     """
-    with open(filename, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    with open(filename, "wb") as f:
+        f.write(json_dumps(data, compact=compact))
     return filename
 
-def create_zip_file(data: List[Dict[str, Any]], file_prefix: str = "data") -> str:
-    """Create a ZIP file containing JSON data and image files
+def get_export_formats() -> Dict[str, str]:
+    """Get the export formats available in this environment
+    
+    Returns:
+        Dict[str, str]: Export format -> label, without Parquet when pyarrow is not installed
+    """
+    return {
+        export_format: label
+        for export_format, (label, _) in EXPORT_FORMATS.items()
+        if export_format != "parquet" or pyarrow is not None
+    }
+
+def _table_value(value: Any, column_type: str) -> Any:
+    """Convert a record value to the type of its variant table column"""
+    if value is None or value == "":
+        return None
+    try:
+        if column_type == "string":
+            return str(value)
+        if column_type == "int64":
+            return int(value)
+        if column_type == "float64":
+            return float(value)
+        if column_type == "bool":
+            return bool(value)
+    except (TypeError, ValueError):
+        return None
+    return value
+
+def build_variant_rows(data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Flatten template or mockup records into one row per variant
+    
+    Records of a single variant (per variant templates) give one row. Records that
+    list their variants (selected templates and mockups) give one row per variant
+    with the record's template and print area fields repeated.
+    
+    Args:
+        data: Template or mockup records
+        
+    Returns:
+        List[Dict[str, Any]]: Rows with the VARIANT_TABLE_COLUMNS columns
+    """
+    rows = []
+    
+    for item in data:
+        base = {
+            "store": item.get("store"),
+            "product_id": item.get("product_id"),
+            "catalog_product_id": item.get("catalog_product_id"),
+            "name": item.get("name"),
+            "category_title": item.get("category_title"),
+            "placement": item.get("placement"),
+            "template": item.get("template", item.get("mockup_name")),
+            "template_url": item.get("template_url", item.get("mockup_url")),
+            "image_hash": item.get("template_image_hash", item.get("mockup_image_hash")),
+        }
+        for column in ("technique", "template_width", "template_height", "print_area_width", "print_area_height",
+                       "print_area_top", "print_area_left", "print_area_type", "dpi"):
+            base[column] = item.get(column)
+        
+        if "variant_id" in item:
+            variants = [{
+                "variant_id": item["variant_id"],
+                "size": item.get("variant_size"),
+                "color_code": item.get("variant_color"),
+                "in_stock": item.get("variant_in_stock"),
+            }]
+        else:
+            variants = [{
+                "variant_id": variant.get("catalog_variant_id"),
+                "size": variant.get("size"),
+                "color_code": variant.get("color_code"),
+                "in_stock": variant.get("in_stock"),
+            } for variant in item.get("variants", [])]
+        
+        for variant in variants:
+            row = dict(base, **variant)
+            rows.append({
+                column: _table_value(row.get(column), column_type)
+                for column, column_type in VARIANT_TABLE_COLUMNS.items()
+            })
+    
+    return rows
+
+def write_ndjson(data: List[Dict[str, Any]], file_obj) -> None:
+    """Stream records as newline-delimited JSON, one compact record per line
+    
+    Args:
+        data: Template or mockup records
+        file_obj: Binary file object to write to
+    """
+    for item in data:
+        file_obj.write(json_dumps(strip_binary_data(item), compact=True))
+        file_obj.write(b"\n")
+
+def build_parquet(data: List[Dict[str, Any]], rows: Optional[List[Dict[str, Any]]] = None) -> bytes:
+    """Build a Parquet variant table from template or mockup records
+    
+    Args:
+        data: Template or mockup records
+        rows: Variant rows already built from the records, e.g. by export shards
+        
+    Returns:
+        bytes: Parquet file
+    """
+    if pyarrow is None:
+        raise RuntimeError("Parquet export requires the pyarrow package")
+    
+    schema = pyarrow.schema([
+        (column, pyarrow.type_for_alias(column_type)) for column, column_type in VARIANT_TABLE_COLUMNS.items()
+    ])
+    table = pyarrow.Table.from_pylist(build_variant_rows(data) if rows is None else rows, schema=schema)
+    
+    buffer = io.BytesIO()
+    pyarrow.parquet.write_table(table, buffer)
+    return buffer.getvalue()
+
+def iter_image_files(item: Dict[str, Any]) -> Iterator[Tuple[str, Optional[str], Optional[bytes], Optional[str]]]:
+    """List the image files of a template or mockup record
+    
+    Image data is named by its content hash, so an image shared by several variants
+    or products has the same filename everywhere; see IMAGES_FOLDER. Legacy image
+    files on disk keep their own name.
+    
+    Args:
+        item: Record with image data or image file paths, with the hashes added by
+            add_image_hashes() if available
+        
+    Yields:
+        Tuple[str, Optional[str], Optional[bytes], Optional[str]]: Tuple of (filename
+        in the ZIP, content hash, image data, image path); either the hash and the
+        data or the path are set
+    """
+    # Handle template and mockup images
+    for image_key, path_key in [("template_image", "template_path"), ("mockup_image", "mockup_path")]:
+        # Check for new image data format
+        if image_key in item and item[image_key]:
+            content_hash = item.get(f"{image_key}_hash") or hash_content(item[image_key])
+            yield f"{IMAGES_FOLDER}/{content_hash}.png", content_hash, item[image_key], None
+        # Backward compatibility with file paths
+        elif path_key in item and item[path_key] and isinstance(item[path_key], str) and os.path.exists(item[path_key]):
+            yield os.path.basename(item[path_key]), None, None, item[path_key]
+    
+    # Handle nested templates
+    if "templates" in item:
+        for template in item["templates"]:
+            if "template_image" in template and template["template_image"]:
+                content_hash = template.get("template_image_hash") or hash_content(template["template_image"])
+                yield f"{IMAGES_FOLDER}/{content_hash}.png", content_hash, template["template_image"], None
+            elif "template_path" in template and template["template_path"] and isinstance(template["template_path"], str) and os.path.exists(template["template_path"]):
+                yield os.path.basename(template["template_path"]), None, None, template["template_path"]
+
+def add_image_files(zip_file: ParallelZipWriter, data: List[Dict[str, Any]],
+                    image_names: Optional[Set[str]] = None) -> None:
+    """Add the images of template or mockup records to a ZIP file, each distinct image once
+    
+    Args:
+        zip_file: ZIP writer
+        data: Records with image data or image file paths
+        image_names: Filenames of the images to add, None to add all
+    """
+    for item in data:
+        for image_filename, _, image_data, image_path in iter_image_files(item):
+            if (image_names is not None and image_filename not in image_names) or zip_file.has_entry(image_filename):
+                continue
+            if image_data is not None:
+                zip_file.writestr(image_filename, image_data)
+            else:
+                zip_file.write(image_path, arcname=image_filename)
+
+def hash_export_records(data: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, str], Dict[str, str]]:
+    """Hash the records and images of an export
+    
+    Records are hashed without their binary image data, as they are written to the
+    data file; images are hashed by content.
+    
+    Args:
+        data: Template or mockup records
+        
+    Returns:
+        Tuple[List[Dict[str, Any]], Dict[str, str], Dict[str, str]]: Tuple of (records
+        with the hashes added by add_image_hashes(), content hash by record key,
+        content hash by image filename)
+    """
+    hashed = [add_image_hashes(item) for item in data]
+    record_hashes = {}
+    image_hashes = {}
+    
+    for item in hashed:
+        record_hashes[get_record_key(item)] = hash_content(json_dumps(strip_binary_data(item), compact=True))
+        for image_filename, content_hash, _, image_path in iter_image_files(item):
+            if content_hash is None:
+                with open(image_path, "rb") as file:
+                    content_hash = hash_content(file.read())
+            image_hashes[image_filename] = content_hash
+    
+    return hashed, record_hashes, image_hashes
+
+def split_into_shards(data: List[Dict[str, Any]], shard_count: int) -> List[List[Dict[str, Any]]]:
+    """Split records into shards of about the same size, keeping the records of a product together
+    
+    Args:
+        data: Template or mockup records, in export order
+        shard_count: Number of shards to aim for
+        
+    Returns:
+        List[List[Dict[str, Any]]]: Shards in export order
+    """
+    shard_size = max(1, -(-len(data) // max(1, shard_count)))
+    shards = [[]]
+    
+    for item in data:
+        shard = shards[-1]
+        if len(shard) >= shard_size and item.get("product_id") != shard[-1].get("product_id"):
+            shards.append([])
+        shards[-1].append(item)
+    
+    return [shard for shard in shards if shard]
+
+def _build_shard(shard: Tuple[List[Dict[str, Any]], str, bool, Optional[Set[str]], Optional[Set[str]]]
+                 ) -> Tuple[Any, bytes]:
+    """Build the data part and the partial archive of an export shard on a worker thread
+    
+    Args:
+        shard: Tuple of (records, export_format, compact, record_keys, image_names)
+            with the records as returned by hash_export_records(); the keys and names
+            select the records and images of a differential export, None selects all
+        
+    Returns:
+        Tuple[Any, bytes]: Tuple of (data part, partial archive); the data part is the
+        JSON array or NDJSON lines of the records, or their variant rows for Parquet
+    """
+    data, export_format, compact, record_keys, image_names = shard
+    records = data if record_keys is None else [item for item in data if get_record_key(item) in record_keys]
+    
+    if export_format == "ndjson":
+        data_buffer = io.BytesIO()
+        write_ndjson(records, data_buffer)
+        data_part = data_buffer.getvalue()
+    elif export_format == "parquet":
+        data_part = build_variant_rows(records)
+    else:
+        data_part = json_dumps([strip_binary_data(item) for item in records], compact=compact)
+    
+    # Shards already run in parallel, one deflate thread each is enough
+    zip_file = ParallelZipWriter(max_workers=1)
+    add_image_files(zip_file, data, image_names)
+    return data_part, zip_file.close()
+
+def _merge_json_arrays(arrays: List[bytes], compact: bool) -> bytes:
+    """Merge JSON arrays serialized by json_dumps into one array, as if serialized at once
+    
+    Args:
+        arrays: Serialized JSON arrays
+        compact: Whether the arrays were serialized without indentation
+        
+    Returns:
+        bytes: Serialized JSON array
+    """
+    items = [array[1:-1].strip(b"\n") for array in arrays]
+    items = [item for item in items if item]
+    
+    if not items:
+        return b"[]"
+    if compact:
+        return b"[" + b",".join(items) + b"]"
+    return b"[\n" + b",\n".join(items) + b"\n]"
+
+def create_zip_file(data: List[Dict[str, Any]], file_prefix: str = "data", compact: bool = False,
+                    export_format: str = "json", timings: Optional[Dict[str, float]] = None,
+                    previous_manifest: Optional[Dict[str, Any]] = None) -> Tuple[bytes, str]:
+    """Create a ZIP file containing the exported data and image files
+    
+    Images are stored as is, the data file is deflated; see ParallelZipWriter. Each
+    distinct image is stored once under its content hash, which the records
+    reference in their `*_image_hash` fields; see IMAGES_FOLDER.
+    
+    Exports of EXPORT_SHARD_MIN_RECORDS records or more are split into one shard per
+    EXPORT_SHARD_WORKERS thread. The shards are hashed in parallel, then each one
+    serializes its records and builds a partial archive of its images, and the
+    parts are merged in export order. Hashing, CRCs and deflating release the GIL,
+    and the records are not copied to other processes.
+    
+    Every ZIP holds a manifest with the content hash of each record and image. Given
+    the manifest of an earlier export, only new or changed records and images are
+    written, together with a deletion list of those no longer exported.
     
     Args:
         data: Data containing image data
         temp_dir: Deprecated parameter, kept for backward compatibility
-        file_prefix: Prefix for the ZIP and JSON filenames
+        file_prefix: Prefix for the ZIP and data filenames
+        compact: Write the JSON file without indentation, for machine consumers
+        export_format: Format of the data file, a key of EXPORT_FORMATS
+        timings: Optional dictionary that receives the seconds spent per stage
+        previous_manifest: Manifest of an earlier export, for a differential export
         
     Returns:
-        str: HTML download link for the ZIP file
+        Tuple[bytes, str]: Tuple of (zip_data, zip_filename)
     """
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     zip_filename = f"{file_prefix}_{timestamp}.zip"
-    json_filename = f"{file_prefix}_{timestamp}.json"
-    
-    # Create a ZIP file in memory
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-        # Add JSON data to the ZIP file
-        # Create a copy of data without the image binary data to reduce JSON size
-        json_data_copy = []
-        for item in data:
-            item_copy = item.copy()
-            # Remove binary image data from JSON, keep URLs
-            for key in ["template_image", "mockup_image"]:
-                if key in item_copy:
-                    del item_copy[key]
-            
-            # Also remove template_image from nested templates
-            if "templates" in item_copy:
-                for template in item_copy["templates"]:
-                    if "template_image" in template:
-                        del template["template_image"]
-                        
-            json_data_copy.append(item_copy)
-            
-        json_data = json.dumps(json_data_copy, indent=2, ensure_ascii=False)
-        zip_file.writestr(json_filename, json_data)
+    data_filename = f"{file_prefix}_{timestamp}.{EXPORT_FORMATS[export_format][1]}"
+    
+    zip_file = ParallelZipWriter()
+    
+    sharded = len(data) >= EXPORT_SHARD_MIN_RECORDS and EXPORT_SHARD_WORKERS > 1
+    shards = split_into_shards(data, EXPORT_SHARD_WORKERS) if sharded else [data]
+    executor = ThreadPoolExecutor(max_workers=len(shards)) if sharded else None
+    
+    try:
+        started = time.perf_counter()
+        hashed_shards = list(executor.map(hash_export_records, shards)) if sharded else [hash_export_records(data)]
+        shards = [records for records, _, _ in hashed_shards]
+        data = [item for records in shards for item in records]
+        zip_file.add_timing("hash", time.perf_counter() - started)
+        
+        started = time.perf_counter()
+        record_hashes = {}
+        image_hashes = {}
+        for _, shard_record_hashes, shard_image_hashes in hashed_shards:
+            record_hashes.update(shard_record_hashes)
+            image_hashes.update(shard_image_hashes)
+        manifest = build_manifest(record_hashes, image_hashes, previous_manifest)
+        record_keys = image_names = deleted = None
+        if previous_manifest is not None:
+            record_keys, image_names, deleted = diff_manifest(manifest, previous_manifest)
+        zip_file.add_timing("manifest", time.perf_counter() - started)
         
+        if sharded:
+            started = time.perf_counter()
+            results = list(executor.map(_build_shard, [(shard, export_format, compact, record_keys, image_names)
+                                                       for shard in shards]))
+            zip_file.add_timing("shards", time.perf_counter() - started)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    
+    if sharded:
+        started = time.perf_counter()
+        data_parts = [data_part for data_part, _ in results]
+        if export_format == "ndjson":
+            zip_file.writestr(data_filename, b"".join(data_parts))
+        elif export_format == "parquet":
+            zip_file.writestr(data_filename, build_parquet(data, rows=[row for rows in data_parts for row in rows]))
+        else:
+            zip_file.writestr(data_filename, _merge_json_arrays(data_parts, compact))
+        zip_file.add_timing("serialize", time.perf_counter() - started)
+    else:
+        records = data if record_keys is None else [item for item in data if get_record_key(item) in record_keys]
+        
+        # Add the data file to the ZIP file
+        # Leave out the image binary data to reduce its size, keep URLs
+        started = time.perf_counter()
+        if export_format == "ndjson":
+            data_buffer = io.BytesIO()
+            write_ndjson(records, data_buffer)
+            zip_file.writestr(data_filename, data_buffer.getvalue())
+        elif export_format == "parquet":
+            zip_file.writestr(data_filename, build_parquet(records))
+        else:
+            json_data = json_dumps([strip_binary_data(item) for item in records], compact=compact)
+            zip_file.writestr(data_filename, json_data)
+        zip_file.add_timing("serialize", time.perf_counter() - started)
+    
+    zip_file.writestr(f"{file_prefix}_{timestamp}_manifest.json", json_dumps(manifest, compact=compact))
+    if deleted is not None:
+        zip_file.writestr(f"{file_prefix}_{timestamp}_deleted.json", json_dumps(deleted, compact=compact))
+    
+    if sharded:
+        for _, archive_data in results:
+            zip_file.merge_archive(archive_data)
+    else:
         # Add all image data to the ZIP file
-        for item in data:
-            # Handle template and mockup images
-            for image_key, path_key, prefix in [("template_image", "template_path", "template"), 
-                                               ("mockup_image", "mockup_path", "mockup")]:
-                # Check for new image data format
-                if image_key in item and item[image_key]:
-                    image_filename = f"{prefix}_{item.get('catalog_product_id', '')}_{item.get('placement', '')}.png"
-                    zip_file.writestr(image_filename, item[image_key])
-                # Backward compatibility with file paths
-                elif path_key in item and item[path_key] and isinstance(item[path_key], str) and os.path.exists(item[path_key]):
-                    image_filename = os.path.basename(item[path_key])
-                    zip_file.write(item[path_key], arcname=image_filename)
-            
-            # Handle nested templates
-            if "templates" in item:
-                for template in item["templates"]:
-                    if "template_image" in template and template["template_image"]:
-                        image_filename = f"template_{template.get('variant_id', '')}.png"
-                        zip_file.writestr(image_filename, template["template_image"])
-                    elif "template_path" in template and template["template_path"] and isinstance(template["template_path"], str) and os.path.exists(template["template_path"]):
-                        image_filename = os.path.basename(template["template_path"])
-                        zip_file.write(template["template_path"], arcname=image_filename)
-    
-    # Create download link for the ZIP file
-    zip_buffer.seek(0)
-    zip_b64 = base64.b64encode(zip_buffer.getvalue()).decode()
-    zip_href = f'<a href="data:application/zip;base64,{zip_b64}" download="{zip_filename}" class="download-button">Download The Json File and {file_prefix.capitalize()} as ZIP</a>'
-    
-    return zip_href
+        add_image_files(zip_file, data, image_names)
+    
+    zip_data = zip_file.close()
+    
+    if timings is not None:
+        timings.update(zip_file.timings)
+    
+    return zip_data, zip_filename
 
 def generate_timestamp() -> str:
     """Generate a timestamp string
@@ -1,68 +1,107 @@
 import requests
 from urllib.parse import urlparse, unquote
 import streamlit as st
-import base64
+import threading
+import time
 from io import BytesIO
 
-@st.cache_data(ttl=3600)  # Cache data for 1 hour
-def download_image(url, product_id, placement, style_id, temp_dir=None):
-    """Download image and cache it using Streamlit's cache_data decorator
+from src.utils.context import notify, spinner
+from src.api.circuit_breaker import CircuitOpenError, get_circuit_breaker
+from config import REQUEST_CONNECT_TIMEOUT, IMAGE_READ_TIMEOUT
+
+# Image cache lifetime in seconds
+IMAGE_CACHE_TTL = 3600
+
+# Sizes of the images downloaded into the cache: URL -> (size, download time). The
+# cache itself cannot be inspected, so this tracks what it holds for memory accounting.
+_image_cache_sizes = {}
+_image_cache_lock = threading.Lock()
+
+class ImageDownloadError(Exception):
+    """Raised by the cached download, so that failed downloads are not cached"""
+
+@st.cache_data(ttl=IMAGE_CACHE_TTL)  # Cache data for 1 hour
+def _fetch_image(url, product_id, placement, style_id):
+    """Download an image through the circuit breaker of its host and cache it
     
     Args:
         url: URL of the image to download
         product_id: Product ID
         placement: Placement (e.g., 'front', 'back')
         style_id: Style ID or identifier
-        temp_dir: Deprecated parameter, kept for backward compatibility
         
     Returns:
-        Tuple[bytes, str]: Image data as bytes and the original URL
+        bytes: Image data
+    
+    Raises:
+        CircuitOpenError: If the host is unavailable and the download was not tried
+        ImageDownloadError: If the download failed
     """
+    breaker = get_circuit_breaker(url)
+    if not breaker.allow_request():
+        raise CircuitOpenError(breaker.host)
+    
     try:
-        # Create a unique key for this image
-        image_key = f"{product_id}_{placement}_{style_id}"
+        with spinner(f"Downloading image..."):
+            try:
+                response = requests.get(url, timeout=(REQUEST_CONNECT_TIMEOUT, IMAGE_READ_TIMEOUT))
+            except requests.RequestException as e:
+                breaker.record_failure()
+                raise ImageDownloadError(f"Error downloading image: {e}")
         
-        # Download the image
-        with st.spinner(f"Downloading image..."):
-            response = requests.get(url)
-            if response.status_code == 200:
-                # Return the image data directly
-                return response.content, url
-            else:
-                st.error(f"Failed to download image: {response.status_code}")
-                return None, url
-    except Exception as e:
-        st.error(f"Error downloading image: {e}")
-        return None, url
+        if response.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+    finally:
+        breaker.release_probe()
+    
+    if response.status_code != 200:
+        raise ImageDownloadError(f"Failed to download image: {response.status_code}")
+    
+    with _image_cache_lock:
+        _image_cache_sizes[url] = (len(response.content), time.time())
+    return response.content
 
-@st.cache_data(ttl=3600)  # Cache data for 1 hour
-def get_image_as_base64(image_data):
-    """Convert image data to base64 encoding
+def download_image(url, product_id, placement, style_id, temp_dir=None):
+    """Download image and cache it using Streamlit's cache_data decorator
+    
+    Only successful downloads are cached. While the circuit of the image host is
+    open, downloads fail fast without an error message per image; the sidebar shows
+    the outage once.
     
     Args:
-        image_data: Image data as bytes
+        url: URL of the image to download
+        product_id: Product ID
+        placement: Placement (e.g., 'front', 'back')
+        style_id: Style ID or identifier
+        temp_dir: Deprecated parameter, kept for backward compatibility
         
     Returns:
-        str: Base64 encoded image data
+        Tuple[bytes, str]: Image data as bytes (None if the download failed) and the original URL
     """
-    if image_data is None:
-        return None
-    return base64.b64encode(image_data).decode()
+    try:
+        return _fetch_image(url, product_id, placement, style_id), url
+    except CircuitOpenError:
+        return None, url
+    except ImageDownloadError as e:
+        notify("error", str(e))
+        return None, url
 
-def get_download_link(image_data, filename, file_type="image/png"):
-    """Generate a download link for image data
+def get_image_cache_size() -> int:
+    """Get the approximate number of image bytes held by the download cache
     
-    Args:
-        image_data: Image data as bytes
-        filename: Filename to use for download
-        file_type: MIME type of the file
-        
     Returns:
-        str: HTML download link
+        int: Size in bytes of the images downloaded within the cache lifetime
     """
-    if image_data is None:
-        return ""
-    
-    b64 = get_image_as_base64(image_data)
-    href = f'<a href="data:{file_type};base64,{b64}" download="{filename}" class="download-button">Download {filename}</a>'
-    return href
\ No newline at end of file
+    expired_before = time.time() - IMAGE_CACHE_TTL
+    with _image_cache_lock:
+        for url in [url for url, (_, downloaded_at) in _image_cache_sizes.items() if downloaded_at < expired_before]:
+            del _image_cache_sizes[url]
+        return sum(size for size, _ in _image_cache_sizes.values())
+
+def clear_image_cache() -> None:
+    """Clear the image download cache of all sessions"""
+    _fetch_image.clear()
+    with _image_cache_lock:
+        _image_cache_sizes.clear()
\ No newline at end of file
@@ -0,0 +1,207 @@
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config import JOB_MAX_WORKERS, JOB_HISTORY_SIZE
+
+# Job states; the last three are final
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+class Job:
+    """Background job working through a list of items
+    
+    Progress fields are written by the worker thread and read by any session, so a
+    session that reconnects sees the job where it is.
+    """
+    
+    def __init__(self, label: str, owner: str, items: List[Any]):
+        """Initialize the job
+        
+        Args:
+            label: Label shown in the UI
+            owner: Owner key, e.g. a hash of the API key the job runs with
+            items: Items to work through
+        """
+        self.id = uuid.uuid4().hex[:12]
+        self.label = label
+        self.owner = owner
+        self.items = items
+        self.total = len(items)
+        self.done = 0
+        self.status = JOB_QUEUED
+        self.records: List[Any] = []
+        self.messages: List[str] = []
+        self.error = ""
+        self.result: Any = None
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.cancel_event = threading.Event()
+    
+    def cancel(self) -> None:
+        """Ask the job to stop after the current item"""
+        self.cancel_event.set()
+    
+    def is_finished(self) -> bool:
+        """Check whether the job reached a final state
+        
+        Returns:
+            bool: True if the job is done, failed or cancelled
+        """
+        return self.status in (JOB_DONE, JOB_FAILED, JOB_CANCELLED)
+    
+    @property
+    def elapsed(self) -> float:
+        """Seconds the job has been running"""
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+    
+    @property
+    def throughput(self) -> float:
+        """Items finished per second"""
+        return self.done / self.elapsed if self.elapsed > 0 else 0.0
+    
+    @property
+    def eta(self) -> Optional[float]:
+        """Estimated seconds until the job is done, None before the first item"""
+        if self.is_finished():
+            return 0.0
+        if not self.throughput:
+            return None
+        return (self.total - self.done) / self.throughput
+
+class JobRunner:
+    """Process-wide runner of background jobs
+    
+    Jobs run on a small thread pool, so they keep going while sessions rerun,
+    navigate away or disconnect. Only the last JOB_HISTORY_SIZE finished jobs are
+    kept.
+    """
+    
+    def __init__(self, max_workers: int = JOB_MAX_WORKERS, history_size: int = JOB_HISTORY_SIZE):
+        """Initialize the runner
+        
+        Args:
+            max_workers: Jobs running at the same time; later jobs wait in the queue
+            history_size: Finished jobs kept for their results
+        """
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="printful-job")
+        self.history_size = history_size
+        self.jobs: Dict[str, Job] = {}
+        self.lock = threading.Lock()
+    
+    def submit(self, label: str, owner: str, items: List[Any], work: Callable[[Any], Tuple[List[Any], str]],
+               finish: Optional[Callable[[Job], Any]] = None) -> Job:
+        """Submit a job
+        
+        Args:
+            label: Label shown in the UI
+            owner: Owner key, see Job
+            items: Items to work through
+            work: Called with each item, returns (records, message); a non-empty message
+                is kept as a warning of the job
+            finish: Called with the job once all items are done, its return value is
+                stored as the job result
+        
+        Returns:
+            Job: Submitted job
+        """
+        job = Job(label, owner, items)
+        with self.lock:
+            self.jobs[job.id] = job
+            self._trim()
+        self.executor.submit(self._run, job, work, finish)
+        return job
+    
+    def _run(self, job: Job, work: Callable[[Any], Tuple[List[Any], str]],
+             finish: Optional[Callable[[Job], Any]]) -> None:
+        """Work through the items of a job on a worker thread"""
+        job.status = JOB_RUNNING
+        job.started_at = time.time()
+        
+        try:
+            for item in job.items:
+                if job.cancel_event.is_set():
+                    job.status = JOB_CANCELLED
+                    return
+                records, message = work(item)
+                job.records.extend(records)
+                if message:
+                    job.messages.append(message)
+                job.done += 1
+            
+            if finish is not None and not job.cancel_event.is_set():
+                job.result = finish(job)
+            job.status = JOB_CANCELLED if job.cancel_event.is_set() else JOB_DONE
+        except Exception as e:
+            job.error = str(e)
+            job.status = JOB_FAILED
+        finally:
+            job.finished_at = time.time()
+    
+    def _trim(self) -> None:
+        """Drop the oldest finished jobs beyond the history size"""
+        finished = [job for job in self.jobs.values() if job.is_finished()]
+        for job in finished[:max(len(finished) - self.history_size, 0)]:
+            del self.jobs[job.id]
+    
+    def get(self, job_id: str) -> Optional[Job]:
+        """Get a job by ID
+        
+        Args:
+            job_id: Job ID
+        
+        Returns:
+            Optional[Job]: Job, or None if unknown or dropped
+        """
+        return self.jobs.get(job_id)
+    
+    def list_jobs(self, owner: str) -> List[Job]:
+        """List the jobs of an owner, newest first
+        
+        Args:
+            owner: Owner key
+        
+        Returns:
+            List[Job]: Jobs of the owner
+        """
+        with self.lock:
+            jobs = [job for job in self.jobs.values() if job.owner == owner]
+        return sorted(jobs, key=lambda job: job.submitted_at, reverse=True)
+
+# Runner shared by all sessions
+_runner: Optional[JobRunner] = None
+_runner_lock = threading.Lock()
+
+def get_job_runner() -> JobRunner:
+    """Get the process-wide job runner, creating it on first use
+    
+    Returns:
+        JobRunner: Shared runner
+    """
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = JobRunner()
+        return _runner
+
+def format_duration(seconds: Optional[float]) -> str:
+    """Format a duration for display
+    
+    Args:
+        seconds: Duration in seconds, None if unknown
+    
+    Returns:
+        str: Duration like "1m 05s", or "unknown"
+    """
+    if seconds is None:
+        return "unknown"
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    return f"{minutes}m {seconds:02d}s" if minutes else f"{seconds}s"
\ No newline at end of file
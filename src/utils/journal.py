@@ -0,0 +1,158 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+from typing import Any, List, Optional, Tuple
+
+from src.utils.json_codec import loads as json_loads, dumps as json_dumps
+from src.utils.snapshot import encode_tagged, decode_tagged
+from config import EXPORT_JOURNAL_DIR, EXPORT_JOURNAL_MAX_AGE
+
+# Version 2 replaced pickle with the tagged JSON of cache snapshots
+JOURNAL_VERSION = 2
+
+# Extension of checkpoint files
+CHECKPOINT_EXTENSION = ".json"
+
+def get_journal_id(*parts: Any) -> str:
+    """Derive a journal ID from everything that determines an export
+    
+    The same export started again, e.g. after a failure or an app restart, gets the
+    same ID and therefore resumes from its journal.
+    
+    Args:
+        parts: JSON-serializable values identifying the export
+    
+    Returns:
+        str: 32 hex digits
+    """
+    key = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+
+class ExportJournal:
+    """Local checkpoint journal of an export
+    
+    Every completed product is written to its own file as soon as it is done, with
+    its records including the downloaded images, so an interrupted export can skip
+    it when run again. Checkpoints are tagged JSON, see encode_tagged(). Files are
+    written to a temporary name and renamed, so a crash never leaves a partial
+    checkpoint behind.
+    """
+    
+    def __init__(self, journal_id: str, directory: str = EXPORT_JOURNAL_DIR):
+        """Open a journal; its directory is created with the first checkpoint
+        
+        Args:
+            journal_id: ID returned by get_journal_id()
+            directory: Directory holding all journals
+        """
+        self.path = os.path.join(directory, journal_id)
+        self.lock = threading.Lock()
+    
+    def _item_path(self, item_id: Any) -> str:
+        """Get the checkpoint file of an item"""
+        return os.path.join(self.path, f"{item_id}{CHECKPOINT_EXTENSION}")
+    
+    def get(self, item_id: Any) -> Optional[Tuple[List[Any], str]]:
+        """Read the checkpoint of an item
+        
+        Args:
+            item_id: Item ID, e.g. a store product ID
+        
+        Returns:
+            Optional[Tuple[List[Any], str]]: Tuple of (records, message), or None if the
+            item was not completed or its checkpoint is unreadable; unreadable
+            checkpoints are deleted, so the item is exported again
+        """
+        path = self._item_path(item_id)
+        
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+        except OSError:
+            return None
+        
+        # Any checkpoint that cannot be decoded, e.g. a truncated one or one of another
+        # version, counts as missing
+        try:
+            checkpoint = json_loads(data)
+            if not isinstance(checkpoint, dict) or checkpoint.get("version") != JOURNAL_VERSION:
+                raise ValueError("Unsupported checkpoint version")
+            records = decode_tagged(checkpoint["records"])
+            message = checkpoint["message"]
+            if not isinstance(records, list) or not isinstance(message, str):
+                raise ValueError("Corrupt checkpoint")
+        except Exception:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        
+        return records, message
+    
+    def put(self, item_id: Any, records: List[Any], message: str = "") -> None:
+        """Write the checkpoint of a completed item
+        
+        Args:
+            item_id: Item ID
+            records: Records of the item
+            message: Message of the item
+        
+        Raises:
+            ValueError: If the records hold data that cannot be stored, see encode_tagged()
+        """
+        checkpoint = {"version": JOURNAL_VERSION, "records": encode_tagged(records), "message": message,
+                      "completed_at": time.time()}
+        data = json_dumps(checkpoint, compact=True)
+        path = self._item_path(item_id)
+        temp_path = f"{path}.tmp"
+        
+        with self.lock:
+            os.makedirs(self.path, exist_ok=True)
+            with open(temp_path, "wb") as file:
+                file.write(data)
+            os.replace(temp_path, path)
+    
+    def completed(self) -> List[str]:
+        """List the IDs of the completed items
+        
+        Returns:
+            List[str]: Item IDs as strings
+        """
+        try:
+            return [name[:-len(CHECKPOINT_EXTENSION)] for name in os.listdir(self.path)
+                    if name.endswith(CHECKPOINT_EXTENSION)]
+        except OSError:
+            return []
+    
+    def remove(self) -> None:
+        """Delete the journal, once the export it belongs to is done"""
+        shutil.rmtree(self.path, ignore_errors=True)
+
+def remove_expired_journals(directory: str = EXPORT_JOURNAL_DIR, max_age: int = EXPORT_JOURNAL_MAX_AGE) -> int:
+    """Delete journals of exports that were abandoned
+    
+    Args:
+        directory: Directory holding all journals
+        max_age: Seconds since the last checkpoint after which a journal is deleted
+    
+    Returns:
+        int: Number of deleted journals
+    """
+    removed = 0
+    expired_before = time.time() - max_age
+    
+    try:
+        entries = list(os.scandir(directory))
+    except OSError:
+        return 0
+    
+    for entry in entries:
+        if entry.is_dir() and entry.stat().st_mtime < expired_before:
+            shutil.rmtree(entry.path, ignore_errors=True)
+            removed += 1
+    
+    return removed
\ No newline at end of file
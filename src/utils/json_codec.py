@@ -0,0 +1,54 @@
+import json
+from typing import Any, Union
+
+# Optional fast JSON backends, in order of preference
+try:
+    import orjson
+    JSON_BACKEND = "orjson"
+except ImportError:
+    orjson = None
+    try:
+        import msgspec
+        JSON_BACKEND = "msgspec"
+    except ImportError:
+        msgspec = None
+        JSON_BACKEND = "json"
+
+def loads(data: Union[bytes, str]) -> Any:
+    """Decode JSON with the fastest available backend
+    
+    Args:
+        data: JSON document as bytes or string
+    
+    Returns:
+        Any: Decoded data
+    """
+    if JSON_BACKEND == "orjson":
+        return orjson.loads(data)
+    if JSON_BACKEND == "msgspec":
+        return msgspec.json.decode(data)
+    return json.loads(data)
+
+def dumps(data: Any, compact: bool = False) -> bytes:
+    """Encode data as UTF-8 JSON with the fastest available backend
+    
+    Non-ASCII characters are written as is, like json.dumps(..., ensure_ascii=False),
+    which the exports have always used, so exported files keep the bytes of earlier
+    versions.
+    
+    Args:
+        data: Data to encode
+        compact: Write without indentation or spaces, for machine consumers
+    
+    Returns:
+        bytes: UTF-8 encoded JSON document
+    """
+    if JSON_BACKEND == "orjson":
+        option = orjson.OPT_NON_STR_KEYS if compact else orjson.OPT_NON_STR_KEYS | orjson.OPT_INDENT_2
+        return orjson.dumps(data, option=option)
+    if JSON_BACKEND == "msgspec":
+        encoded = msgspec.json.encode(data)
+        return encoded if compact else msgspec.json.format(encoded, indent=2)
+    if compact:
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return json.dumps(data, indent=2, ensure_ascii=False).encode("utf-8")
\ No newline at end of file
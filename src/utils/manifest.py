@@ -0,0 +1,98 @@
+import hashlib
+from datetime import datetime
+from typing import Any, Dict, Optional, Set, Tuple
+
+from src.utils.json_codec import loads as json_loads
+
+MANIFEST_VERSION = 1
+
+def hash_content(data: bytes) -> str:
+    """Hash the content of a record or an image
+    
+    Args:
+        data: Serialized record or image bytes
+    
+    Returns:
+        str: 32 hex digits
+    """
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def get_record_key(item: Dict[str, Any]) -> str:
+    """Get the key that identifies a template or mockup record across exports
+    
+    Args:
+        item: Template or mockup record
+    
+    Returns:
+        str: Key like "12345/front/4012", prefixed with the store in multi-store exports
+    """
+    parts = [item.get("store"), item.get("product_id"), item.get("placement"), item.get("variant_id")]
+    return "/".join(str(part) for part in parts if part not in (None, ""))
+
+def build_manifest(record_hashes: Dict[str, str], image_hashes: Dict[str, str],
+                   previous: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Build the manifest of an export
+    
+    Args:
+        record_hashes: Content hash by record key
+        image_hashes: Content hash by image filename
+        previous: Manifest a differential export was built against
+    
+    Returns:
+        Dict[str, Any]: Manifest listing every record and image of the export, also
+        those left out of a differential bundle
+    """
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "records": record_hashes,
+        "images": image_hashes,
+    }
+    if previous is not None:
+        manifest["base"] = previous.get("created_at")
+    return manifest
+
+def load_manifest(data: bytes) -> Dict[str, Any]:
+    """Read a manifest written by an earlier export
+    
+    Args:
+        data: Manifest file content
+    
+    Returns:
+        Dict[str, Any]: Manifest
+    
+    Raises:
+        ValueError: If the data is not a manifest of a supported version
+    """
+    try:
+        manifest = json_loads(data)
+    except ValueError as e:
+        raise ValueError(f"Manifest is not valid JSON: {e}")
+    
+    if (not isinstance(manifest, dict) or manifest.get("version") != MANIFEST_VERSION
+            or not isinstance(manifest.get("records"), dict) or not isinstance(manifest.get("images"), dict)):
+        raise ValueError("File is not an export manifest of a supported version")
+    return manifest
+
+def diff_manifest(current: Dict[str, Any], previous: Dict[str, Any]) -> Tuple[Set[str], Set[str], Dict[str, Any]]:
+    """Compare the manifest of an export with the manifest of an earlier one
+    
+    Args:
+        current: Manifest of this export
+        previous: Manifest of the earlier export
+    
+    Returns:
+        Tuple[Set[str], Set[str], Dict[str, Any]]: Tuple of (keys of new or changed
+        records, filenames of new or changed images, deletion list)
+    """
+    changed_records = {key for key, content_hash in current["records"].items()
+                       if previous["records"].get(key) != content_hash}
+    changed_images = {name for name, content_hash in current["images"].items()
+                      if previous["images"].get(name) != content_hash}
+    
+    deleted: Dict[str, Any] = {
+        "base": previous.get("created_at"),
+        "records": sorted(set(previous["records"]) - set(current["records"])),
+        "images": sorted(set(previous["images"]) - set(current["images"])),
+    }
+    return changed_records, changed_images, deleted
\ No newline at end of file
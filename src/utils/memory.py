@@ -0,0 +1,386 @@
+import sys
+import time
+import threading
+import tracemalloc
+from typing import Any, Dict, List, Optional, Tuple
+
+import streamlit as st
+from streamlit.runtime import Runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from config import MEMORY_ACCOUNTING_MODE, MEMORY_SESSION_MAX_BYTES, MEMORY_GLOBAL_MAX_BYTES, MEMORY_EVICTION_TARGET, \
+    MEMORY_TRACEMALLOC_FRAMES, MEMORY_TRACEMALLOC_INTERVAL
+from src.api.printful import CACHE_NAMES, PrintfulAPI
+from src.api.webhooks import PRODUCT_CACHE_NAMES
+from src.utils.image import get_image_cache_size, clear_image_cache
+
+# Session state caches that are measured, in addition to the API client caches
+SESSION_CACHE_NAMES = CACHE_NAMES + PRODUCT_CACHE_NAMES + ["downloaded_images", "template_design_previews",
+                                                           "multi_store_caches"]
+
+# Caches whose entries are namespaces of further caches, which are filled in place
+NAMESPACE_CACHE_NAMES = ["multi_store_caches"]
+
+# Sizes of the entries of one cache measured at the last rerun: key -> (fingerprint of
+# the value, size), see measure_cache()
+EntrySizes = Dict[Any, Tuple[Tuple[Any, ...], int]]
+
+# Caches in eviction order: derived data first, store data last; the oldest entries
+# of a cache are evicted first
+EVICTION_ORDER = [
+    "template_design_previews",
+    "downloaded_images",
+    "template_records_cache",
+    "mockup_records_cache",
+    "template_selection_cache",
+    "generated_mockups_cache",
+    "mockup_images_cache",
+    "template_data_cache",
+    "template_index_cache",
+    "mockup_styles_cache",
+    "multi_store_caches",
+    "product_variants_cache",
+    "catalog_api_cache",
+    "api_cache"
+]
+
+def deep_sizeof(obj: Any, seen: Optional[set] = None) -> int:
+    """Approximate the memory used by an object and everything it references
+    
+    Containers, response models and plain objects are followed; objects already in
+    `seen` are not counted again, so shared data is counted once per call site.
+    
+    Args:
+        obj: Object to measure
+        seen: IDs of objects already counted
+    
+    Returns:
+        int: Size in bytes
+    """
+    if seen is None:
+        seen = set()
+    
+    size = 0
+    stack = [obj]
+    
+    while stack:
+        current = stack.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+        size += sys.getsizeof(current)
+        
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            stack.extend(current)
+        elif isinstance(current, (str, bytes, bytearray, int, float, bool, type(None))):
+            continue
+        elif hasattr(current, "__slots__") and not isinstance(current, type):
+            stack.extend(getattr(current, name) for name in current.__slots__ if hasattr(current, name))
+        elif hasattr(current, "__dict__") and not isinstance(current, type) and not callable(current):
+            stack.append(current.__dict__)
+    
+    return size
+
+def get_items(cache: Dict) -> List[Tuple[Any, Any]]:
+    """Get the entries of a cache while no API client writes to it"""
+    with PrintfulAPI.cache_lock:
+        return list(cache.items())
+
+def measure_cache(cache: Any, previous: EntrySizes, entry_sizes: EntrySizes, cache_name: str = "",
+                  timestamps: Optional[Dict[str, float]] = None) -> int:
+    """Approximate the size of a cache, measuring only entries that changed since the last call
+    
+    An entry keeps the size measured before while its fingerprint is the same: the
+    value is the same object with the same shallow size, it was not stored again
+    (its cache_timestamps stamp), and no cached value was changed in place since
+    (PrintfulAPI.cache_generation). The shallow size guards against the ID of a
+    freed value being reused by a new one. The cache is therefore not walked again
+    on every rerun.
+    
+    Args:
+        cache: Cache dictionary, or any other session state value, which is measured
+            completely
+        previous: Entry sizes of the cache from the last call
+        entry_sizes: Receives the entry sizes of this call
+        cache_name: Name of the cache in `timestamps`
+        timestamps: cache_timestamps of the caches, by "<cache name>/<key>"
+    
+    Returns:
+        int: Size in bytes
+    """
+    if not isinstance(cache, dict):
+        return deep_sizeof(cache)
+    
+    timestamps = timestamps or {}
+    generation = PrintfulAPI.cache_generation
+    size = sys.getsizeof(cache)
+    for key, value in get_items(cache):
+        fingerprint = (id(value), sys.getsizeof(value), timestamps.get(f"{cache_name}/{key}"), generation)
+        known = previous.get(key)
+        if known is not None and known[0] == fingerprint:
+            entry_sizes[key] = known
+        else:
+            entry_sizes[key] = (fingerprint, deep_sizeof(key) + deep_sizeof(value))
+        size += entry_sizes[key][1]
+    return size
+
+def measure_caches(caches: Dict[str, Any], previous: Optional[Dict[str, EntrySizes]] = None) -> Tuple[Dict[str, int], Dict[str, EntrySizes]]:
+    """Approximate the size of each cache of a session
+    
+    Args:
+        caches: Caches by name
+        previous: Entry sizes returned by the last call for the same caches
+    
+    Returns:
+        Tuple[Dict[str, int], Dict[str, EntrySizes]]: Tuple of (size in bytes by cache
+        name, entry sizes to pass to the next call)
+    """
+    previous = previous or {}
+    sizes = {}
+    entry_sizes = {}
+    
+    for cache_name, cache in caches.items():
+        if cache_name in NAMESPACE_CACHE_NAMES and isinstance(cache, dict):
+            # The caches of each namespace are measured on their own
+            sizes[cache_name] = sys.getsizeof(cache)
+            for namespace, namespace_caches in get_items(cache):
+                for inner_name, inner_cache in namespace_caches.items():
+                    path = f"{cache_name}/{namespace}/{inner_name}"
+                    entry_sizes[path] = {}
+                    sizes[cache_name] += measure_cache(inner_cache, previous.get(path, {}), entry_sizes[path],
+                                                       inner_name, namespace_caches.get("cache_timestamps"))
+        else:
+            entry_sizes[cache_name] = {}
+            sizes[cache_name] = measure_cache(cache, previous.get(cache_name, {}), entry_sizes[cache_name],
+                                              cache_name, caches.get("cache_timestamps"))
+    
+    return sizes, entry_sizes
+
+def evict_entries(caches: Dict[str, Any], sizes: Dict[str, int], target_bytes: int) -> int:
+    """Evict cache entries until the caches of a session fit a size
+    
+    Args:
+        caches: Caches by name, evicted in EVICTION_ORDER
+        sizes: Size of each cache as returned by measure_caches(), updated in place
+        target_bytes: Total size to get below
+    
+    Returns:
+        int: Number of evicted entries
+    """
+    timestamps = caches.get("cache_timestamps", {})
+    total = sum(sizes.values())
+    evicted = 0
+    
+    for cache_name in EVICTION_ORDER:
+        cache = caches.get(cache_name)
+        if total <= target_bytes:
+            break
+        if not cache:
+            continue
+        
+        # Lists of session results are dropped as a whole
+        if isinstance(cache, list):
+            total -= sizes.get(cache_name, 0)
+            sizes[cache_name] = sys.getsizeof([])
+            evicted += len(cache)
+            cache.clear()
+            continue
+        
+        for key, _ in get_items(cache):
+            if total <= target_bytes:
+                break
+            with PrintfulAPI.cache_lock:
+                value = cache.pop(key, None)
+                timestamps.pop(f"{cache_name}/{key}", None)
+            entry_size = deep_sizeof(key) + deep_sizeof(value)
+            sizes[cache_name] = max(sizes.get(cache_name, 0) - entry_size, 0)
+            total -= entry_size
+            evicted += 1
+    
+    return evicted
+
+class SessionMemory:
+    """Cache sizes of one session at its last rerun"""
+    
+    def __init__(self, caches: Dict[str, Any], sizes: Dict[str, int], entry_sizes: Dict[str, EntrySizes]):
+        """Initialize the record
+        
+        Args:
+            caches: Caches by name
+            sizes: Size in bytes by cache name
+            entry_sizes: Entry sizes as returned by measure_caches()
+        """
+        self.caches = caches
+        self.sizes = sizes
+        self.entry_sizes = entry_sizes
+        self.last_seen = time.time()
+        self.evicted = 0
+    
+    @property
+    def total(self) -> int:
+        """Total size of the session caches in bytes"""
+        return sum(self.sizes.values())
+
+class MemoryLedger:
+    """Process-wide accounting of the session caches
+    
+    Each session reports its cache sizes on every rerun, measuring only the entries
+    that changed since its last rerun. Sessions over MEMORY_SESSION_MAX_BYTES evict
+    their own oldest entries; when all sessions together exceed
+    MEMORY_GLOBAL_MAX_BYTES, the image cache is cleared first and then the reporting
+    session evicts down to its share of the cap. Sessions only ever evict their own
+    caches, so the caches of other sessions are never touched from another script
+    thread. Eviction stops at MEMORY_EVICTION_TARGET of the cap, so it does not run
+    on every rerun.
+    
+    In "tracemalloc" mode the global cap is checked against the memory traced by
+    tracemalloc, which also covers data outside the measured caches, and the top
+    allocation sites are sampled every MEMORY_TRACEMALLOC_INTERVAL seconds.
+    """
+    
+    def __init__(self, session_max_bytes: int = MEMORY_SESSION_MAX_BYTES,
+                 global_max_bytes: int = MEMORY_GLOBAL_MAX_BYTES, mode: str = MEMORY_ACCOUNTING_MODE):
+        """Initialize the ledger
+        
+        Args:
+            session_max_bytes: Cache bytes per session before eviction, 0 disables the cap
+            global_max_bytes: Cache bytes of all sessions before eviction, 0 disables the cap
+            mode: "deep" or "tracemalloc"
+        """
+        self.session_max_bytes = session_max_bytes
+        self.global_max_bytes = global_max_bytes
+        self.mode = mode
+        self.sessions: Dict[str, SessionMemory] = {}
+        self.top_allocations: List[Tuple[str, int]] = []
+        self.sampled_at = 0.0
+        self.lock = threading.Lock()
+    
+    def prune(self) -> None:
+        """Forget sessions that ended"""
+        if not Runtime.exists():
+            return
+        runtime = Runtime.instance()
+        for session_id in list(self.sessions):
+            if not runtime.is_active_session(session_id):
+                self.sessions.pop(session_id, None)
+    
+    def get_total(self) -> int:
+        """Get the memory counted against the global cap
+        
+        Returns:
+            int: Traced memory in "tracemalloc" mode while tracing, otherwise the size of
+            all session caches and the image cache in bytes
+        """
+        if self.mode == "tracemalloc" and tracemalloc.is_tracing():
+            return tracemalloc.get_traced_memory()[0]
+        return sum(session.total for session in self.sessions.values()) + get_image_cache_size()
+    
+    def sample_allocations(self) -> None:
+        """Record the top allocation sites, at most every MEMORY_TRACEMALLOC_INTERVAL seconds"""
+        if not tracemalloc.is_tracing() or time.time() - self.sampled_at < MEMORY_TRACEMALLOC_INTERVAL:
+            return
+        self.sampled_at = time.time()
+        statistics = tracemalloc.take_snapshot().statistics("filename")[:5]
+        self.top_allocations = [(str(stat.traceback[0].filename), stat.size) for stat in statistics]
+    
+    def account(self, session_id: str, caches: Dict[str, Any]) -> SessionMemory:
+        """Measure the caches of a session and enforce the caps
+        
+        Args:
+            session_id: ID of the session
+            caches: Caches of the session by name
+        
+        Returns:
+            SessionMemory: Cache sizes of the session after eviction
+        """
+        with self.lock:
+            previous = self.sessions.get(session_id)
+        
+        session = SessionMemory(caches, *measure_caches(caches, previous.entry_sizes if previous else None))
+        
+        with self.lock:
+            if previous is not None:
+                session.evicted = previous.evicted
+            self.sessions[session_id] = session
+            self.prune()
+            
+            if self.session_max_bytes and session.total > self.session_max_bytes:
+                session.evicted += evict_entries(caches, session.sizes,
+                                                 int(self.session_max_bytes * MEMORY_EVICTION_TARGET))
+            
+            if self.mode == "tracemalloc":
+                self.sample_allocations()
+            
+            if self.global_max_bytes and self.get_total() > self.global_max_bytes:
+                self.evict_global(session_id)
+        
+        return session
+    
+    def evict_global(self, current_session_id: str) -> None:
+        """Evict until all sessions fit the global cap, as far as the current session's share allows
+        
+        Other sessions evict their share on their own next rerun.
+        
+        Args:
+            current_session_id: Session that reported last
+        """
+        target = int(self.global_max_bytes * MEMORY_EVICTION_TARGET)
+        
+        clear_image_cache()
+        
+        excess = self.get_total() - target
+        if excess <= 0:
+            return
+        
+        session = self.sessions[current_session_id]
+        session_target = max(session.total - excess, target // len(self.sessions))
+        if session.total > session_target:
+            session.evicted += evict_entries(session.caches, session.sizes, session_target)
+
+# Ledger shared by all sessions
+_ledger = MemoryLedger()
+
+def get_memory_ledger() -> MemoryLedger:
+    """Get the process-wide memory ledger
+    
+    Returns:
+        MemoryLedger: Shared ledger
+    """
+    return _ledger
+
+def start_memory_tracing() -> None:
+    """Start tracemalloc once per process if MEMORY_ACCOUNTING_MODE is "tracemalloc" """
+    if MEMORY_ACCOUNTING_MODE == "tracemalloc" and not tracemalloc.is_tracing():
+        tracemalloc.start(MEMORY_TRACEMALLOC_FRAMES)
+
+def account_session_memory() -> Optional[SessionMemory]:
+    """Measure the caches of the current session and enforce the memory caps
+    
+    Returns:
+        Optional[SessionMemory]: Cache sizes of the session, or None outside a session
+    """
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return None
+    
+    caches = {cache_name: st.session_state[cache_name] for cache_name in SESSION_CACHE_NAMES
+              if cache_name in st.session_state and isinstance(st.session_state[cache_name], (dict, list))}
+    return get_memory_ledger().account(ctx.session_id, caches)
+
+def format_bytes(size: int) -> str:
+    """Format a byte count for display
+    
+    Args:
+        size: Size in bytes
+    
+    Returns:
+        str: Size in KB, MB or GB
+    """
+    for unit in ("KB", "MB"):
+        size /= 1024
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+    return f"{size / 1024:.2f} GB"
\ No newline at end of file
@@ -0,0 +1,236 @@
+import io
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+
+from config import PHASH_MAX_DISTANCE, PHASH_CACHE_ENTRIES
+
+# Images are reduced to HASH_IMAGE_SIZE squared gray pixels, and the lowest
+# HASH_SIZE squared DCT frequencies of that give the 64 bits of the hash
+HASH_IMAGE_SIZE = 32
+HASH_SIZE = 8
+
+# Perceptual hash with the pixel size and the mean color of the image:
+# (hash, width, height, color); the hash only captures structure, the color
+# tells apart e.g. plain templates of different colors
+PerceptualHash = Tuple[int, int, int, int]
+
+def _dct_matrix(size: int) -> np.ndarray:
+    """Get the orthonormal DCT-II matrix of a size"""
+    frequencies = np.arange(size)[:, None]
+    positions = np.arange(size)[None, :]
+    matrix = np.cos(np.pi * (2 * positions + 1) * frequencies / (2 * size)) * np.sqrt(2 / size)
+    matrix[0] /= np.sqrt(2)
+    return matrix.astype(np.float32)
+
+_DCT = _dct_matrix(HASH_IMAGE_SIZE)
+
+def compute_perceptual_hashes(images: Sequence[bytes]) -> List[Optional[PerceptualHash]]:
+    """Compute the DCT perceptual hashes of a batch of images
+    
+    Each image is composited onto white, so transparent areas hash the same whatever
+    their hidden color, and reduced to a small image. The DCT of its gray values, the
+    medians, the hash bits and the mean colors of the whole batch are then computed
+    in one go.
+    
+    Args:
+        images: Image data
+    
+    Returns:
+        List[Optional[PerceptualHash]]: Hash of each image, None if it cannot be decoded
+    """
+    if not images:
+        return []
+    
+    pixels = np.zeros((len(images), HASH_IMAGE_SIZE, HASH_IMAGE_SIZE, 3), dtype=np.float32)
+    sizes: List[Optional[Tuple[int, int]]] = []
+    
+    for index, image_data in enumerate(images):
+        try:
+            with Image.open(io.BytesIO(image_data)) as image:
+                sizes.append(image.size)
+                small = image.convert("RGBA").resize((HASH_IMAGE_SIZE, HASH_IMAGE_SIZE), Image.Resampling.BOX)
+        except (OSError, ValueError, Image.DecompressionBombError):
+            sizes.append(None)
+            continue
+        
+        background = Image.new("RGBA", small.size, "white")
+        background.alpha_composite(small)
+        pixels[index] = np.asarray(background.convert("RGB"), dtype=np.float32)
+    
+    # ITU-R 601-2 luma, as used by Image.convert("L")
+    gray = pixels @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    coefficients = _DCT @ gray @ _DCT.T
+    low = coefficients[:, :HASH_SIZE, :HASH_SIZE].reshape(len(images), -1)
+    # The DC coefficient is the mean brightness and left out of the median
+    medians = np.median(low[:, 1:], axis=1, keepdims=True)
+    hashes = np.packbits(low > medians, axis=1).view(">u8").ravel()
+    
+    # Mean color with 4 bits per channel, packed as 0xRGB
+    channels = (pixels.mean(axis=(1, 2)) // 16).astype(np.int64)
+    colors = (channels[:, 0] << 8) | (channels[:, 1] << 4) | channels[:, 2]
+    
+    return [
+        (int(image_hash), size[0], size[1], int(color)) if size is not None else None
+        for image_hash, size, color in zip(hashes, sizes, colors)
+    ]
+
+# Perceptual hashes of the images downloaded so far, shared by all sessions: URL -> hash
+_hashes: Dict[str, PerceptualHash] = {}
+_hashes_lock = threading.Lock()
+
+def get_perceptual_hashes(images: Dict[str, bytes]) -> Dict[str, PerceptualHash]:
+    """Get the perceptual hashes of images by URL, computing each one only once
+    
+    Args:
+        images: Image data by URL
+    
+    Returns:
+        Dict[str, PerceptualHash]: Hash by URL, without images that cannot be decoded
+    """
+    with _hashes_lock:
+        hashes = {url: _hashes[url] for url in images if url in _hashes}
+    
+    missing = [url for url in images if url not in hashes]
+    if missing:
+        computed = dict(zip(missing, compute_perceptual_hashes([images[url] for url in missing])))
+        computed = {url: image_hash for url, image_hash in computed.items() if image_hash is not None}
+        hashes.update(computed)
+        
+        with _hashes_lock:
+            _hashes.update(computed)
+            # Forget the oldest hashes beyond the cap
+            for url in list(_hashes)[:max(len(_hashes) - PHASH_CACHE_ENTRIES, 0)]:
+                del _hashes[url]
+    
+    return hashes
+
+# Images confirmed identical by confirm_identical(), shared by all sessions:
+# URL -> URL of the first identical image
+_identical: Dict[str, str] = {}
+
+def get_known_identical(urls: Sequence[str]) -> Dict[str, str]:
+    """Get the images already confirmed identical to another image, in any session
+    
+    Args:
+        urls: Image URLs
+    
+    Returns:
+        Dict[str, str]: URL of the first identical image by URL, for the known URLs only
+    """
+    with _hashes_lock:
+        return {url: _identical[url] for url in urls if url in _identical}
+
+def remember_identical(groups: Dict[str, str]) -> None:
+    """Remember confirmed groups of identical images, so their other URLs need no download
+    
+    Args:
+        groups: URL of the first identical image by URL, see confirm_identical()
+    """
+    with _hashes_lock:
+        for url, first_url in groups.items():
+            if url != first_url:
+                _identical[url] = _identical.get(first_url, first_url)
+        # Forget the oldest groups beyond the cap
+        for url in list(_identical)[:max(len(_identical) - PHASH_CACHE_ENTRIES, 0)]:
+            del _identical[url]
+
+def hamming_distances(hashes: np.ndarray) -> np.ndarray:
+    """Count the differing bits of every pair of 64-bit hashes
+    
+    Args:
+        hashes: Array of N hashes as uint64
+    
+    Returns:
+        np.ndarray: N x N matrix of bit counts
+    """
+    x = hashes[:, None] ^ hashes[None, :]
+    # Population count of every element, summing bits in ever larger groups
+    x = x - ((x >> np.uint64(1)) & np.uint64(0x5555555555555555))
+    x = (x & np.uint64(0x3333333333333333)) + ((x >> np.uint64(2)) & np.uint64(0x3333333333333333))
+    x = (x + (x >> np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    return ((x * np.uint64(0x0101010101010101)) >> np.uint64(56)).astype(np.int64)
+
+def group_identical(hashes: Dict[str, PerceptualHash], max_distance: int = PHASH_MAX_DISTANCE) -> Dict[str, str]:
+    """Group visually identical images
+    
+    Images are identical when they have the same pixel size and mean color and their
+    hashes differ in at most `max_distance` bits. Templates of different sizes that
+    are scaled versions of each other therefore stay apart.
+    
+    Args:
+        hashes: Perceptual hash by key, e.g. by image URL
+        max_distance: Largest number of differing bits within a group
+    
+    Returns:
+        Dict[str, str]: Key of the first image of its group by key, in the order of `hashes`
+    """
+    keys = list(hashes)
+    if not keys:
+        return {}
+    
+    values = np.array([hashes[key][0] for key in keys], dtype=np.uint64)
+    properties = np.array([hashes[key][1:] for key in keys], dtype=np.int64)
+    
+    same_properties = (properties[:, None, :] == properties[None, :, :]).all(axis=2)
+    identical = same_properties & (hamming_distances(values) <= max_distance)
+    
+    groups = {}
+    grouped = np.zeros(len(keys), dtype=bool)
+    for index, key in enumerate(keys):
+        if grouped[index]:
+            continue
+        members = identical[index] & ~grouped
+        grouped |= members
+        for member in np.flatnonzero(members):
+            groups[keys[member]] = key
+    
+    return groups
+
+def _decode_pixels(image_data: bytes) -> Optional[Tuple[Tuple[int, int], bytes]]:
+    """Decode an image to its pixel size and RGBA pixels at full resolution, None if it cannot be decoded"""
+    try:
+        with Image.open(io.BytesIO(image_data)) as image:
+            return image.size, image.convert("RGBA").tobytes()
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+
+def confirm_identical(groups: Dict[str, str], images: Dict[str, bytes]) -> Dict[str, str]:
+    """Split the groups of group_identical() into images that are really identical
+    
+    Perceptual hashes only show that images look alike. Before one image stands in for
+    another, each member is compared with the first image of its group byte for byte,
+    or else pixel for pixel at full resolution; members that differ form groups of
+    their own, compared the same way.
+    
+    Args:
+        groups: Key of the first image of its group by key, see group_identical()
+        images: Image data by key
+    
+    Returns:
+        Dict[str, str]: Key of the first identical image by key, in the order of `groups`
+    """
+    pixels: Dict[str, Optional[Tuple[Tuple[int, int], bytes]]] = {}
+    
+    def get_pixels(key: str) -> Optional[Tuple[Tuple[int, int], bytes]]:
+        if key not in pixels:
+            pixels[key] = _decode_pixels(images[key])
+        return pixels[key]
+    
+    def is_identical(key: str, other: str) -> bool:
+        if images[key] == images[other]:
+            return True
+        decoded = get_pixels(key)
+        return decoded is not None and decoded == get_pixels(other)
+    
+    confirmed = {}
+    firsts: Dict[str, List[str]] = {}
+    for key, first in groups.items():
+        candidates = firsts.setdefault(first, [])
+        confirmed[key] = next((candidate for candidate in candidates if is_identical(key, candidate)), key)
+        if confirmed[key] == key:
+            candidates.append(key)
+    
+    return confirmed
\ No newline at end of file
@@ -0,0 +1,170 @@
+import io
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from src.utils.compositor import fit_design
+from src.utils.workers import map_in_processes
+from config import PREFLIGHT_MIN_DPI_RATIO, PREFLIGHT_ASPECT_TOLERANCE, PREFLIGHT_MIN_COVERAGE, \
+                   PREFLIGHT_MAX_PARTIAL_ALPHA
+
+def analyze_design(design_image: bytes) -> Dict[str, Any]:
+    """Measure a design once so that it can be checked against many print areas
+    
+    Args:
+        design_image: Design image as bytes
+    
+    Returns:
+        Dict[str, Any]: Width and height in pixels, "has_alpha", "coverage" (share of
+        visible pixels), "partial_alpha" (share of semi-transparent pixels) and
+        "content_box" (left, top, right, bottom of the visible pixels, or None)
+    """
+    design = Image.open(io.BytesIO(design_image))
+    design.load()
+    
+    analysis = {
+        "width": design.width,
+        "height": design.height,
+        "has_alpha": design.mode in ("RGBA", "LA", "PA") or "transparency" in design.info,
+        "coverage": 1.0,
+        "partial_alpha": 0.0,
+        "content_box": (0, 0, design.width, design.height),
+    }
+    
+    if analysis["has_alpha"]:
+        alpha = np.asarray(design.convert("RGBA").getchannel("A"))
+        visible = alpha > 0
+        analysis["coverage"] = float(visible.mean())
+        analysis["partial_alpha"] = float(((alpha > 0) & (alpha < 255)).mean())
+        
+        rows = np.flatnonzero(visible.any(axis=1))
+        columns = np.flatnonzero(visible.any(axis=0))
+        analysis["content_box"] = (
+            (int(columns[0]), int(rows[0]), int(columns[-1]) + 1, int(rows[-1]) + 1) if rows.size else None
+        )
+    
+    return analysis
+
+def get_print_area_pixels(spec: Dict[str, Any]) -> Optional[Tuple[int, int]]:
+    """Get the pixel size a design needs to fill a print area at its DPI
+    
+    Args:
+        spec: Print area spec with "print_area_width" and "print_area_height" in inches and "dpi"
+    
+    Returns:
+        Optional[Tuple[int, int]]: Width and height in pixels, or None if the spec is incomplete
+    """
+    width = spec.get("print_area_width")
+    height = spec.get("print_area_height")
+    dpi = spec.get("dpi")
+    
+    if not width or not height or not dpi:
+        return None
+    return round(width * dpi), round(height * dpi)
+
+def preflight_design(analysis: Dict[str, Any], spec: Dict[str, Any]) -> Dict[str, Any]:
+    """Check a design against the print area spec of a product
+    
+    Checks the effective DPI when the design is fitted into the print area, the aspect
+    ratio, the share of visible and semi-transparent pixels and, for print areas that
+    are not "simple", whether the artwork bleeds to every edge.
+    
+    Args:
+        analysis: Result of analyze_design()
+        spec: Print area spec with "print_area_width", "print_area_height", "dpi" and "print_area_type"
+    
+    Returns:
+        Dict[str, Any]: "passed", "effective_dpi" and "issues", a list of (level, message)
+        tuples where level is "error" or "warning"
+    """
+    issues = []
+    effective_dpi = None
+    
+    if get_print_area_pixels(spec) is None:
+        issues.append(("warning", "The print area size or DPI is unknown, only the artwork itself was checked"))
+    else:
+        area_width = spec["print_area_width"]
+        area_height = spec["print_area_height"]
+        dpi = spec["dpi"]
+        
+        effective_dpi = min(analysis["width"] / area_width, analysis["height"] / area_height)
+        if effective_dpi < dpi * PREFLIGHT_MIN_DPI_RATIO:
+            issues.append(("error", f"Resolution too low: {effective_dpi:.0f} DPI, {dpi} DPI required"))
+        elif effective_dpi < dpi:
+            issues.append(("warning", f"Resolution below target: {effective_dpi:.0f} DPI, {dpi} DPI recommended"))
+        
+        design_ratio = analysis["width"] / analysis["height"]
+        area_ratio = area_width / area_height
+        if abs(design_ratio / area_ratio - 1) > PREFLIGHT_ASPECT_TOLERANCE:
+            issues.append(("warning", f"Aspect ratio {design_ratio:.2f} differs from the print area ({area_ratio:.2f}), "
+                                      "the design will be letterboxed or cropped"))
+    
+    if analysis["coverage"] < PREFLIGHT_MIN_COVERAGE:
+        issues.append(("error", "The design is empty or almost fully transparent"))
+    elif analysis["partial_alpha"] > PREFLIGHT_MAX_PARTIAL_ALPHA:
+        issues.append(("warning", f"{analysis['partial_alpha']:.0%} of the pixels are semi-transparent, "
+                                  "which may print with visible edges"))
+    
+    if spec.get("print_area_type") and spec["print_area_type"] != "simple":
+        content_box = analysis["content_box"]
+        if content_box != (0, 0, analysis["width"], analysis["height"]):
+            issues.append(("warning", "The artwork does not reach every edge, so there is no bleed for this print area"))
+    
+    return {
+        "passed": not any(level == "error" for level, _ in issues),
+        "effective_dpi": effective_dpi,
+        "issues": issues,
+    }
+
+def auto_fit_design(job: Tuple[bytes, int, int, int, str]) -> Optional[bytes]:
+    """Resample a design to the pixel size of a print area
+    
+    Args:
+        job: Tuple of (design_image, width, height, dpi, fit) with the print area size
+            in pixels and the fit mode of fit_design()
+    
+    Returns:
+        Optional[bytes]: Fitted design as PNG with the DPI set, or None for unreadable images
+    """
+    design_image, width, height, dpi, fit = job
+    
+    try:
+        design = Image.open(io.BytesIO(design_image)).convert("RGBA")
+    except (OSError, ValueError):
+        return None
+    
+    fitted, offset_x, offset_y = fit_design(design, width, height, fit)
+    canvas = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+    canvas.paste(fitted, (offset_x, offset_y))
+    
+    buffer = io.BytesIO()
+    canvas.save(buffer, format="PNG", dpi=(dpi, dpi))
+    return buffer.getvalue()
+
+def auto_fit_batch(design_image: bytes, specs: List[Dict[str, Any]], fit: str = "contain") -> List[Optional[bytes]]:
+    """Resample a design for many print areas, in the shared process pool for large batches
+    
+    Print areas of the same pixel size and DPI are resampled once.
+    
+    Args:
+        design_image: Design image as bytes
+        specs: Print area specs, see get_print_area_pixels()
+        fit: Fit mode of fit_design()
+    
+    Returns:
+        List[Optional[bytes]]: Fitted PNG per spec, None where the spec is incomplete or fitting failed
+    """
+    job_keys = []
+    jobs = {}
+    
+    for spec in specs:
+        size = get_print_area_pixels(spec)
+        job_key = (size, spec.get("dpi")) if size else None
+        job_keys.append(job_key)
+        
+        if job_key and job_key not in jobs:
+            jobs[job_key] = (design_image, size[0], size[1], int(spec["dpi"]), fit)
+    
+    results = dict(zip(jobs.keys(), map_in_processes(auto_fit_design, jobs.values())))
+    return [results.get(job_key) for job_key in job_keys]
\ No newline at end of file
@@ -0,0 +1,208 @@
+import gzip
+import base64
+import hashlib
+import os
+from datetime import datetime
+from typing import Dict, Any
+import streamlit as st
+
+from src.api.printful import CACHE_NAMES, PrintfulAPI
+from src.api.models import Model
+from src.api.webhooks import PRODUCT_CACHE_NAMES
+from src.utils.json_codec import loads as json_loads, dumps as json_dumps
+
+SNAPSHOT_FORMAT = "printful-api-fetcher-cache"
+# Version 2 replaced pickle with tagged JSON
+SNAPSHOT_VERSION = 2
+
+# Response models that may appear in a snapshot, by class name
+SNAPSHOT_MODELS = {model.__name__: model for model in Model.__subclasses__()}
+
+# Session state layers written to a snapshot, in addition to the API client caches
+SNAPSHOT_LAYERS = ["store_products"] + CACHE_NAMES + PRODUCT_CACHE_NAMES
+
+# Layers that only make sense for the store the snapshot was taken from
+STORE_LAYERS = ["store_products", "api_cache", "product_variants_cache", "generated_mockups_cache",
+                "cache_timestamps"] + PRODUCT_CACHE_NAMES
+
+def get_key_fingerprint(api_key: str) -> str:
+    """Get a short fingerprint identifying an API key without storing it
+    
+    Args:
+        api_key: Printful API key
+    
+    Returns:
+        str: First 16 hex digits of the SHA-256 hash of the key
+    """
+    return hashlib.sha256(api_key.encode()).hexdigest()[:16]
+
+def encode_tagged(value: Any) -> Any:
+    """Convert cached data to JSON types, tagging the values JSON cannot represent
+    
+    Bytes, tuples, models and dictionaries with keys other than plain strings become
+    objects with a single "__bytes__", "__tuple__", "__model__" or "__items__" member.
+    Used for cache snapshots and export journal checkpoints.
+    
+    Raises:
+        ValueError: If the data holds a value of another type
+    """
+    if isinstance(value, dict):
+        if all(isinstance(key, str) and not key.startswith("__") for key in value):
+            return {key: encode_tagged(item) for key, item in value.items()}
+        return {"__items__": [[encode_tagged(key), encode_tagged(item)] for key, item in value.items()]}
+    if isinstance(value, list):
+        return [encode_tagged(item) for item in value]
+    if isinstance(value, tuple):
+        return {"__tuple__": [encode_tagged(item) for item in value]}
+    if isinstance(value, (bytes, bytearray)):
+        return {"__bytes__": base64.b64encode(value).decode("ascii")}
+    if isinstance(value, Model):
+        return {"__model__": type(value).__name__,
+                "fields": {name: encode_tagged(getattr(value, name)) for name in value.__slots__}}
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    raise ValueError(f"Cannot store {type(value).__name__} as tagged JSON")
+
+def decode_tagged(value: Any) -> Any:
+    """Rebuild cached data converted by encode_tagged()
+    
+    Only the tags written by encode_tagged() and the classes in SNAPSHOT_MODELS are
+    recognized, so loading a snapshot or checkpoint never runs code from it.
+    """
+    if isinstance(value, list):
+        return [decode_tagged(item) for item in value]
+    if not isinstance(value, dict):
+        return value
+    
+    if "__items__" in value:
+        return {decode_tagged(key): decode_tagged(item) for key, item in value["__items__"]}
+    if "__tuple__" in value:
+        return tuple(decode_tagged(item) for item in value["__tuple__"])
+    if "__bytes__" in value:
+        return base64.b64decode(value["__bytes__"])
+    if "__model__" in value:
+        model = SNAPSHOT_MODELS.get(value["__model__"])
+        if model is None:
+            raise ValueError(f"Unknown model in tagged JSON: {value['__model__']}")
+        fields = {name: decode_tagged(item) for name, item in value["fields"].items()}
+        if set(fields) != set(model.__slots__):
+            raise ValueError(f"Tagged JSON has outdated {model.__name__} fields")
+        return model(**fields)
+    return {key: decode_tagged(item) for key, item in value.items()}
+
+def build_cache_snapshot(api_key: str) -> bytes:
+    """Serialize every cache layer of the session into a compressed snapshot
+    
+    Args:
+        api_key: API key of the session, recorded as a fingerprint
+    
+    Returns:
+        bytes: Gzip-compressed JSON snapshot
+    
+    Raises:
+        ValueError: If a cache holds data that cannot be stored
+    """
+    snapshot = {
+        "format": SNAPSHOT_FORMAT,
+        "version": SNAPSHOT_VERSION,
+        "created_at": datetime.now().isoformat(),
+        "key_fingerprint": get_key_fingerprint(api_key),
+        "layers": {name: encode_tagged(st.session_state[name]) for name in SNAPSHOT_LAYERS if name in st.session_state}
+    }
+    return gzip.compress(json_dumps(snapshot, compact=True), compresslevel=6)
+
+def restore_cache_snapshot(data: bytes, api_key: str) -> Dict[str, Any]:
+    """Merge a cache snapshot into the session caches
+    
+    Snapshots are plain JSON and only rebuild known data types, so loading one never
+    runs code from the file. Store-specific layers are skipped when the snapshot was taken with a different
+    API key; catalog data is shared by all stores.
+    
+    Args:
+        data: Gzip-compressed snapshot as created by build_cache_snapshot
+        api_key: API key of the session
+    
+    Returns:
+        Dict[str, Any]: Summary with "entries" loaded, "skipped_layers" and "created_at"
+    
+    Raises:
+        ValueError: If the data is not a snapshot or has an unsupported version
+    """
+    try:
+        snapshot = json_loads(gzip.decompress(data))
+    except (OSError, EOFError, ValueError) as e:
+        raise ValueError(f"Not a cache snapshot: {e}")
+    
+    if not isinstance(snapshot, dict) or snapshot.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError("Not a cache snapshot")
+    if snapshot.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported cache snapshot version: {snapshot.get('version')}")
+    if not isinstance(snapshot.get("layers"), dict):
+        raise ValueError("Not a cache snapshot")
+    
+    try:
+        layers = {name: decode_tagged(layer) for name, layer in snapshot["layers"].items() if name in SNAPSHOT_LAYERS}
+    except (KeyError, TypeError, ValueError, AttributeError) as e:
+        raise ValueError(f"Corrupt cache snapshot: {e}")
+    
+    same_store = snapshot.get("key_fingerprint") == get_key_fingerprint(api_key)
+    entries = 0
+    skipped_layers = []
+    
+    for name, layer in layers.items():
+        if not isinstance(layer, list if name == "store_products" else dict):
+            raise ValueError(f"Corrupt cache snapshot: unexpected {name} layer")
+        if not same_store and name in STORE_LAYERS:
+            skipped_layers.append(name)
+            continue
+        
+        if name == "store_products":
+            if not st.session_state.get("store_products"):
+                st.session_state.store_products = layer
+                entries += len(layer)
+            continue
+        
+        if name == "api_cache" and not same_store:
+            layer = {key: value for key, value in layer.items() if not str(key).startswith("/store")}
+        
+        # Update in place so API clients holding references to the caches see the data
+        if name not in st.session_state:
+            st.session_state[name] = {}
+        with PrintfulAPI.cache_lock:
+            st.session_state[name].update(layer)
+        entries += len(layer)
+    
+    return {"entries": entries, "skipped_layers": skipped_layers, "created_at": snapshot.get("created_at")}
+
+def save_cache_snapshot(path: str, api_key: str) -> str:
+    """Write a cache snapshot of the session to a file
+    
+    Args:
+        path: Snapshot file path
+        api_key: API key of the session
+    
+    Returns:
+        str: Path to the saved file
+    """
+    data = build_cache_snapshot(api_key)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(data)
+    os.replace(temp_path, path)
+    return path
+
+def load_cache_snapshot(path: str, api_key: str) -> Dict[str, Any]:
+    """Load a cache snapshot file into the session caches
+    
+    Args:
+        path: Snapshot file path
+        api_key: API key of the session
+    
+    Returns:
+        Dict[str, Any]: Summary as returned by restore_cache_snapshot
+    
+    Raises:
+        ValueError: If the file is not a supported snapshot
+    """
+    with open(path, "rb") as f:
+        return restore_cache_snapshot(f.read(), api_key)
\ No newline at end of file
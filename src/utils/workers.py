@@ -0,0 +1,65 @@
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Iterable, List, Optional
+
+from config import PROCESS_POOL_MAX_WORKERS, PROCESS_POOL_MIN_JOBS
+
+# Process pool shared by all sessions, created on first use
+_process_pool: Optional[ProcessPoolExecutor] = None
+_process_pool_lock = threading.Lock()
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Get the process-wide pool for CPU-bound image work
+    
+    Workers are spawned rather than forked, since the Streamlit server process runs
+    many threads.
+    
+    Returns:
+        ProcessPoolExecutor: Shared process pool
+    """
+    global _process_pool
+    
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(
+                max_workers=PROCESS_POOL_MAX_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _process_pool
+
+def _reset_process_pool() -> None:
+    """Drop a broken process pool so that the next call creates a new one"""
+    global _process_pool
+    
+    with _process_pool_lock:
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+
+def map_in_processes(function: Callable, items: Iterable, min_jobs: int = PROCESS_POOL_MIN_JOBS) -> List[Any]:
+    """Apply a function to every item, in the shared process pool for large batches
+    
+    Small batches, single-worker setups and broken pools run in the calling thread.
+    The function and items must be picklable, i.e. module-level functions and plain data.
+    
+    Args:
+        function: Module-level function taking one item
+        items: Items to process
+        min_jobs: Smallest batch that is sent to the process pool
+    
+    Returns:
+        List[Any]: Results in the order of the items
+    """
+    items = list(items)
+    
+    if len(items) < max(min_jobs, 2) or PROCESS_POOL_MAX_WORKERS <= 1:
+        return [function(item) for item in items]
+    
+    chunksize = max(1, len(items) // (PROCESS_POOL_MAX_WORKERS * 4))
+    try:
+        return list(get_process_pool().map(function, items, chunksize=chunksize))
+    except BrokenProcessPool:
+        _reset_process_pool()
+        return [function(item) for item in items]
\ No newline at end of file
@@ -0,0 +1,166 @@
+import io
+import os
+import time
+import zlib
+import struct
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Set, Tuple
+
+from config import EXPORT_COMPRESS_WORKERS, EXPORT_COMPRESSION_LEVEL, EXPORT_STORED_EXTENSIONS
+
+class ParallelZipWriter:
+    """In-memory ZIP writer that compresses entries in parallel
+    
+    Entries are collected first and compressed together on close. Already compressed
+    media (see EXPORT_STORED_EXTENSIONS) is stored as is, every other entry is
+    deflated on a thread pool; zlib releases the GIL, so this uses several cores.
+    Entries that do not get smaller when deflated are stored too.
+    
+    Entries of other archives built by this writer, e.g. the partial archives of
+    export shards, can be merged in without being compressed again; entries whose
+    name is already in the archive are skipped, since merged archives name their
+    images by content.
+    
+    The time spent per stage is recorded in `timings` (seconds per stage name).
+    """
+    
+    def __init__(self, max_workers: int = EXPORT_COMPRESS_WORKERS, level: int = EXPORT_COMPRESSION_LEVEL):
+        """Initialize the writer
+        
+        Args:
+            max_workers: Number of compression threads
+            level: zlib compression level of deflated entries
+        """
+        self.max_workers = max(1, max_workers)
+        self.level = level
+        self.entries: List[Tuple[str, bytes]] = []
+        self.precompressed: Dict[int, Tuple[int, int, int, bytes]] = {}
+        self.names: Set[str] = set()
+        self.timings: Dict[str, float] = {}
+    
+    def add_timing(self, stage: str, seconds: float) -> None:
+        """Add time spent in a stage, e.g. serializing data before it is added
+        
+        Args:
+            stage: Stage name
+            seconds: Time in seconds
+        """
+        self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+    
+    def writestr(self, name: str, data: bytes) -> None:
+        """Add an entry
+        
+        Args:
+            name: Name of the entry in the archive
+            data: Entry content
+        """
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self.entries.append((name, data))
+        self.names.add(name)
+    
+    def write(self, path: str, arcname: str) -> None:
+        """Add a file from disk
+        
+        Args:
+            path: Path of the file
+            arcname: Name of the entry in the archive
+        """
+        started = time.perf_counter()
+        with open(path, "rb") as file:
+            self.writestr(arcname, file.read())
+        self.add_timing("read", time.perf_counter() - started)
+    
+    def has_entry(self, name: str) -> bool:
+        """Check whether an entry was added
+        
+        Args:
+            name: Name of the entry in the archive
+        
+        Returns:
+            bool: True if an entry of that name was added or merged
+        """
+        return name in self.names
+    
+    def merge_archive(self, archive_data: bytes) -> None:
+        """Add all entries of another archive as they are, without recompressing them
+        
+        Args:
+            archive_data: ZIP file, e.g. the partial archive of an export shard
+        """
+        started = time.perf_counter()
+        with zipfile.ZipFile(io.BytesIO(archive_data)) as archive:
+            for zinfo in archive.infolist():
+                if zinfo.filename in self.names:
+                    continue
+                
+                # The payload follows the local file header, its name and its extra field
+                name_length, extra_length = struct.unpack_from("<HH", archive_data, zinfo.header_offset + 26)
+                start = zinfo.header_offset + zipfile.sizeFileHeader + name_length + extra_length
+                payload = archive_data[start:start + zinfo.compress_size]
+                
+                self.precompressed[len(self.entries)] = (zinfo.compress_type, zinfo.CRC, zinfo.file_size, payload)
+                self.entries.append((zinfo.filename, b""))
+                self.names.add(zinfo.filename)
+        self.add_timing("merge", time.perf_counter() - started)
+    
+    def _compress(self, name: str, data: bytes) -> Tuple[int, int, int, bytes]:
+        """Compress one entry
+        
+        Returns:
+            Tuple[int, int, int, bytes]: Tuple of (compress_type, crc, file_size, payload)
+        """
+        crc = zlib.crc32(data)
+        
+        if os.path.splitext(name)[1].lower() in EXPORT_STORED_EXTENSIONS:
+            return zipfile.ZIP_STORED, crc, len(data), data
+        
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, -zlib.MAX_WBITS)
+        compressed = compressor.compress(data) + compressor.flush()
+        
+        if len(compressed) >= len(data):
+            return zipfile.ZIP_STORED, crc, len(data), data
+        return zipfile.ZIP_DEFLATED, crc, len(data), compressed
+    
+    def close(self) -> bytes:
+        """Compress all entries and assemble the archive
+        
+        Returns:
+            bytes: ZIP file
+        """
+        started = time.perf_counter()
+        pending = [index for index in range(len(self.entries)) if index not in self.precompressed]
+        if self.max_workers > 1 and len(pending) > 1:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                results = list(executor.map(lambda index: self._compress(*self.entries[index]), pending))
+        else:
+            results = [self._compress(*self.entries[index]) for index in pending]
+        compressed = dict(self.precompressed)
+        compressed.update(zip(pending, results))
+        self.add_timing("compress", time.perf_counter() - started)
+        
+        started = time.perf_counter()
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w") as zip_file:
+            date_time = time.localtime()[:6]
+            
+            for index, (name, _) in enumerate(self.entries):
+                compress_type, crc, file_size, payload = compressed[index]
+                # Write the precompressed entry the way ZipFile.writestr would
+                zinfo = zipfile.ZipInfo(name, date_time=date_time)
+                zinfo.compress_type = compress_type
+                zinfo.external_attr = 0o600 << 16
+                zinfo.CRC = crc
+                zinfo.file_size = file_size
+                zinfo.compress_size = len(payload)
+                zinfo.header_offset = zip_file.fp.tell()
+                
+                zip_file.fp.write(zinfo.FileHeader())
+                zip_file.fp.write(payload)
+                zip_file.filelist.append(zinfo)
+                zip_file.NameToInfo[name] = zinfo
+                zip_file.start_dir = zip_file.fp.tell()
+        self.add_timing("write", time.perf_counter() - started)
+        
+        return buffer.getvalue()
\ No newline at end of file
@@ -0,0 +1,129 @@
+import threading
+
+import pytest
+import requests
+
+from src.api import printful
+from src.api.circuit_breaker import CircuitBreaker, CIRCUIT_CLOSED, CIRCUIT_OPEN, CIRCUIT_HALF_OPEN
+from src.api.printful import PrintfulAPI
+
+def open_breaker(breaker: CircuitBreaker) -> None:
+    for _ in range(breaker.failure_threshold):
+        breaker.allow_request()
+        breaker.record_failure()
+
+def test_opens_after_consecutive_failures():
+    breaker = CircuitBreaker("api.test", failure_threshold=3, reset_timeout=60)
+    
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == CIRCUIT_CLOSED
+    
+    breaker.record_failure()
+    assert breaker.state == CIRCUIT_OPEN
+    assert not breaker.allow_request()
+
+def test_success_resets_failure_count():
+    breaker = CircuitBreaker("api.test", failure_threshold=2, reset_timeout=60)
+    
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    
+    assert breaker.state == CIRCUIT_CLOSED
+
+def test_half_open_lets_one_probe_through():
+    breaker = CircuitBreaker("api.test", failure_threshold=1, reset_timeout=0)
+    open_breaker(breaker)
+    
+    assert breaker.allow_request()
+    assert breaker.state == CIRCUIT_HALF_OPEN
+    assert not breaker.allow_request()
+
+def test_probe_success_closes_and_failure_reopens():
+    breaker = CircuitBreaker("api.test", failure_threshold=1, reset_timeout=0)
+    open_breaker(breaker)
+    
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == CIRCUIT_OPEN
+    
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == CIRCUIT_CLOSED
+    assert breaker.allow_request() and breaker.allow_request()
+
+def test_released_probe_lets_the_next_request_probe():
+    breaker = CircuitBreaker("api.test", failure_threshold=1, reset_timeout=0)
+    open_breaker(breaker)
+    
+    assert breaker.allow_request()
+    breaker.release_probe()
+    
+    assert breaker.state == CIRCUIT_HALF_OPEN
+    assert breaker.allow_request()
+
+def test_release_probe_only_releases_the_probing_thread():
+    breaker = CircuitBreaker("api.test", failure_threshold=1, reset_timeout=0)
+    open_breaker(breaker)
+    assert breaker.allow_request()
+    
+    other = threading.Thread(target=breaker.release_probe)
+    other.start()
+    other.join()
+    
+    assert not breaker.allow_request()
+
+class FakeResponse:
+    def __init__(self, status_code: int, content: bytes = b"{}"):
+        self.status_code = status_code
+        self.content = content
+        self.text = content.decode()
+
+@pytest.fixture
+def api(monkeypatch):
+    breaker = CircuitBreaker("api.test", failure_threshold=1, reset_timeout=0)
+    monkeypatch.setattr(printful, "get_circuit_breaker", lambda url: breaker)
+    client = PrintfulAPI("key", "https://api.test", caches={})
+    monkeypatch.setattr(client.rate_limiter, "acquire", lambda priority=0: None)
+    monkeypatch.setattr(client.rate_limiter, "penalize", lambda seconds: None)
+    client.breaker = breaker
+    return client
+
+def test_interrupted_probe_does_not_block_the_host(api, monkeypatch):
+    open_breaker(api.breaker)
+    
+    class Rerun(BaseException):
+        pass
+    
+    def interrupted(*args, **kwargs):
+        raise Rerun()
+    
+    monkeypatch.setattr(requests, "get", interrupted)
+    with pytest.raises(Rerun):
+        api.make_request("/store/products")
+    
+    monkeypatch.setattr(requests, "get", lambda *args, **kwargs: FakeResponse(200, b'{"result": []}'))
+    assert api.make_request("/store/products") == {"result": []}
+    assert api.breaker.state == CIRCUIT_CLOSED
+
+def test_unexpected_error_releases_the_probe(api, monkeypatch):
+    open_breaker(api.breaker)
+    monkeypatch.setattr(requests, "get", lambda *args, **kwargs: FakeResponse(200, b"not json"))
+    
+    assert api.make_request("/store/products") is None
+    assert api.breaker.allow_request()
+
+def test_rate_limited_requests_are_retried_a_bounded_number_of_times(api, monkeypatch):
+    calls = []
+    monkeypatch.setattr(requests, "get", lambda *args, **kwargs: calls.append(kwargs) or FakeResponse(429))
+    
+    assert api.make_request("/store/products", force_refresh=True) is None
+    assert len(calls) == printful.RATE_LIMIT_MAX_RETRIES + 1
+
+def test_rate_limit_retry_keeps_force_refresh(api, monkeypatch):
+    api.set_cached("api_cache", "/store/products_None", {"result": ["cached"]})
+    responses = iter([FakeResponse(429), FakeResponse(200, b'{"result": ["fresh"]}')])
+    monkeypatch.setattr(requests, "get", lambda *args, **kwargs: next(responses))
+    
+    assert api.make_request("/store/products", force_refresh=True) == {"result": ["fresh"]}
\ No newline at end of file
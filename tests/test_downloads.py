@@ -0,0 +1,39 @@
+import gc
+
+from src.utils.downloads import DownloadRegistry
+
+def test_shown_payloads_are_not_evicted():
+    registry = DownloadRegistry(max_bytes=10)
+    
+    first = registry.register(b"a" * 8)
+    second = registry.register(b"b" * 8)
+    
+    assert first.read() == b"a" * 8
+    assert second.read() == b"b" * 8
+
+def test_released_payloads_are_evicted_least_recently_used_first():
+    registry = DownloadRegistry(max_bytes=10)
+    
+    first = registry.register(b"a" * 8)
+    first_token = first.token
+    del first
+    gc.collect()
+    
+    second = registry.register(b"b" * 8)
+    
+    assert first_token not in registry.payloads
+    assert second.read() == b"b" * 8
+    assert registry.size == 8
+
+def test_pins_are_counted_per_handle():
+    registry = DownloadRegistry(max_bytes=10)
+    
+    first = registry.register(b"a" * 8)
+    again = registry.register(b"a" * 8)
+    assert first.token == again.token
+    
+    del first
+    gc.collect()
+    registry.register(b"b" * 8)
+    
+    assert again.read() == b"a" * 8
\ No newline at end of file
@@ -0,0 +1,94 @@
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+from src.ui import jobs as jobs_ui
+from src.utils.jobs import JobRunner, JOB_DONE, JOB_FAILED, JOB_CANCELLED
+from src.utils.journal import ExportJournal
+
+def wait_for(job, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not job.is_finished() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert job.is_finished()
+    return job
+
+def test_job_reports_progress_and_result():
+    runner = JobRunner(max_workers=1)
+    
+    job = wait_for(runner.submit("test", "owner", [1, 2, 3], lambda item: ([item * 10], "odd" if item % 2 else ""),
+                                 lambda job: sum(job.records)))
+    
+    assert job.status == JOB_DONE
+    assert (job.done, job.total) == (3, 3)
+    assert job.records == [10, 20, 30]
+    assert job.messages == ["odd", "odd"]
+    assert job.result == 60
+    assert job.eta == 0.0
+    assert runner.list_jobs("owner") == [job] and runner.list_jobs("other") == []
+
+def test_cancelled_job_stops_after_the_current_item():
+    runner = JobRunner(max_workers=1)
+    started = threading.Event()
+    release = threading.Event()
+    finished = []
+    
+    def work(item):
+        started.set()
+        release.wait(5)
+        return [item], ""
+    
+    job = runner.submit("test", "owner", [1, 2, 3], work, finished.append)
+    assert started.wait(5)
+    job.cancel()
+    release.set()
+    wait_for(job)
+    
+    assert job.status == JOB_CANCELLED
+    assert job.done == 1 and job.records == [1]
+    assert finished == []
+
+def test_failing_item_fails_the_job():
+    runner = JobRunner(max_workers=1)
+    
+    def work(item):
+        if item == 2:
+            raise RuntimeError("API down")
+        return [item], ""
+    
+    job = wait_for(runner.submit("test", "owner", [1, 2, 3], work))
+    
+    assert job.status == JOB_FAILED
+    assert job.error == "API down"
+    assert job.done == 1
+
+def test_export_resumes_from_its_checkpoints(monkeypatch, tmp_path):
+    runner = JobRunner(max_workers=1)
+    monkeypatch.setattr(jobs_ui, "get_job_runner", lambda: runner)
+    monkeypatch.setattr(jobs_ui, "remove_expired_journals", lambda: 0)
+    monkeypatch.setattr(jobs_ui, "ExportJournal", lambda journal_id: ExportJournal(journal_id, str(tmp_path)))
+    monkeypatch.setattr(jobs_ui, "create_zip_file", lambda records, **kwargs: (b"zip", "templates.zip"))
+    api = SimpleNamespace(api_key="key", priority=0)
+    products = [{"id": 1}, {"id": 2}]
+    collected = []
+    
+    def failing_collect(job_api, product):
+        collected.append(product["id"])
+        if product["id"] == 2:
+            raise RuntimeError("API down")
+        return [{"product_id": product["id"], "template_image": b"png"}], ""
+    
+    def collect(job_api, product):
+        collected.append(product["id"])
+        return [{"product_id": product["id"], "template_image": b"png"}], ""
+    
+    first = wait_for(jobs_ui.submit_export_job(api, "Printing Templates", products, {}, failing_collect, "json", False))
+    second = wait_for(jobs_ui.submit_export_job(api, "Printing Templates", products, {}, collect, "json", False))
+    
+    assert first.status == JOB_FAILED
+    assert second.status == JOB_DONE
+    assert collected == [1, 2, 2]
+    assert second.result["record_count"] == 2
+    assert second.result["resumed_count"] == 1
+    assert os.listdir(tmp_path) == []
\ No newline at end of file
@@ -0,0 +1,46 @@
+import os
+
+from src.utils.journal import ExportJournal, get_journal_id
+
+def make_journal(tmp_path):
+    return ExportJournal(get_journal_id("owner", "Mockups", [[1, None]]), str(tmp_path))
+
+def test_checkpoints_round_trip_as_json(tmp_path):
+    journal = make_journal(tmp_path)
+    records = [{"product_id": 1, "template_image": b"\x89PNG\x00", "sizes": ("S", "M"), "variants": {4012: True}}]
+    
+    journal.put(1, records, "done")
+    
+    assert journal.get(1) == (records, "done")
+    assert journal.completed() == ["1"]
+    with open(journal._item_path(1), "rb") as file:
+        assert file.read(1) == b"{"
+
+def test_missing_checkpoint_is_none(tmp_path):
+    assert make_journal(tmp_path).get(1) is None
+
+def test_unreadable_checkpoints_are_deleted(tmp_path):
+    journal = make_journal(tmp_path)
+    journal.put(1, [{"a": 1}], "")
+    journal.put(2, [{"a": 2}], "")
+    journal.put(3, [{"a": 3}], "")
+    
+    with open(journal._item_path(1), "r+b") as file:
+        file.truncate(10)
+    with open(journal._item_path(2), "wb") as file:
+        file.write(b'{"version": 1, "records": [], "message": ""}')
+    with open(journal._item_path(3), "wb") as file:
+        file.write(b'{"version": 2, "records": {"__model__": "Unknown", "fields": {}}, "message": ""}')
+    
+    for item_id in (1, 2, 3):
+        assert journal.get(item_id) is None
+        assert not os.path.exists(journal._item_path(item_id))
+    assert journal.completed() == []
+
+def test_remove_deletes_the_journal(tmp_path):
+    journal = make_journal(tmp_path)
+    journal.put(1, [], "")
+    
+    journal.remove()
+    
+    assert not os.path.exists(journal.path)
\ No newline at end of file
@@ -0,0 +1,33 @@
+import json
+
+import pytest
+
+from src.utils import json_codec
+
+RECORDS = [
+    {
+        "product_id": 1,
+        "name": "Ünïcödé T-Shirt — 日本",
+        "placement": "front",
+        "variant_in_stock": True,
+        "print_area_width": 12.5,
+        "techniques": ["dtg", "embroidery"],
+        "template_image": None,
+    }
+]
+
+@pytest.fixture(params=["json", json_codec.JSON_BACKEND])
+def backend(request, monkeypatch):
+    monkeypatch.setattr(json_codec, "JSON_BACKEND", request.param)
+    return request.param
+
+def test_dumps_matches_stdlib_export_bytes(backend):
+    expected = json.dumps(RECORDS, indent=2, ensure_ascii=False).encode("utf-8")
+    assert json_codec.dumps(RECORDS) == expected
+
+def test_dumps_compact_matches_stdlib(backend):
+    expected = json.dumps(RECORDS, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    assert json_codec.dumps(RECORDS, compact=True) == expected
+
+def test_loads_round_trip(backend):
+    assert json_codec.loads(json_codec.dumps(RECORDS)) == RECORDS
\ No newline at end of file
@@ -0,0 +1,38 @@
+import pytest
+
+from src.utils.json_codec import dumps as json_dumps
+from src.utils.manifest import build_manifest, diff_manifest, get_record_key, load_manifest
+
+def test_diff_lists_changed_new_and_deleted_entries():
+    previous = build_manifest({"1/front/10": "a", "1/front/11": "b", "2/front/20": "c"},
+                              {"images/x.png": "x", "images/y.png": "y"})
+    current = build_manifest({"1/front/10": "a", "1/front/11": "changed", "3/front/30": "d"},
+                             {"images/x.png": "x", "images/z.png": "z"}, previous)
+    
+    records, images, deleted = diff_manifest(current, previous)
+    
+    assert records == {"1/front/11", "3/front/30"}
+    assert images == {"images/z.png"}
+    assert deleted == {"base": previous["created_at"], "records": ["2/front/20"], "images": ["images/y.png"]}
+    assert current["base"] == previous["created_at"]
+
+def test_diff_of_an_unchanged_export_is_empty():
+    manifest = build_manifest({"1/front/10": "a"}, {"images/x.png": "x"})
+    
+    records, images, deleted = diff_manifest(manifest, manifest)
+    
+    assert records == set() and images == set()
+    assert deleted["records"] == [] and deleted["images"] == []
+
+def test_record_key_includes_the_store_and_skips_missing_parts():
+    assert get_record_key({"product_id": 1, "placement": "front", "variant_id": 10}) == "1/front/10"
+    assert get_record_key({"store": "Shop", "product_id": 1, "placement": "", "variant_id": None}) == "Shop/1"
+
+def test_load_manifest_round_trips_and_rejects_other_files():
+    manifest = build_manifest({"1/front/10": "a"}, {"images/x.png": "x"})
+    
+    assert load_manifest(json_dumps(manifest)) == manifest
+    with pytest.raises(ValueError):
+        load_manifest(b"not json")
+    with pytest.raises(ValueError):
+        load_manifest(json_dumps({"version": 1, "records": []}))
\ No newline at end of file
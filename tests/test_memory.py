@@ -0,0 +1,73 @@
+from src.api.printful import PrintfulAPI
+from src.utils import memory
+from src.utils.memory import MemoryLedger, measure_caches, evict_entries
+
+def test_unchanged_entries_are_not_measured_again(monkeypatch):
+    caches = {"api_cache": {"a": b"x" * 1000, "b": b"y" * 1000}}
+    sizes, entry_sizes = measure_caches(caches)
+    
+    measured = []
+    original = memory.deep_sizeof
+    monkeypatch.setattr(memory, "deep_sizeof", lambda obj, seen=None: measured.append(obj) or original(obj, seen))
+    
+    caches["api_cache"]["c"] = b"z" * 500
+    new_sizes, _ = measure_caches(caches, entry_sizes)
+    
+    assert measured == ["c", b"z" * 500]
+    assert new_sizes["api_cache"] > sizes["api_cache"] + 500
+
+def test_namespace_caches_are_measured_per_namespace():
+    caches = {"multi_store_caches": {"store": {"api_cache": {}}}}
+    sizes, entry_sizes = measure_caches(caches)
+    
+    caches["multi_store_caches"]["store"]["api_cache"]["a"] = b"x" * 1000
+    new_sizes, _ = measure_caches(caches, entry_sizes)
+    
+    assert new_sizes["multi_store_caches"] >= sizes["multi_store_caches"] + 1000
+
+def test_values_changed_in_place_are_measured_again(monkeypatch):
+    record = {"variant_id": 1, "variants": [{"catalog_variant_id": 1, "in_stock": True}]}
+    caches = {"template_records_cache": {"1_71_front": [record]}}
+    sizes, entry_sizes = measure_caches(caches)
+    
+    record["variants"].append({"catalog_variant_id": 2, "note": "x" * 10_000})
+    monkeypatch.setattr(PrintfulAPI, "cache_generation", PrintfulAPI.cache_generation + 1)
+    new_sizes, _ = measure_caches(caches, entry_sizes)
+    
+    assert new_sizes["template_records_cache"] >= sizes["template_records_cache"] + 10_000
+
+def test_values_stored_again_are_measured_again():
+    value = {"result": []}
+    caches = {"api_cache": {"a": value}, "cache_timestamps": {"api_cache/a": 1.0}}
+    sizes, entry_sizes = measure_caches(caches)
+    
+    value["result"].append("x" * 10_000)
+    caches["cache_timestamps"]["api_cache/a"] = 2.0
+    new_sizes, _ = measure_caches(caches, entry_sizes)
+    
+    assert new_sizes["api_cache"] >= sizes["api_cache"] + 10_000
+
+def test_evict_entries_drops_oldest_first():
+    caches = {"api_cache": {"old": b"x" * 1000, "new": b"y" * 1000}, "cache_timestamps": {"api_cache/old": 1.0}}
+    sizes, _ = measure_caches(caches)
+    
+    evicted = evict_entries(caches, sizes, sum(sizes.values()) - 500)
+    
+    assert evicted == 1
+    assert list(caches["api_cache"]) == ["new"]
+    assert caches["cache_timestamps"] == {}
+
+def test_global_cap_only_evicts_the_reporting_session(monkeypatch):
+    monkeypatch.setattr(memory, "clear_image_cache", lambda: None)
+    monkeypatch.setattr(memory, "get_image_cache_size", lambda: 0)
+    ledger = MemoryLedger(session_max_bytes=0, global_max_bytes=10_000_000)
+    
+    other = {"api_cache": {str(index): b"x" * 100_000 for index in range(60)}}
+    ledger.account("other", other)
+    
+    ledger.global_max_bytes = 8_000_000
+    current = {"api_cache": {str(index): b"y" * 100_000 for index in range(60)}}
+    ledger.account("current", current)
+    
+    assert len(other["api_cache"]) == 60
+    assert len(current["api_cache"]) < 60
\ No newline at end of file
@@ -0,0 +1,36 @@
+import pytest
+
+from src.api.models import Model, MockupStyle, SyncProduct, decode_response
+
+def test_model_is_abstract():
+    with pytest.raises(TypeError):
+        Model()
+
+def test_get_matches_dict_get():
+    raw = {"id": 7, "category_name": None, "view_name": "Front"}
+    style = MockupStyle.from_dict(raw)
+    
+    assert style.get("category_name", "Unknown") == raw.get("category_name", "Unknown")
+    assert style.get("view_name", "Unknown") == raw.get("view_name", "Unknown")
+    assert style.get("not_a_field", "Unknown") == "Unknown"
+    assert style.get("not_a_field") is None
+
+def test_item_access():
+    style = MockupStyle.from_dict({"id": 7})
+    
+    assert style["id"] == 7
+    assert "id" in style
+    with pytest.raises(KeyError):
+        style["not_a_field"]
+
+def test_decode_response_nested_models():
+    content = b'{"code": 200, "result": {"sync_product": {"id": 1, "name": "Shirt"}, ' \
+              b'"sync_variants": [{"id": 2, "product": {"product_id": 71, "variant_id": 4012}}]}}'
+    
+    response = decode_response(content, SyncProduct)
+    
+    assert set(response) == {"result"}
+    product = response["result"]
+    assert product.name == "Shirt"
+    assert product.sync_variants[0].catalog_variant_id == 4012
+    assert product.to_dict()["sync_variants"] == [{"id": 2, "catalog_product_id": 71, "catalog_variant_id": 4012}]
\ No newline at end of file
@@ -0,0 +1,57 @@
+import io
+
+import numpy as np
+from PIL import Image
+
+from src.utils.perceptual import hamming_distances, group_identical, confirm_identical
+
+def png(color, size=(64, 64), changed_pixel=None, compress_level=6):
+    image = Image.new("RGBA", size, color)
+    if changed_pixel:
+        image.putpixel(changed_pixel, (0, 0, 0, 255))
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG", compress_level=compress_level)
+    return buffer.getvalue()
+
+def test_hamming_distances_match_a_bit_count():
+    rng = np.random.default_rng(0)
+    hashes = np.concatenate([
+        rng.integers(0, 2 ** 64, size=30, dtype=np.uint64),
+        np.array([0, 2 ** 64 - 1, 1, 2 ** 63], dtype=np.uint64),
+    ])
+    
+    distances = hamming_distances(hashes)
+    
+    expected = [[bin(int(a) ^ int(b)).count("1") for b in hashes] for a in hashes]
+    assert distances.tolist() == expected
+
+def test_group_identical_needs_close_hashes_and_equal_properties():
+    hashes = {
+        "a": (0b1111, 100, 100, 0xFFF),
+        "b": (0b0111, 100, 100, 0xFFF),
+        "c": (0b1111, 200, 200, 0xFFF),
+        "d": (0b1111, 100, 100, 0x000),
+        "e": (0b1111 ^ (0xFF << 8), 100, 100, 0xFFF),
+    }
+    
+    groups = group_identical(hashes, max_distance=1)
+    
+    assert groups == {"a": "a", "b": "a", "c": "c", "d": "d", "e": "e"}
+
+def test_confirm_identical_keeps_only_equal_pixels_together():
+    images = {
+        "a": png("white"),
+        "b": png("white", compress_level=1),
+        "c": png("white", changed_pixel=(3, 3)),
+        "d": png("white", changed_pixel=(3, 3), compress_level=1),
+    }
+    assert images["a"] != images["b"]
+    
+    confirmed = confirm_identical(dict.fromkeys(images, "a"), images)
+    
+    assert confirmed == {"a": "a", "b": "a", "c": "c", "d": "c"}
+
+def test_confirm_identical_never_merges_undecodable_images():
+    images = {"a": b"not an image", "b": b"not an image either"}
+    
+    assert confirm_identical({"a": "a", "b": "a"}, images) == {"a": "a", "b": "b"}
\ No newline at end of file
@@ -0,0 +1,59 @@
+import threading
+import time
+
+from src.api.rate_limit import (RateLimiter, PRIORITY_INTERACTIVE, PRIORITY_EXPORT, PRIORITY_PREFETCH,
+                                PRIORITY_RESERVES)
+
+def make_limiter(burst=10):
+    # One token per hour, so nothing refills while a test runs
+    return RateLimiter(requests_per_period=1, period=3600, burst=burst)
+
+def drain(limiter, priority):
+    taken = 0
+    while limiter.try_acquire(priority):
+        taken += 1
+    return taken
+
+def test_each_class_leaves_its_reserve_to_the_classes_above():
+    limiter = make_limiter()
+    
+    prefetch = drain(limiter, PRIORITY_PREFETCH)
+    export = drain(limiter, PRIORITY_EXPORT)
+    interactive = drain(limiter, PRIORITY_INTERACTIVE)
+    
+    assert prefetch == 10 - PRIORITY_RESERVES[PRIORITY_PREFETCH]
+    assert export == PRIORITY_RESERVES[PRIORITY_PREFETCH] - PRIORITY_RESERVES[PRIORITY_EXPORT]
+    assert interactive == PRIORITY_RESERVES[PRIORITY_EXPORT]
+    assert limiter.granted == {PRIORITY_INTERACTIVE: interactive, PRIORITY_EXPORT: export, PRIORITY_PREFETCH: prefetch}
+
+def test_reserved_tokens_are_not_taken_by_lower_classes():
+    limiter = make_limiter()
+    drain(limiter, PRIORITY_EXPORT)
+    
+    assert not limiter.try_acquire(PRIORITY_PREFETCH)
+    assert limiter.try_acquire(PRIORITY_INTERACTIVE)
+
+def test_waiting_higher_class_holds_back_lower_classes():
+    limiter = make_limiter()
+    drain(limiter, PRIORITY_INTERACTIVE)
+    
+    waiter = threading.Thread(target=limiter.acquire, args=(PRIORITY_INTERACTIVE,), daemon=True)
+    waiter.start()
+    deadline = time.monotonic() + 5
+    while not limiter.waiting[PRIORITY_INTERACTIVE] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert limiter.waiting[PRIORITY_INTERACTIVE] == 1
+    
+    with limiter.condition:
+        limiter.tokens = float(limiter.capacity)
+    
+    # The bucket is full, but the waiting interactive request comes first
+    assert not limiter.try_acquire(PRIORITY_EXPORT)
+    
+    with limiter.condition:
+        limiter.condition.notify_all()
+    waiter.join(5)
+    
+    assert not waiter.is_alive()
+    assert limiter.granted[PRIORITY_INTERACTIVE] == 11
+    assert limiter.try_acquire(PRIORITY_EXPORT)
\ No newline at end of file
@@ -0,0 +1,29 @@
+from types import SimpleNamespace
+
+from src.ui.mockup import get_mockup_records_key
+from src.ui.template import get_records_key
+
+VARIANTS = [{"catalog_variant_id": 4012, "size": "M", "color_code": "#000000", "in_stock": True},
+            {"catalog_variant_id": 4013, "size": "L", "color_code": "#000000", "in_stock": True}]
+
+def with_stock(in_stock):
+    return [dict(variant, in_stock=in_stock) for variant in VARIANTS]
+
+def test_template_key_changes_with_stock_and_index():
+    key = get_records_key(10, 71, "front", "Template 1", VARIANTS, 100.0)
+    
+    assert key.startswith("10_")
+    assert key == get_records_key(10, 71, "front", "Template 1", list(reversed(VARIANTS)), 100.0)
+    assert key != get_records_key(10, 71, "front", "Template 1", with_stock(False), 100.0)
+    assert key != get_records_key(10, 71, "front", "Template 1", VARIANTS, 200.0)
+
+def test_mockup_key_changes_with_stock_and_cached_inputs():
+    api = SimpleNamespace(cache_timestamps={"mockup_styles_cache/mockup_styles_71": 100.0})
+    key = get_mockup_records_key(api, 10, 71, 5, VARIANTS)
+    
+    assert key.startswith("10_71_5_")
+    assert key != get_mockup_records_key(api, 10, 71, 5, with_stock(False))
+    assert key != get_mockup_records_key(api, 10, 71, 5, VARIANTS[:1])
+    
+    api.cache_timestamps["mockup_images_cache/mockup_images_71_5"] = 150.0
+    assert key != get_mockup_records_key(api, 10, 71, 5, VARIANTS)
\ No newline at end of file
@@ -0,0 +1,99 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from src.api import printful
+from src.api.models import VariantAvailability
+from src.api.printful import PrintfulAPI
+from config import CACHE_TTL
+
+def make_api(monkeypatch, stock, session_state=None):
+    """Build a client whose availability requests answer from `stock`, by catalog variant ID"""
+    def make_request(self, endpoint, force_refresh=False, model=None):
+        variant_id = int(endpoint.split("/")[3])
+        return {"data": VariantAvailability(variant_id, stock[variant_id])} if variant_id in stock else None
+    
+    monkeypatch.setattr(PrintfulAPI, "make_request", make_request)
+    api = PrintfulAPI("test-key", "https://api.example.com", caches={})
+    if session_state is not None:
+        monkeypatch.setattr(printful, "st", SimpleNamespace(session_state=session_state))
+        api.session_bound = True
+    return api
+
+def test_refresh_skips_the_grouped_template_selections(monkeypatch):
+    template_record = {"variant_id": 1, "variant_in_stock": True}
+    mockup_record = {"variants": [{"catalog_variant_id": 1, "in_stock": True}]}
+    selection = ({"templates": [], "per_variant": False}, {})
+    session_state = {
+        "template_records_cache": {"10_70_front_Template 1_abc": [template_record]},
+        "mockup_records_cache": {"10_70_1": mockup_record},
+        "template_selection_cache": {"10_70_front_None_abc": selection},
+    }
+    api = make_api(monkeypatch, {1: False}, session_state)
+    api.product_variants_cache[10] = ([{"catalog_variant_id": 1, "in_stock": True}], "", "")
+    
+    assert api.refresh_stock() == 1
+    
+    assert template_record["variant_in_stock"] is False
+    assert mockup_record["variants"][0]["in_stock"] is False
+    assert session_state["template_selection_cache"]["10_70_front_None_abc"] is selection
+
+def test_stock_endpoints_expire_with_the_stock_ttl(monkeypatch):
+    assert printful.get_ttl_class("/products/variant/4012") == "stock"
+    assert printful.get_ttl_class("/v2/catalog-variants/4012/availability") == "stock"
+    assert printful.get_ttl_class("/v2/catalog-products/71/mockup-styles") == "catalog"
+    assert printful.get_ttl_class("/store/products") == "store"
+    
+    api = make_api(monkeypatch, {})
+    api.set_cached("catalog_api_cache", "/products/variant/4012_None", {"result": None})
+    api.set_cached("catalog_api_cache", "/v2/catalog-products/71_None", {"data": None})
+    stored_at = time.time() - CACHE_TTL["stock"] - 1
+    for key in list(api.cache_timestamps):
+        api.cache_timestamps[key] = stored_at
+    
+    assert api.get_cached("catalog_api_cache", "/products/variant/4012_None", "stock") is None
+    assert api.get_cached("catalog_api_cache", "/v2/catalog-products/71_None", "catalog") == {"data": None}
+
+def test_refresh_updates_stock_and_leaves_other_caches_alone(monkeypatch):
+    held_by_other_threads = []
+    
+    class RecordsCache(dict):
+        def values(self):
+            # Patching must hold the cache lock against background readers
+            acquired = []
+            thread = threading.Thread(target=lambda: acquired.append(PrintfulAPI.cache_lock.acquire(timeout=0)))
+            thread.start()
+            thread.join()
+            if acquired[0]:
+                PrintfulAPI.cache_lock.release()
+            held_by_other_threads.append(acquired[0])
+            return super().values()
+    
+    record = {"variant_id": 1, "variant_in_stock": True}
+    session_state = {"template_records_cache": RecordsCache({"10_70_front_Template 1_abc": [record]})}
+    api = make_api(monkeypatch, {1: False, 2: True}, session_state)
+    api.product_variants_cache[10] = ([{"catalog_variant_id": 1, "in_stock": True},
+                                       {"catalog_variant_id": 2, "in_stock": False}], "", "")
+    api.product_variants_cache[11] = ([{"catalog_variant_id": 3, "in_stock": True}], "", "")
+    variant_details = SimpleNamespace(in_stock=True)
+    api.catalog_api_cache["/products/variant/1_None"] = {"result": variant_details}
+    template_data = {"data": [{"image_url": "https://example.com/t.png"}]}
+    api.template_data_cache["catalog_templates_70"] = template_data
+    api.cache_timestamps.update({"template_data_cache/catalog_templates_70": 1.0,
+                                 "product_variants_cache/10": 1.0, "product_variants_cache/11": 1.0})
+    generation = PrintfulAPI.cache_generation
+    
+    assert api.refresh_stock() == 2
+    
+    assert [variant["in_stock"] for variant in api.product_variants_cache[10][0]] == [False, True]
+    assert api.product_variants_cache[11][0][0]["in_stock"] is True
+    assert variant_details.in_stock is False
+    assert record["variant_in_stock"] is False
+    assert held_by_other_threads == [False]
+    assert PrintfulAPI.cache_generation == generation + 1
+    
+    # Only the fully refreshed variant list counts as fresh, nothing else is touched
+    assert api.cache_timestamps["product_variants_cache/10"] > 1.0
+    assert api.cache_timestamps["product_variants_cache/11"] == 1.0
+    assert api.template_data_cache == {"catalog_templates_70": template_data}
+    assert api.cache_timestamps["template_data_cache/catalog_templates_70"] == 1.0
\ No newline at end of file
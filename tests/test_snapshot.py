@@ -0,0 +1,107 @@
+import gzip
+
+import pytest
+
+from src.api.models import SyncProduct, SyncVariant
+from src.utils import snapshot
+from src.utils.json_codec import loads as json_loads, dumps as json_dumps
+from src.utils.snapshot import encode_tagged, decode_tagged, build_cache_snapshot, restore_cache_snapshot
+
+class SessionState(dict):
+    """Stand-in for st.session_state with attribute access"""
+    
+    __getattr__ = dict.__getitem__
+    __setattr__ = dict.__setitem__
+
+@pytest.fixture
+def session_state(monkeypatch):
+    state = SessionState()
+    monkeypatch.setattr(snapshot.st, "session_state", state)
+    return state
+
+def round_trip(value):
+    return decode_tagged(json_loads(json_dumps(encode_tagged(value))))
+
+def test_tagged_json_keeps_bytes_tuples_and_keys():
+    value = {"image": b"\x89PNG\x00\xff", "variants": ([], "", ""), "by_id": {4012: ("S", "M"), (1, "front"): None},
+             "__name": "x", "plain": [1, 2.5, True, None, "ü"]}
+    
+    assert round_trip(value) == value
+
+def test_tagged_json_rebuilds_models():
+    product = SyncProduct(1, "Shirt", [SyncVariant(10, 71, 4012)])
+    
+    restored = round_trip({"result": product})["result"]
+    
+    assert isinstance(restored, SyncProduct) and restored.name == "Shirt"
+    assert isinstance(restored.sync_variants[0], SyncVariant)
+    assert restored.sync_variants[0].catalog_variant_id == 4012
+
+def test_tagged_json_rejects_unknown_types_and_models():
+    with pytest.raises(ValueError):
+        encode_tagged({"value": {1, 2}})
+    with pytest.raises(ValueError):
+        decode_tagged({"__model__": "Exploit", "fields": {}})
+    with pytest.raises(ValueError):
+        decode_tagged({"__model__": "SyncVariant", "fields": {"id": 1}})
+
+def test_snapshot_round_trips_session_caches(session_state):
+    session_state.update({
+        "store_products": [{"id": 1, "name": "Shirt"}],
+        "api_cache": {"/store/products_None": {"result": [SyncProduct(1, "Shirt", [])]}},
+        "product_variants_cache": {1: ([{"catalog_variant_id": 4012}], "24", "Shirts")},
+        "template_records_cache": {"1_71_front": [{"template_image": b"png"}]},
+    })
+    data = build_cache_snapshot("key")
+    session_state.clear()
+    
+    summary = restore_cache_snapshot(data, "key")
+    
+    assert summary["skipped_layers"] == []
+    assert session_state["store_products"] == [{"id": 1, "name": "Shirt"}]
+    assert session_state["product_variants_cache"] == {1: ([{"catalog_variant_id": 4012}], "24", "Shirts")}
+    assert session_state["template_records_cache"] == {"1_71_front": [{"template_image": b"png"}]}
+    assert session_state["api_cache"]["/store/products_None"]["result"][0].name == "Shirt"
+
+def test_store_layers_are_skipped_for_another_key(session_state):
+    session_state.update({
+        "api_cache": {"/store/products_None": {}, "/v2/catalog-products/71_None": {}},
+        "product_variants_cache": {1: ([], "", "")},
+    })
+    data = build_cache_snapshot("key")
+    session_state.clear()
+    
+    summary = restore_cache_snapshot(data, "other key")
+    
+    assert summary["skipped_layers"] == ["api_cache", "product_variants_cache"]
+    assert "product_variants_cache" not in session_state
+
+def test_layer_of_the_wrong_type_is_rejected(session_state):
+    data = gzip.compress(json_dumps({
+        "format": snapshot.SNAPSHOT_FORMAT,
+        "version": snapshot.SNAPSHOT_VERSION,
+        "key_fingerprint": snapshot.get_key_fingerprint("key"),
+        "layers": {"api_cache": ["not", "a", "cache"]},
+    }))
+    
+    with pytest.raises(ValueError):
+        restore_cache_snapshot(data, "key")
+    assert "api_cache" not in session_state
+
+def test_layers_under_unknown_names_are_ignored(session_state):
+    data = gzip.compress(json_dumps({
+        "format": snapshot.SNAPSHOT_FORMAT,
+        "version": snapshot.SNAPSHOT_VERSION,
+        "key_fingerprint": snapshot.get_key_fingerprint("key"),
+        "layers": {"api_key": {"value": "secret"}, "catalog_api_cache": {"/products/variant/4012_None": {}}},
+    }))
+    
+    summary = restore_cache_snapshot(data, "key")
+    
+    assert summary["entries"] == 1
+    assert set(session_state) == {"catalog_api_cache"}
+
+def test_other_files_are_rejected(session_state):
+    for data in (b"not gzip", gzip.compress(b"[]"), gzip.compress(json_dumps({"format": "other"}))):
+        with pytest.raises(ValueError):
+            restore_cache_snapshot(data, "key")
\ No newline at end of file
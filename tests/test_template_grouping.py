@@ -0,0 +1,77 @@
+import io
+
+from PIL import Image
+
+from src.ui import template as template_ui
+from src.ui.template import select_placement_templates
+from src.utils import perceptual
+
+GEOMETRY = {"template_width": 1000, "template_height": 1000, "print_area_width": 600, "print_area_height": 800,
+            "print_area_top": 100, "print_area_left": 200}
+
+def build_index(templates):
+    """Build a template index of one placement with one size per template"""
+    return {
+        "templates": templates,
+        "placements": ["front"],
+        "by_placement": {"front": list(range(len(templates)))},
+        "by_variant": {"front": {100 + position: [position] for position in range(len(templates))}},
+        "by_size": {"front": {(template["size"],): [position] for position, template in enumerate(templates)}},
+        "sizes": [[template["size"]] for template in templates],
+        "techniques": {template["image_url"]: ["DTG"] for template in templates},
+    }
+
+def template(size, image_url, **geometry):
+    return {"size": size, "image_url": image_url, "placement": "front", **GEOMETRY, **geometry}
+
+def test_identical_images_with_the_same_print_area_are_merged():
+    index = build_index([template("S", "https://example.com/s.png"), template("M", "https://example.com/m.png")])
+    image_groups = {"https://example.com/s.png": "https://example.com/s.png",
+                    "https://example.com/m.png": "https://example.com/s.png"}
+    
+    assert select_placement_templates(index, "front")["per_variant"]
+    
+    selection = select_placement_templates(index, "front", image_groups)
+    
+    assert not selection["per_variant"]
+    assert list(selection["template_options"]) == ["Template 1 (Sizes: S, M) [Techniques: DTG]"]
+
+def test_identical_images_with_different_print_areas_stay_apart():
+    index = build_index([template("S", "https://example.com/s.png"),
+                         template("M", "https://example.com/m.png", print_area_top=120)])
+    image_groups = {"https://example.com/s.png": "https://example.com/s.png",
+                    "https://example.com/m.png": "https://example.com/s.png"}
+    
+    selection = select_placement_templates(index, "front", image_groups)
+    
+    assert selection["per_variant"]
+    assert len(selection["template_options"]) == 2
+
+def test_same_image_url_with_different_template_sizes_stays_apart():
+    index = build_index([template("S", "https://example.com/t.png"),
+                         template("M", "https://example.com/t.png", template_width=1200)])
+    
+    selection = select_placement_templates(index, "front")
+    
+    assert selection["per_variant"]
+    assert len(selection["template_options"]) == 2
+
+def test_urls_known_to_be_identical_are_not_downloaded_again(monkeypatch):
+    image = io.BytesIO()
+    Image.new("RGB", (32, 32), "white").save(image, "PNG")
+    downloads = []
+    
+    def download_image(url, product_id, placement, style_id):
+        downloads.append(url)
+        return image.getvalue(), url
+    
+    monkeypatch.setattr(template_ui, "download_image", download_image)
+    monkeypatch.setattr(perceptual, "_identical", {})
+    index = build_index([template("S", "https://example.com/s.png"), template("M", "https://example.com/m.png")])
+    
+    first, _ = template_ui.group_placement_templates(index, "front", 70)
+    second, images = template_ui.group_placement_templates(index, "front", 70)
+    
+    assert downloads == ["https://example.com/s.png", "https://example.com/m.png", "https://example.com/s.png"]
+    assert not first["per_variant"] and not second["per_variant"]
+    assert images == {"https://example.com/s.png": image.getvalue(), "https://example.com/m.png": image.getvalue()}
\ No newline at end of file
@@ -0,0 +1,42 @@
+import pytest
+
+from src.api.webhooks import parse_event, invalidate_caches, is_authorized
+
+def test_parse_event_rejects_non_objects():
+    for payload in ([], 1, "event", None):
+        with pytest.raises(ValueError):
+            parse_event(payload)
+
+def test_parse_event_skips_invalid_ids():
+    event = parse_event({"type": "stock_updated", "data": {"variant_stock": {"4012": "in", "x": "out"}}})
+    
+    assert event["catalog_variant_ids"] == [4012]
+
+def test_parse_event_ignores_unrelated_events():
+    assert parse_event({"type": "order_created", "data": {}}) is None
+
+def test_store_product_event_drops_only_that_product():
+    store_products = [{"id": 1, "name": "A", "catalog_product_id": 71}, {"id": 2, "name": "B", "catalog_product_id": 72}]
+    caches = {
+        "api_cache": {"/store/products_None": {}, "/store/products/1_None": {}, "/store/products/2_None": {}},
+        "product_variants_cache": {1: ([], "", ""), 2: ([], "", "")},
+        "template_records_cache": {"1_71_front": [], "2_72_front": []},
+        "template_selection_cache": {"1_71_front_None": ({}, {}), "2_72_front_None": ({}, {})},
+        "cache_timestamps": {"store_products": 100.0},
+    }
+    
+    invalidate_caches(caches, parse_event({"type": "product_updated", "data": {"sync_product": {"id": 2}}}), store_products)
+    
+    assert [product["id"] for product in store_products] == [1]
+    assert set(caches["api_cache"]) == {"/store/products/1_None"}
+    assert set(caches["product_variants_cache"]) == {1}
+    assert set(caches["template_records_cache"]) == {"1_71_front"}
+    assert set(caches["template_selection_cache"]) == {"1_71_front_None"}
+    assert caches["cache_timestamps"]["store_products"] == 0
+
+def test_is_authorized():
+    assert is_authorized("/printful/webhook?token=secret", {}, "secret")
+    assert is_authorized("/printful/webhook", {"X-Webhook-Token": "secret"}, "secret")
+    assert not is_authorized("/printful/webhook?token=wrong", {}, "secret")
+    assert not is_authorized("/printful/webhook", {}, "secret")
+    assert not is_authorized("/printful/webhook?token=", {}, "")
\ No newline at end of file
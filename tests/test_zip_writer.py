@@ -0,0 +1,60 @@
+import io
+import os
+import zipfile
+
+from src.utils.zip_writer import ParallelZipWriter
+
+def read_archive(zip_data):
+    with zipfile.ZipFile(io.BytesIO(zip_data)) as archive:
+        assert archive.testzip() is None
+        return {info.filename: (info.compress_type, archive.read(info)) for info in archive.infolist()}
+
+def test_entries_are_stored_or_deflated_by_type():
+    writer = ParallelZipWriter(max_workers=2)
+    writer.writestr("data.json", b'{"a": 1}' * 1000)
+    writer.writestr("image.png", b"png" * 1000)
+    writer.writestr("random.bin", os.urandom(1000))
+    
+    entries = read_archive(writer.close())
+    
+    assert entries["data.json"] == (zipfile.ZIP_DEFLATED, b'{"a": 1}' * 1000)
+    assert entries["image.png"] == (zipfile.ZIP_STORED, b"png" * 1000)
+    assert entries["random.bin"][0] == zipfile.ZIP_STORED
+
+def test_merged_archives_keep_their_payloads():
+    shards = []
+    for shard in range(2):
+        writer = ParallelZipWriter(max_workers=1)
+        writer.writestr(f"data_{shard}.json", f'[{{"shard": {shard}}}]'.encode() * 500)
+        writer.writestr(f"images/{shard}.png", os.urandom(2000))
+        writer.writestr("images/shared.png", b"shared" * 100)
+        shards.append(writer.close())
+    
+    merged = ParallelZipWriter()
+    merged.writestr("manifest.json", b"{}")
+    for shard_data in shards:
+        merged.merge_archive(shard_data)
+    entries = read_archive(merged.close())
+    
+    expected = {}
+    for shard_data in shards:
+        for name, entry in read_archive(shard_data).items():
+            expected.setdefault(name, entry)
+    
+    assert list(entries) == ["manifest.json", "data_0.json", "images/0.png", "images/shared.png",
+                             "data_1.json", "images/1.png"]
+    assert {name: entry for name, entry in entries.items() if name != "manifest.json"} == expected
+    assert "merge" in merged.timings
+
+def test_merge_reads_payloads_after_extra_fields():
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        info = zipfile.ZipInfo("data.json")
+        info.compress_type = zipfile.ZIP_DEFLATED
+        info.extra = b"\xfe\xca\x04\x00abcd"
+        archive.writestr(info, b"payload" * 100)
+    
+    merged = ParallelZipWriter()
+    merged.merge_archive(buffer.getvalue())
+    
+    assert read_archive(merged.close()) == {"data.json": (zipfile.ZIP_DEFLATED, b"payload" * 100)}
\ No newline at end of file